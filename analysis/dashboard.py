@@ -11,7 +11,15 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from src.database import Database
-from src.database.models import Producto
+from src.database.models import EstadisticaDiaria, Producto
+from src.database.normalizado import cargar_dataframe
+from src.database.unidades import elegir_por_precio_unitario, precios_unitarios
+from src.utils.canasta import (
+    costo_por_categoria,
+    costos_canasta,
+    obtener_costos_canasta,
+)
+from src.utils.indices import calcular_indices, obtener_indices
 import config
 
 # Configuración de la pagina
@@ -21,16 +29,48 @@ st.set_page_config(page_title="Price Monitor Dashboard", page_icon="📊", layou
 # Cache de la base de datos
 @st.cache_resource
 def get_database():
-    return Database("price_monitor.db")
+    return Database("price_monitor.db", solo_lectura=True)
 
 
-db = get_database()
+try:
+    db = get_database()
+except (FileNotFoundError, RuntimeError) as e:
+    # Sólo lectura: el dashboard nunca crea ni migra la base
+    st.error(str(e))
+    st.stop()
 
 
 # Cache de datos
 @st.cache_data(ttl=300)
 def load_all_products():
-    productos = db.session.query(Producto).all()
+    if config.MODO_ALMACENAMIENTO == "normalizado":
+        df = cargar_dataframe(db)
+        df["fecha"] = df["timestamp"].dt.date
+        df["hora"] = df["timestamp"].dt.time
+        df = df.rename(columns={"sucursales_disponibles": "sucursales"})
+        df = df.join(precios_unitarios(df["precio"], df["presentacion"]))
+        return df[
+            [
+                "id",
+                "fecha",
+                "hora",
+                "categoria",
+                "nombre",
+                "marca",
+                "precio",
+                "precio_min",
+                "precio_max",
+                "presentacion",
+                "ean",
+                "sucursales",
+                "ubicacion",
+                "unidad",
+                "precio_unitario",
+            ]
+        ]
+
+    with db.sesion() as sesion:
+        productos = sesion.query(Producto).all()
     return pd.DataFrame(
         [
             {
@@ -44,15 +84,100 @@ def load_all_products():
                 "precio_min": p.precio_min,
                 "precio_max": p.precio_max,
                 "presentacion": p.presentacion,
+                "ean": p.ean,
                 "sucursales": p.sucursales_disponibles,
+                "ubicacion": p.ubicacion,
+                "unidad": p.unidad,
+                "precio_unitario": p.precio_unitario,
             }
             for p in productos
         ]
     )
 
 
+@st.cache_data(ttl=300)
+def load_daily_stats():
+    """Agregados por día, ubicación y categoría (tabla estadisticas_diarias)"""
+    if config.MODO_ALMACENAMIENTO == "normalizado":
+        # La tabla se mantiene al guardar en `productos`: calcularla acá
+        return (
+            load_all_products()
+            .assign(cuadrado=lambda d: d["precio"] ** 2)
+            .groupby(["fecha", "ubicacion", "categoria"])
+            .agg(
+                cantidad=("precio", "count"),
+                suma=("precio", "sum"),
+                minimo=("precio", "min"),
+                maximo=("precio", "max"),
+                suma_cuadrados=("cuadrado", "sum"),
+            )
+            .reset_index()
+        )
+
+    with db.sesion() as sesion:
+        filas = sesion.query(EstadisticaDiaria).all()
+    return pd.DataFrame(
+        [
+            {
+                "fecha": e.fecha,
+                "ubicacion": e.ubicacion,
+                "categoria": e.categoria,
+                "cantidad": e.cantidad,
+                "suma": e.suma,
+                "minimo": e.minimo,
+                "maximo": e.maximo,
+                "suma_cuadrados": e.suma_cuadrados,
+            }
+            for e in filas
+        ],
+        columns=[
+            "fecha",
+            "ubicacion",
+            "categoria",
+            "cantidad",
+            "suma",
+            "minimo",
+            "maximo",
+            "suma_cuadrados",
+        ],
+    )
+
+
+@st.cache_data(ttl=300)
+def load_basket_series():
+    """Costo diario de la canasta por ubicación (tabla costos_canasta)"""
+    serie = obtener_costos_canasta(db, por_dia=True)
+    if serie.empty:
+        # Sin serie calculada todavía (la escribe el pipeline): calcularla acá
+        serie = costos_canasta(load_all_products(), claves=("fecha", "ubicacion"))
+    return serie[["fecha", "ubicacion", "costo_total", "categorias", "completa"]]
+
+
+@st.cache_data(ttl=300)
+def load_price_indices():
+    """Índices encadenados por categoría, grupo y general (tabla indices_precios)"""
+    indices = obtener_indices(db)
+    if indices.empty:
+        # Sin índices calculados todavía (los escribe el pipeline): calcularlos acá
+        indices = calcular_indices(load_all_products())
+    return indices
+
+
+def resumir_por_categoria(stats):
+    """Cantidad, promedio, mínimo y máximo por categoría a partir de los agregados"""
+    resumen = stats.groupby("categoria").agg(
+        cantidad=("cantidad", "sum"),
+        suma=("suma", "sum"),
+        minimo=("minimo", "min"),
+        maximo=("maximo", "max"),
+    )
+    resumen["promedio"] = resumen["suma"] / resumen["cantidad"]
+    return resumen
+
+
 # Cargar datos
 df = load_all_products()
+df_stats = load_daily_stats()
 
 # Sidebar
 with st.sidebar:
@@ -64,6 +189,10 @@ with st.sidebar:
         "Fecha", options=["Todas"] + [str(f) for f in fechas_disponibles], index=0
     )
 
+    # Filtro de ubicación
+    ubicaciones = ["Todas"] + sorted(df["ubicacion"].dropna().unique().tolist())
+    ubicacion_seleccionada = st.selectbox("Ubicación", ubicaciones)
+
     # Filtro de categoría
     categorias = ["Todas"] + sorted(df["categoria"].unique().tolist())
     categoria_seleccionada = st.selectbox("Categoría", categorias)
@@ -82,14 +211,19 @@ with st.sidebar:
             f"Última actualización:\n{stats['ultima_fecha'].strftime('%Y-%m-%d %H:%M')}"
         )
 
-# Aplicar filtros
+# Aplicar filtros (a los productos y a los agregados diarios)
 df_filtered = df.copy()
+stats_filtered = df_stats.copy()
 if fecha_seleccionada != "Todas":
-    df_filtered = df_filtered[
-        df_filtered["fecha"] == pd.to_datetime(fecha_seleccionada).date()
-    ]
+    fecha = pd.to_datetime(fecha_seleccionada).date()
+    df_filtered = df_filtered[df_filtered["fecha"] == fecha]
+    stats_filtered = stats_filtered[stats_filtered["fecha"] == fecha]
+if ubicacion_seleccionada != "Todas":
+    df_filtered = df_filtered[df_filtered["ubicacion"] == ubicacion_seleccionada]
+    stats_filtered = stats_filtered[stats_filtered["ubicacion"] == ubicacion_seleccionada]
 if categoria_seleccionada != "Todas":
     df_filtered = df_filtered[df_filtered["categoria"] == categoria_seleccionada]
+    stats_filtered = stats_filtered[stats_filtered["categoria"] == categoria_seleccionada]
 
 # Título principal
 st.title("📊 Supermarket Price Tracker - Dashboard")
@@ -104,26 +238,30 @@ tab1, tab2, tab3, tab4 = st.tabs(
 with tab1:
     st.header("Vista General")
 
-    # Métricas principales
+    # Métricas principales (desde los agregados diarios)
     col1, col2, col3, col4 = st.columns(4)
+    cantidad_filtrada = int(stats_filtered["cantidad"].sum())
+    promedio_filtrado = (
+        stats_filtered["suma"].sum() / cantidad_filtrada if cantidad_filtrada else 0
+    )
 
     with col1:
         st.metric(
             "Productos Totales",
-            len(df_filtered),
-            delta=f"{len(df_filtered) - len(df)}"
+            cantidad_filtrada,
+            delta=f"{cantidad_filtrada - int(df_stats['cantidad'].sum())}"
             if fecha_seleccionada != "Todas"
             else None,
         )
 
     with col2:
-        st.metric("Precio Promedio", f"${df_filtered['precio'].mean():.2f}")
+        st.metric("Precio Promedio", f"${promedio_filtrado:.2f}")
 
     with col3:
-        st.metric("Precio Mínimo", f"${df_filtered['precio'].min():.2f}")
+        st.metric("Precio Mínimo", f"${stats_filtered['minimo'].min():.2f}")
 
     with col4:
-        st.metric("Precio Máximo", f"${df_filtered['precio'].max():.2f}")
+        st.metric("Precio Máximo", f"${stats_filtered['maximo'].max():.2f}")
 
     st.markdown("---")
 
@@ -143,7 +281,12 @@ with tab1:
 
     with col2:
         st.subheader("Productos por Categoría")
-        cat_counts = df_filtered["categoria"].value_counts().head(10)
+        cat_counts = (
+            stats_filtered.groupby("categoria")["cantidad"]
+            .sum()
+            .sort_values(ascending=False)
+            .head(10)
+        )
         fig = px.bar(
             x=cat_counts.values,
             y=cat_counts.index,
@@ -156,11 +299,9 @@ with tab1:
     # Estadísticas por categoría
     st.subheader("Estadísticas por Categoría")
 
-    stats_cat = (
-        df_filtered.groupby("categoria")
-        .agg({"precio": ["count", "mean", "min", "max"]})
-        .round(2)
-    )
+    stats_cat = resumir_por_categoria(stats_filtered)[
+        ["cantidad", "promedio", "minimo", "maximo"]
+    ].round(2)
 
     stats_cat.columns = ["Cantidad", "Promedio", "Mínimo", "Máximo"]
     stats_cat = stats_cat.sort_values("Promedio", ascending=False)
@@ -236,17 +377,21 @@ with tab3:
     canasta_productos = []
     costo_total = 0
 
+    # Más barato por precio unitario (por kg / lt / unidad) de cada categoría,
+    # con el mismo costo que la serie (precio unitario x cantidad de referencia)
+    mas_baratos = elegir_por_precio_unitario(
+        df[df["categoria"].isin(config.CANASTA_BASICA)]
+    )
+    mas_baratos = mas_baratos.join(costo_por_categoria(mas_baratos)).set_index(
+        "categoria"
+    )
+
     for categoria in config.CANASTA_BASICA:
         # Buscar en TODOS los datos disponibles
-        productos_cat = df[df["categoria"] == categoria]
+        if categoria in mas_baratos.index:
+            producto_min = mas_baratos.loc[categoria]
 
-        if not productos_cat.empty:
-            # Agrupar por producto (nombre+marca) y tomar precio mínimo
-            producto_min = productos_cat.loc[productos_cat["precio"].idxmin()]
-
-            cantidad = config.CANTIDADES_CANASTA.get(categoria, 1)
-
-            subtotal = producto_min["precio"] * cantidad
+            subtotal = producto_min["costo"]
 
             canasta_productos.append(
                 {
@@ -254,14 +399,15 @@ with tab3:
                     "Producto": producto_min["nombre"],
                     "Marca": producto_min["marca"],
                     "Precio Unitario": producto_min["precio"],
-                    "Cantidad": cantidad,
+                    "Precio por kg/lt/un": producto_min["precio_unitario"],
+                    "Cantidad": f"{producto_min['cantidad']:g} {producto_min['medida']}",
                     "Subtotal": subtotal,
                     "Presentación": producto_min["presentacion"],
                     "Fecha": producto_min["fecha"],
                 }
             )
 
-        costo_total += subtotal
+            costo_total += subtotal
 
     # Mostrar costo total
     col1, col2 = st.columns([2, 1])
@@ -269,7 +415,8 @@ with tab3:
         st.metric(
             "Costo Total de Canasta Básica",
             f"${costo_total:,.2f}",
-            help="Suma de los productos más baratos de cada categoría (histórico completo)",
+            help="Precio por kg/lt/un del más barato de cada categoría por su cantidad "
+            "de referencia (histórico completo)",
         )
     with col2:
         st.metric(
@@ -300,6 +447,43 @@ with tab3:
         fig.update_xaxes(tickangle=45)
         st.plotly_chart(fig, use_container_width=True)
 
+    # Evolución del costo de la canasta (una corrida por día y ubicación)
+    st.subheader("Evolución del Costo de la Canasta")
+    df_serie = load_basket_series()
+    if ubicacion_seleccionada != "Todas":
+        df_serie = df_serie[df_serie["ubicacion"] == ubicacion_seleccionada]
+    solo_completas = st.checkbox(
+        "Sólo días con todas las categorías de la canasta", value=True
+    )
+    if solo_completas:
+        df_serie = df_serie[df_serie["completa"]]
+
+    if df_serie.empty:
+        st.info("No hay días con datos para la canasta")
+    else:
+        fig = px.line(
+            df_serie,
+            x="fecha",
+            y="costo_total",
+            color="ubicacion",
+            title="Costo de la Canasta Básica por Día",
+            markers=True,
+            hover_data=["categorias"],
+            labels={
+                "costo_total": "Costo Total (ARS)",
+                "fecha": "Fecha",
+                "ubicacion": "Ubicación",
+                "categorias": "Categorías con precio",
+            },
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        primero = df_serie.groupby("ubicacion")["costo_total"].first()
+        ultimo = df_serie.groupby("ubicacion")["costo_total"].last()
+        variacion = ((ultimo - primero) / primero.where(primero > 0) * 100).dropna()
+        if len(variacion) == 1:
+            st.metric("Variación del Período", f"{variacion.iloc[0]:+.1f}%")
+
 # TAB 4: EVOLUCIÓN TEMPORAL
 with tab4:
     st.header("Evolución de Precios")
@@ -315,13 +499,14 @@ with tab4:
         )
 
         if categorias_evolucion:
-            # Evolución del precio promedio por categoría
+            # Evolución del precio promedio por categoría (agregados diarios)
             df_evolucion = (
-                df[df["categoria"].isin(categorias_evolucion)]
-                .groupby(["fecha", "categoria"])["precio"]
-                .mean()
+                df_stats[df_stats["categoria"].isin(categorias_evolucion)]
+                .groupby(["fecha", "categoria"])[["suma", "cantidad"]]
+                .sum()
                 .reset_index()
             )
+            df_evolucion["precio"] = df_evolucion["suma"] / df_evolucion["cantidad"]
 
             fig = px.line(
                 df_evolucion,
@@ -338,34 +523,76 @@ with tab4:
             )
             st.plotly_chart(fig, use_container_width=True)
 
-            # Variación de precios
+            # Variación de precios con índices encadenados (EANs pareados)
             st.subheader("Variación de Precios entre Fechas")
+            st.caption(
+                "Índices encadenados base 100: cada día se compara sólo con los "
+                "mismos productos (EAN y ubicación) del día anterior, así los "
+                "cambios en la mezcla de productos no se confunden con inflación."
+            )
 
-            if len(fechas_disponibles) >= 2:
-                fecha_inicial = fechas_disponibles[0]
-                fecha_final = fechas_disponibles[-1]
+            df_indices = load_price_indices()
+            formula = st.radio(
+                "Índice",
+                options=["jevons", "laspeyres"],
+                format_func=lambda f: {
+                    "jevons": "Jevons (media geométrica)",
+                    "laspeyres": "Laspeyres (ponderado por sucursales)",
+                }[f],
+                horizontal=True,
+            )
 
-                df_inicial = (
-                    df[df["fecha"] == fecha_inicial]
-                    .groupby("categoria")["precio"]
-                    .mean()
+            resumen = df_indices[df_indices["nivel"] != "categoria"]
+            if not resumen.empty:
+                fig = px.line(
+                    resumen,
+                    x="fecha",
+                    y=formula,
+                    color="nombre",
+                    title="Índice General y por Grupo",
+                    markers=True,
+                    labels={formula: "Índice", "fecha": "Fecha", "nombre": "Nivel"},
                 )
-                df_final = (
-                    df[df["fecha"] == fecha_final].groupby("categoria")["precio"].mean()
+                st.plotly_chart(fig, use_container_width=True)
+
+            por_categoria = df_indices[
+                (df_indices["nivel"] == "categoria")
+                & df_indices["nombre"].isin(categorias_evolucion)
+            ]
+            if por_categoria.empty:
+                st.info("No hay índices para las categorías seleccionadas")
+            else:
+                fig = px.line(
+                    por_categoria,
+                    x="fecha",
+                    y=formula,
+                    color="nombre",
+                    title="Índice por Categoría",
+                    markers=True,
+                    labels={formula: "Índice", "fecha": "Fecha", "nombre": "Categoría"},
                 )
+                st.plotly_chart(fig, use_container_width=True)
 
+                # Variación entre el primer y el último día de cada serie
+                extremos = por_categoria.groupby("nombre").agg(
+                    fecha_inicial=("fecha", "first"),
+                    fecha_final=("fecha", "last"),
+                    indice_inicial=(formula, "first"),
+                    indice_final=(formula, "last"),
+                    pareados=("pareados", "last"),
+                )
                 variacion = pd.DataFrame(
-                    {"Precio Inicial": df_inicial, "Precio Final": df_final}
+                    {
+                        "Desde": extremos["fecha_inicial"],
+                        "Hasta": extremos["fecha_final"],
+                        "Variación (%)": (
+                            (extremos["indice_final"] / extremos["indice_inicial"] - 1)
+                            * 100
+                        ).round(2),
+                        "Productos pareados (último día)": extremos["pareados"],
+                    }
                 )
-                variacion["Variación (%)"] = (
-                    (variacion["Precio Final"] - variacion["Precio Inicial"])
-                    / variacion["Precio Inicial"]
-                    * 100
-                ).round(2)
-                variacion["Variación ($)"] = (
-                    variacion["Precio Final"] - variacion["Precio Inicial"]
-                ).round(2)
-
+                variacion.index.name = "categoria"
                 variacion = variacion.sort_values("Variación (%)", ascending=False)
 
                 st.dataframe(variacion, use_container_width=True)
@@ -375,7 +602,7 @@ with tab4:
                     variacion.reset_index(),
                     x="categoria",
                     y="Variación (%)",
-                    title=f"Variación Porcentual de Precios ({fecha_inicial} → {fecha_final})",
+                    title="Variación Porcentual de Precios (índice encadenado)",
                     color="Variación (%)",
                     color_continuous_scale=["green", "yellow", "red"],
                 )
@@ -9,6 +9,10 @@ COORDENADAS = {
     "MAR_DEL_PLATA": {"lat": -38.0055, "lng": -57.5426},
 }
 
+# Ubicaciones que scrapea el pipeline (claves de COORDENADAS)
+UBICACIONES_PIPELINE = ["CABA"]
+MAX_WORKERS_UBICACIONES = 4  # ubicaciones scrapeadas en paralelo
+
 # Categorías ESPECÍFICAS para evitar ruido
 CATEGORIAS_PRODUCTOS = [
     # Lácteos
@@ -47,11 +51,112 @@ CATEGORIAS_PRODUCTOS = [
 ]
 
 # Límites de scraping
-LIMITE_PRODUCTOS_POR_CATEGORIA = 30
+LIMITE_PRODUCTOS_POR_CATEGORIA = 30  # tamaño de página
+
+# Paginación: recorrer offsets hasta agotar la búsqueda o llegar al tope
+PAGINAR_BUSQUEDAS = False
+MAX_PRODUCTOS_POR_CATEGORIA = 300
+
+# Refresco por EAN: actualiza precios de productos conocidos sin re-buscar términos.
+# Es una request por EAN, así que cada corrida refresca como mucho tantos EANs
+# como requests haría la búsqueda por término (una por término, o por página al
+# paginar), empezando por los que hace más tiempo que no se refrescan: el catálogo
+# se recorre en varias corridas
+MAX_EANS_REFRESCO = None  # tope más bajo de EANs por corrida (0 = no refrescar)
+DIAS_EANS_REFRESCO = 7  # sólo EANs observados en estos últimos días
+TAM_LOTE_REFRESCO = 100  # EANs por lote
+LIMITE_REFRESCO_EAN = 5  # resultados pedidos por EAN (payload chico)
+
+# PRAGMAs de SQLite (ver src/database/engine.py). WAL permite que el
+# dashboard lea mientras el pipeline escribe.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,  # negativo = KiB (64 MB)
+    "mmap_size": 256 * 1024**2,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,  # ms
+}
+
+# Pool de conexiones por engine (threads de Streamlit + jobs en paralelo)
+SQLITE_POOL_SIZE = 5
+SQLITE_POOL_MAX_OVERFLOW = 10
+
+# Filas por commit en la inserción en bloque (Database.guardar_productos_bulk)
+TAM_CHUNK_INSERT = 5000
+
+# Guardado de productos:
+#   "merge": carga en una tabla de staging y fusiona por (EAN, ubicación, franja
+#            horaria) en una transacción; re-ejecutar una corrida no duplica filas
+#   "bulk": inserción en bloque sin clave (agrega filas en cada corrida)
+MODO_INGESTA = "merge"
+
+# Tamaño en horas de la franja de la clave de idempotencia. None = el menor
+# intervalo entre corridas del scheduler (12 con HORAS_DESCUBRIMIENTO y
+# HORAS_REFRESCO de abajo); no puede ser mayor, o una corrida pisa a la anterior
+HORAS_BUCKET_INGESTA = None
+
+# Deduplicar por (EAN, ubicación) los productos repetidos entre términos solapados
+DEDUPLICAR_EAN = True
+
+# Detección de precios anómalos por EAN antes de guardar (src/utils/anomalias.py).
+# Las observaciones marcadas van a la tabla `cuarentena` y no a `productos`
+DETECTAR_ANOMALIAS = True
+PRECIO_MAXIMO = 50000  # tope absoluto (EANs sin historial y productos sin EAN)
+ANOMALIA_MIN_OBSERVACIONES = 5  # antes de esto sólo se mira el salto vs el último
+ANOMALIA_Z_MAX = 4.0  # desvíos estándar respecto de la media del EAN
+ANOMALIA_DESVIO_MIN = 0.25  # y al menos 25% de diferencia con la EWMA
+ANOMALIA_SALTO_MAX = 3.0  # precio > 3x o < 1/3 del último aceptado
+ANOMALIA_ALFA_EWMA = 0.3
+ANOMALIA_CONFIRMACIONES = 3  # anomalías seguidas que se aceptan como nuevo nivel
+
+# Dónde guarda el pipeline cada corrida:
+#   "legacy": tabla `productos` (una fila ancha por producto y corrida)
+#   "normalizado": dim_productos + observaciones (ids y precios en centavos)
+#   "ambos": las dos, útil mientras se migra el dashboard
+MODO_ALMACENAMIENTO = "legacy"
+
+# Historial normalizado sólo de cambios: si precio, mínimo, máximo, sucursales y
+# categoría no cambiaron desde la corrida anterior se extiende la observación vigente
+HISTORIAL_SOLO_CAMBIOS = False
+
+# Agregar cada corrida al archivo Parquet de data/archivo (requiere duckdb)
+ARCHIVAR_PARQUET = True
+
+# Minutos sin filas que separan dos corridas al migrar `productos` al esquema normalizado
+GAP_CORRIDA_MINUTOS = 10
+
+# Scheduler: búsqueda completa por términos (descubrimiento) vs refresco por EAN
+HORAS_DESCUBRIMIENTO = "0"
+HORAS_REFRESCO = "12"
 
 # Configuración de la API
+API_BASE_URL = "https://d3e6htiiul5ek9.cloudfront.net/prod"
 API_TIMEOUT = 15  # segundos
 
+# Reintentos ante errores de conexión, 429 y 5xx (backoff exponencial + jitter)
+API_REINTENTOS = 3
+API_BACKOFF_BASE = 0.5  # segundos
+API_BACKOFF_MAX = 10  # segundos
+
+# Rate limiting adaptativo: techo de requests/segundo (0 = sin límite).
+# Baja automáticamente ante 429/503 y vuelve a subir hasta el techo.
+API_MAX_RPS = 10
+API_MIN_RPS = 0.5
+
+# Cache en disco de respuestas de la API (data/cache)
+# "normal": reutiliza respuestas de menos de CACHE_TTL segundos
+# "grabar": siempre consulta la API y refresca el cache
+# "reproducir": sirve sólo desde el cache, sin red (debugging, benchmarks)
+# "desactivado": sin cache
+CACHE_MODO = "normal"
+CACHE_TTL = 30 * 60  # segundos
+CACHE_MAX_MB = 200
+
+# Modo de scraping: "async" (términos en paralelo) o "secuencial" (fallback)
+MODO_SCRAPING = "async"
+CONCURRENCIA_SCRAPER = 8  # requests simultáneos en modo async
+
 # === NUEVA SECCIÓN: Configuración de análisis ===
 
 # Canasta básica para análisis
@@ -66,6 +171,23 @@ CANASTA_BASICA = [
     "hamburguesas carne",
 ]
 
+# Cantidad de referencia de cada categoría, en su unidad canónica (kg, lt o un).
+# El costo de una categoría es precio_unitario x esta cantidad, así no salta con
+# el tamaño del envase elegido (900 ml vs 1.5 lt de aceite). Si el producto elegido
+# viene en otra unidad o sin presentación reconocida, se usa precio x envases de
+# CANTIDADES_CANASTA
+REFERENCIA_CANASTA = {
+    "leche entera": (3, "lt"),
+    "arroz largo fino": (4, "kg"),
+    "aceite girasol": (1, "lt"),
+    "azucar": (2, "kg"),
+    "yerba mate": (1, "kg"),
+    "fideos guiseros": (1.5, "kg"),
+    "harina 0000": (2, "kg"),
+    "hamburguesas carne": (0.5, "kg"),
+}
+
+# Envases por categoría (cuando no se puede usar REFERENCIA_CANASTA)
 CANTIDADES_CANASTA = {
     "leche entera": 3,
     "arroz largo fino": 4,
@@ -0,0 +1,159 @@
+"""
+Benchmark del scraper contra el mock local de la API
+
+Corre cada modo de scraping contra scripts/mock_api.py (sin red) y reporta
+productos/segundo y latencias p50/p99 por request.
+
+Uso:
+    python scripts/benchmark_scraper.py --latencia 0.2 --tasa-429 0.05
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+# Setup path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.scrapers.precios_claro import PreciosClarosScraper
+from mock_api import ConfigMock, iniciar_servidor
+import config
+
+MODOS = {
+    "secuencial": {"modo": "secuencial", "paginar": False},
+    "async": {"modo": "async", "paginar": False},
+    "secuencial-paginado": {"modo": "secuencial", "paginar": True},
+    "async-paginado": {"modo": "async", "paginar": True},
+}
+
+
+def medir_modo(base_url, nombre, terminos, limit, concurrencia, max_rps):
+    """Corre un modo de scraping y devuelve sus métricas"""
+    opciones = MODOS[nombre]
+    scraper = PreciosClarosScraper(
+        base_url=base_url, max_rps=max_rps, modo_cache="desactivado"
+    )
+
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        productos = scraper.buscar_productos(
+            terminos,
+            limit=limit,
+            modo=opciones["modo"],
+            concurrencia=concurrencia,
+            paginar=opciones["paginar"],
+        )
+    duracion = time.perf_counter() - inicio
+    scraper.cerrar()
+
+    latencia = scraper.estadisticas_latencia()
+    return {
+        "modo": nombre,
+        "productos": len(productos),
+        "segundos": duracion,
+        "productos_por_segundo": len(productos) / duracion if duracion else 0,
+        "requests": latencia["requests"],
+        "p50_ms": latencia["p50"] * 1000,
+        "p99_ms": latencia["p99"] * 1000,
+        "paginas_perdidas": len(scraper.errores),
+    }
+
+
+def ejecutar_benchmark(
+    modos=None,
+    terminos=None,
+    limit=None,
+    concurrencia=None,
+    max_rps=0,
+    config_mock=None,
+    base_url=None,
+):
+    """
+    Levanta el mock (salvo que se pase base_url) y mide cada modo.
+
+    max_rps: techo del rate limiter (0 = sin límite, mide sólo concurrencia)
+    """
+    if modos is None:
+        modos = list(MODOS)
+    if terminos is None:
+        terminos = config.CATEGORIAS_PRODUCTOS
+    if limit is None:
+        limit = config.LIMITE_PRODUCTOS_POR_CATEGORIA
+    if concurrencia is None:
+        concurrencia = config.CONCURRENCIA_SCRAPER
+
+    servidor = None
+    if base_url is None:
+        servidor, base_url = iniciar_servidor(config_mock)
+
+    print("=" * 90)
+    print("BENCHMARK DEL SCRAPER")
+    print("=" * 90)
+    print(f"API: {base_url}")
+    print(
+        f"Términos: {len(terminos)} | Límite/página: {limit} | "
+        f"Concurrencia: {concurrencia} | Max RPS: {max_rps or 'sin límite'}\n"
+    )
+    print(
+        f"{'Modo':22} | {'Productos':>9} | {'Seg':>7} | {'Prod/s':>8} | "
+        f"{'Requests':>8} | {'p50 ms':>7} | {'p99 ms':>7} | {'Perdidas':>8}"
+    )
+    print("-" * 90)
+
+    resultados = []
+    try:
+        for nombre in modos:
+            r = medir_modo(base_url, nombre, terminos, limit, concurrencia, max_rps)
+            resultados.append(r)
+            print(
+                f"{r['modo']:22} | {r['productos']:9} | {r['segundos']:7.2f} | "
+                f"{r['productos_por_segundo']:8.1f} | {r['requests']:8} | "
+                f"{r['p50_ms']:7.0f} | {r['p99_ms']:7.0f} | {r['paginas_perdidas']:8}"
+            )
+    finally:
+        if servidor is not None:
+            servidor.shutdown()
+
+    print("=" * 90)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del scraper")
+    parser.add_argument("--modos", nargs="+", choices=list(MODOS), default=list(MODOS))
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--concurrencia", type=int, default=None)
+    parser.add_argument("--max-rps", type=float, default=0)
+    parser.add_argument("--base-url", default=None, help="usar un mock ya levantado")
+    parser.add_argument("--latencia", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error", type=float, default=0.0)
+    parser.add_argument("--tasa-429", type=float, default=0.0)
+    parser.add_argument("--productos", type=int, default=120)
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    config_mock = ConfigMock(
+        latencia=args.latencia,
+        jitter=args.jitter,
+        tasa_error=args.error,
+        tasa_429=args.tasa_429,
+        productos_por_termino=args.productos,
+        semilla=args.semilla,
+    )
+    ejecutar_benchmark(
+        modos=args.modos,
+        limit=args.limit,
+        concurrencia=args.concurrencia,
+        max_rps=args.max_rps,
+        config_mock=config_mock,
+        base_url=args.base_url,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Servidor local que imita la API de Precios Claros (/productos)
+
+Sirve respuestas con la misma forma que la API real para poder medir el
+scraper sin red. Latencia, tasa de errores, 429 y tamaño del catálogo son
+configurables.
+
+Uso:
+    python scripts/mock_api.py --puerto 8765 --latencia 0.2 --error 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class ConfigMock:
+    """Parámetros de comportamiento del servidor"""
+
+    def __init__(
+        self,
+        latencia=0.1,
+        jitter=0.05,
+        tasa_error=0.0,
+        tasa_429=0.0,
+        productos_por_termino=120,
+        max_limit=100,
+        retry_after=None,
+        semilla=None,
+    ):
+        """
+        latencia: segundos base por respuesta
+        jitter: segundos aleatorios extra (uniforme 0..jitter)
+        tasa_error: probabilidad de responder 500
+        tasa_429: probabilidad de responder 429
+        productos_por_termino: tamaño del catálogo de cada búsqueda
+        max_limit: tope de `limit` por página (como maxLimitPermitido)
+        retry_after: valor del header Retry-After en los 429 (None = sin header)
+        semilla: semilla del generador aleatorio de errores
+        """
+        self.latencia = latencia
+        self.jitter = jitter
+        self.tasa_error = tasa_error
+        self.tasa_429 = tasa_429
+        self.productos_por_termino = productos_por_termino
+        self.max_limit = max_limit
+        self.retry_after = retry_after
+        self.random = random.Random(semilla)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+
+def generar_producto(termino, indice):
+    """Producto determinístico para (termino, indice)"""
+    semilla = hashlib.md5(f"{termino}:{indice}".encode()).hexdigest()
+    precio_min = 500 + int(semilla[:4], 16) % 5000
+    return {
+        "id": f"779{int(semilla[4:14], 16) % 10**10:010d}",
+        "nombre": f"{termino.title()} Producto {indice}",
+        "marca": f"MARCA {int(semilla[14:16], 16) % 12}",
+        "presentacion": "1.0 kg",
+        "precioMin": float(precio_min),
+        "precioMax": float(precio_min + int(semilla[16:19], 16) % 800),
+        "cantSucursalesDisponible": 1 + int(semilla[19:21], 16) % 40,
+    }
+
+
+class ManejadorMock(BaseHTTPRequestHandler):
+    """Responde GET /productos?string=&offset=&limit=&lat=&lng="""
+
+    config = ConfigMock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.endswith("/productos"):
+            self._responder(404, {"status": 404, "mensaje": "no encontrado"})
+            return
+
+        config = self.config
+        with config.lock:
+            config.requests += 1
+            sorteo = config.random.random()
+            demora = config.latencia + config.random.uniform(0, config.jitter)
+
+        time.sleep(demora)
+
+        if sorteo < config.tasa_429:
+            headers = {}
+            if config.retry_after is not None:
+                headers["Retry-After"] = str(config.retry_after)
+            self._responder(429, {"status": 429, "mensaje": "Too Many Requests"}, headers)
+            return
+        if sorteo < config.tasa_429 + config.tasa_error:
+            self._responder(500, {"status": 500, "mensaje": "Internal Server Error"})
+            return
+
+        params = parse_qs(url.query)
+        termino = params.get("string", [""])[0]
+        offset = int(params.get("offset", ["0"])[0])
+        limit = min(int(params.get("limit", ["30"])[0]), config.max_limit)
+
+        if termino.isdigit():
+            # Búsqueda por EAN (refresco): devuelve sólo ese producto
+            producto = generar_producto(termino, 0)
+            producto["id"] = termino
+            productos = [producto] if offset == 0 else []
+            total = 1
+        else:
+            total = config.productos_por_termino
+            productos = [
+                generar_producto(termino, i)
+                for i in range(offset, min(offset + limit, total))
+            ]
+        self._responder(
+            200,
+            {
+                "status": 200,
+                "total": total,
+                "maxLimitPermitido": config.max_limit,
+                "productos": productos,
+            },
+        )
+
+    def _responder(self, status, cuerpo, headers=None):
+        contenido = json.dumps(cuerpo).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(contenido)))
+        for nombre, valor in (headers or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(contenido)
+
+
+def iniciar_servidor(config=None, host="127.0.0.1", puerto=0):
+    """
+    Levanta el mock en un thread de fondo.
+
+    Devuelve (servidor, base_url). Usar servidor.shutdown() para detenerlo.
+    """
+    manejador = type("ManejadorMockConfigurado", (ManejadorMock,), {})
+    manejador.config = config or ConfigMock()
+
+    servidor = ThreadingHTTPServer((host, puerto), manejador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    host, puerto = servidor.server_address[:2]
+    return servidor, f"http://{host}:{puerto}/prod"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock local de la API de Precios Claros")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error", type=float, default=0.0, help="probabilidad de 500")
+    parser.add_argument("--tasa-429", type=float, default=0.0)
+    parser.add_argument("--productos", type=int, default=120)
+    parser.add_argument("--max-limit", type=int, default=100)
+    args = parser.parse_args()
+
+    config = ConfigMock(
+        latencia=args.latencia,
+        jitter=args.jitter,
+        tasa_error=args.error,
+        tasa_429=args.tasa_429,
+        productos_por_termino=args.productos,
+        max_limit=args.max_limit,
+    )
+    servidor, base_url = iniciar_servidor(config, args.host, args.puerto)
+    print(f"Mock de Precios Claros escuchando en {base_url}")
+    print("Ctrl+C para detener")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        servidor.shutdown()
+        print(f"\nRequests atendidas: {config.requests}")
+
+
+if __name__ == "__main__":
+    main()
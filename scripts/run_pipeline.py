@@ -1,4 +1,5 @@
 import sys
+from collections import Counter
 from pathlib import Path
 from datetime import datetime
 
@@ -6,96 +7,305 @@ from datetime import datetime
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from src.scrapers.precios_claro import PreciosClarosScraper
+from src.scrapers.precios_claro import scrapear_ubicaciones
 from src.utils.paths import init_directories
+from src.utils.analysis import deduplicar_por_ean
+from src.utils.anomalias import DetectorAnomalias, sembrar_estado
+from src.utils import archivo_parquet
+from src.utils.canasta import actualizar_costos_canasta
+from src.utils.indices import actualizar_indices
 from src.database import Database
+from src.database.normalizado import guardar_normalizado
 import config
 
 
-def ejecutar_pipeline(categorias=None, limit=None):
-    """Ejecuta el pipeline completo: scraping + guardado en DB"""
+def ejecutar_pipeline(
+    categorias=None,
+    limit=None,
+    modo=None,
+    paginar=None,
+    modo_cache=None,
+    ubicaciones=None,
+    estrategia="busqueda",
+):
+    """
+    Ejecuta el pipeline completo: scraping + guardado en DB
+
+    estrategia: 'busqueda' (descubrimiento: busca todos los términos) o
+        'refresco' (actualiza por EAN los productos ya conocidos en la DB)
+    modo: 'async' o 'secuencial' (default config.MODO_SCRAPING)
+    paginar: recorrer todas las páginas de cada término (default config.PAGINAR_BUSQUEDAS)
+    modo_cache: 'normal', 'grabar', 'reproducir' o 'desactivado' (default config.CACHE_MODO)
+    ubicaciones: claves de config.COORDENADAS a scrapear en paralelo, o "todas"
+        (default config.UBICACIONES_PIPELINE)
+    """
 
     print("=" * 70)
     print("PRICE MONITOR - PIPELINE DE RECOLECCIÓN")
     print("=" * 70)
     print(f"Inicio: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
 
+    if estrategia not in ("busqueda", "refresco"):
+        raise ValueError(
+            f"Estrategia '{estrategia}' no válida. Opciones: ['busqueda', 'refresco']"
+        )
+
+    almacenamiento = config.MODO_ALMACENAMIENTO
+    if almacenamiento not in ("legacy", "normalizado", "ambos"):
+        raise ValueError(
+            f"MODO_ALMACENAMIENTO '{almacenamiento}' no válido. "
+            "Opciones: ['legacy', 'normalizado', 'ambos']"
+        )
+
     # Inicializar
     init_directories()
+    db = Database("price_monitor.db")
 
     # 1. Scraping
     print("1. SCRAPING DE DATOS")
     print("-" * 70)
 
-    scraper = PreciosClarosScraper(ubicacion="CABA")
-
     # Usar valores por defecto del config
     if categorias is None:
         categorias = config.CATEGORIAS_PRODUCTOS
     if limit is None:
         limit = config.LIMITE_PRODUCTOS_POR_CATEGORIA
+    if modo is None:
+        modo = config.MODO_SCRAPING
+    if paginar is None:
+        paginar = config.PAGINAR_BUSQUEDAS
+    if ubicaciones is None:
+        ubicaciones = config.UBICACIONES_PIPELINE
+    elif ubicaciones == "todas":
+        ubicaciones = list(config.COORDENADAS)
+    if not ubicaciones:
+        raise ValueError(
+            f"No hay ubicaciones para scrapear. Opciones: {list(config.COORDENADAS)}"
+        )
 
     print(f"Categorías a buscar ({len(categorias)}): {', '.join(categorias[:5])}...")
     if len(categorias) > 5:
         print(f"  ... y {len(categorias) - 5} más")
-    print(f"Límite por categoría: {limit}\n")
-
-    productos = scraper.buscar_productos(categorias, limit=limit)
-
-    # Filtrar productos con precios absurdos Y palabras problemáticas
-    productos_antes = len(productos)
-
-    productos_filtrados = []
-    for p in productos:
-        # Filtro 1: Precio máximo
-        if p["precio"] >= 50000:
-            continue
-
-        # Filtro 2: Palabras contradictorias por categoría
-        nombre_lower = p["nombre"].lower()
-
-        # Si es categoría azúcar, excluir "sin azúcar"
-        if p["categoria"] in ["azucar", "azucar comun", "azucar blanca"]:
-            if (
-                "sin azucar" in nombre_lower
-                or "sin azúcar" in nombre_lower
-                or "0%" in nombre_lower
-            ):
-                continue
-
-        productos_filtrados.append(p)
-
-    productos = productos_filtrados
-    productos_despues = len(productos)
-
-    if productos_antes != productos_despues:
+    if paginar:
         print(
-            f"\nFiltrados {productos_antes - productos_despues} productos no relevantes"
+            f"Paginado: {limit} por página, hasta "
+            f"{config.MAX_PRODUCTOS_POR_CATEGORIA} por categoría"
+        )
+    else:
+        print(f"Límite por categoría: {limit}")
+    print(f"Ubicaciones: {', '.join(ubicaciones)}")
+    print(f"Modo de scraping: {modo}")
+    print(f"Estrategia: {estrategia}\n")
+
+    eans_por_ubicacion = None
+    if estrategia == "refresco":
+        eans_por_ubicacion = {
+            u: db.obtener_eans_conocidos(u, config.DIAS_EANS_REFRESCO) for u in ubicaciones
+        }
+        for ubicacion, eans in eans_por_ubicacion.items():
+            if not eans:
+                print(f"[{ubicacion}] Sin EANs conocidos: se hace búsqueda completa")
+        print()
+
+    # Una corrida por ubicación, todas con el mismo timestamp
+    timestamp_corrida = datetime.now()
+    corridas = {
+        u: db.iniciar_corrida(u, timestamp_corrida, estrategia) for u in ubicaciones
+    }
+
+    # Cualquier excepción hasta terminar de guardar deja las corridas en error
+    try:
+        productos, scrapers, estrategias = scrapear_ubicaciones(
+            ubicaciones,
+            categorias,
+            limit=limit,
+            eans_por_ubicacion=eans_por_ubicacion,
+            modo=modo,
+            paginar=paginar,
+            modo_cache=modo_cache,
+            timestamp_corrida=timestamp_corrida,
         )
-        print(f"\nTotal obtenido: {len(productos)} productos")
-
-    # 2. Guardar en base de datos
-    print("\n2. GUARDANDO EN BASE DE DATOS")
-    print("-" * 70)
 
-    db = Database("price_monitor.db")
-    exito = db.guardar_productos(productos)
+        for ubicacion, scraper in scrapers.items():
+            latencia = scraper.estadisticas_latencia()
+            print(
+                f"\n[{ubicacion}] Requests: {latencia['requests']} | "
+                f"p50: {latencia['p50'] * 1000:.0f} ms | "
+                f"p99: {latencia['p99'] * 1000:.0f} ms"
+            )
+            cache = scraper.cache.estadisticas()
+            if cache["modo"] != "desactivado":
+                print(
+                    f"[{ubicacion}] Cache ({cache['modo']}): {cache['aciertos']} aciertos, "
+                    f"{cache['fallos']} fallos"
+                )
+            if scraper.errores:
+                print(
+                    f"[{ubicacion}] Páginas perdidas tras reintentos: {len(scraper.errores)}"
+                )
+                for termino, offset, motivo in scraper.errores:
+                    print(f"  {termino} (offset {offset}): {motivo}")
+
+        # El rate limiter es compartido por todas las ubicaciones
+        scraper = next(iter(scrapers.values()))
+        if scraper.limitador:
+            limitador = scraper.limitador.estadisticas()
+            print(
+                f"\nRate limit: {limitador['tasa_actual']:.1f}/{limitador['tasa_max']:.1f} req/s "
+                f"| Bajas por 429/503: {limitador['penalizaciones']}"
+            )
+
+        if len(ubicaciones) > 1:
+            por_ubicacion = Counter(p["ubicacion"] for p in productos)
+            for ubicacion in ubicaciones:
+                print(f"  {ubicacion}: {por_ubicacion.get(ubicacion, 0)} productos")
+
+        # Filtrar productos con precios absurdos Y palabras problemáticas
+        productos_antes = len(productos)
+
+        productos_filtrados = []
+        for p in productos:
+            # Filtro 1: Precio máximo (con el detector lo aplica por EAN sin historial)
+            if not config.DETECTAR_ANOMALIAS and p["precio"] >= config.PRECIO_MAXIMO:
+                continue
 
-    if not exito:
-        print("Error guardando en base de datos")
-        return
+            # Filtro 2: Palabras contradictorias por categoría
+            nombre_lower = p["nombre"].lower()
+
+            # Si es categoría azúcar, excluir "sin azúcar"
+            if p["categoria"] in ["azucar", "azucar comun", "azucar blanca"]:
+                if (
+                    "sin azucar" in nombre_lower
+                    or "sin azúcar" in nombre_lower
+                    or "0%" in nombre_lower
+                ):
+                    continue
+
+            productos_filtrados.append(p)
+
+        productos = productos_filtrados
+        productos_despues = len(productos)
+
+        if productos_antes != productos_despues:
+            print(
+                f"\nFiltrados {productos_antes - productos_despues} productos no relevantes"
+            )
+            print(f"\nTotal obtenido: {len(productos)} productos")
+
+        # Deduplicar EANs repetidos entre términos solapados
+        membresia = {}
+        if config.DEDUPLICAR_EAN:
+            productos, membresia = deduplicar_por_ean(productos)
+            print(f"Productos únicos a guardar: {len(productos)}")
+
+        # 2. Guardar en base de datos
+        print("\n2. GUARDANDO EN BASE DE DATOS")
+        print("-" * 70)
+
+        for p in productos:
+            p["corrida_id"] = corridas[p["ubicacion"]]
+
+        # Precios anómalos por EAN a cuarentena, antes de tocar los agregados
+        detector = None
+        if config.DETECTAR_ANOMALIAS:
+            sembrar_estado(db)
+            detector = DetectorAnomalias(db)
+            productos, _ = detector.filtrar(productos)
+
+        def finalizar_corridas(estado):
+            guardados = Counter(p["ubicacion"] for p in productos)
+            for ubicacion, corrida_id in corridas.items():
+                db.finalizar_corrida(
+                    corrida_id,
+                    estado=estado,
+                    productos=guardados.get(ubicacion, 0),
+                    errores=len(scrapers[ubicacion].errores),
+                    estrategia=estrategias[ubicacion],
+                )
+
+        estado = "ok"
+        if almacenamiento in ("legacy", "ambos"):
+            if config.MODO_INGESTA == "merge":
+                # Staging + merge por (EAN, ubicación, franja): las re-ejecuciones no duplican
+                exito = db.guardar_productos_merge(productos)["error"] is None
+            else:
+                # Inserción en bloque, con un commit por chunk
+                tam_chunk = config.TAM_CHUNK_INSERT
+                resultado = db.guardar_productos_bulk(productos, tam_chunk)
+                exito = not any(chunk["error"] for chunk in resultado)
+
+                if not exito and not all(chunk["error"] for chunk in resultado):
+                    # Los chunks ya commiteados quedan guardados: el resto del
+                    # pipeline sigue sólo con esos productos
+                    productos = [
+                        p
+                        for chunk in resultado
+                        if not chunk["error"]
+                        for p in productos[
+                            chunk["chunk"] * tam_chunk : (chunk["chunk"] + 1) * tam_chunk
+                        ]
+                    ]
+                    print(
+                        f"Guardado parcial: algunos chunks fallaron, "
+                        f"{len(productos)} productos guardados"
+                    )
+                    estado = "parcial"
+                    exito = True
+
+            if not exito:
+                print("Error guardando en base de datos")
+                finalizar_corridas("error")
+                return
+
+        if almacenamiento in ("normalizado", "ambos"):
+            try:
+                guardar_normalizado(db, productos)
+            except Exception as e:
+                print(f"Error guardando observaciones normalizadas: {e}")
+                finalizar_corridas("error")
+                return
+
+        if detector is not None:
+            detector.confirmar(productos)
+
+        if membresia:
+            db.guardar_membresia_categorias(membresia)
+
+        finalizar_corridas(estado)
+    except Exception:
+        for corrida_id in corridas.values():
+            db.finalizar_corrida(corrida_id, estado="error")
+        raise
+
+    print(
+        "Corridas: "
+        + ", ".join(f"{u} #{corrida_id}" for u, corrida_id in corridas.items())
+    )
+
+    # Serie del costo de la canasta: sólo calcula las corridas nuevas
+    actualizar_costos_canasta(db)
+
+    # Índices de precios encadenados: sólo encadena los días nuevos
+    actualizar_indices(db)
 
     # 3. Backup en CSV
     print("\n3. BACKUP EN CSV")
     print("-" * 70)
     scraper.guardar_csv_backup(productos)
 
+    if config.ARCHIVAR_PARQUET:
+        if archivo_parquet.disponible():
+            archivo_parquet.archivar_corrida(productos)
+        else:
+            print("duckdb no instalado: se omite el archivo Parquet")
+
     # 4. Mostrar estadísticas
     print("\n4. ESTADÍSTICAS ACTUALES")
     print("-" * 70)
 
     stats = db.obtener_estadisticas_generales()
     print(f"Total productos en DB: {stats['total_productos']}")
+    print(f"Corridas completadas: {stats['total_corridas']}")
     print(f"Categorías únicas: {len(stats['categorias'])}")
     print(f"Fuentes: {', '.join(stats['fuentes_productos'])}")
 
@@ -124,11 +334,17 @@ def ejecutar_pipeline(categorias=None, limit=None):
 
     from src.utils.analysis import calcular_costo_canasta_basica, estadisticas_por_grupo
 
+    # Acotado a la corrida actual si hubo una sola ubicación, si no al día
+    if len(corridas) == 1:
+        ventana = {"corrida_id": next(iter(corridas.values()))}
+    else:
+        ventana = {"desde": timestamp_corrida, "hasta": timestamp_corrida}
+
     # Canasta básica
-    canasta = calcular_costo_canasta_basica(db)
+    canasta = calcular_costo_canasta_basica(db, **ventana)
 
     # Estadísticas por grupo
-    stats_grupos = estadisticas_por_grupo(db)
+    stats_grupos = estadisticas_por_grupo(db, **ventana)
 
     # FIN - esto cierra la función
     print("\n" + "=" * 70)
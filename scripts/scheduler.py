@@ -13,6 +13,8 @@ import logging
 
 # Importar el pipeline
 from run_pipeline import ejecutar_pipeline
+from src.database.operations import horas_bucket
+import config
 
 # Configurar logging
 log_dir = project_root / "logs"
@@ -31,14 +33,19 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def job_diario():
-    """Job que se ejecuta automáticamente cada día"""
+def job_diario(estrategia="busqueda"):
+    """
+    Job programado de recolección
+
+    estrategia: 'busqueda' (descubrimiento completo por términos) o
+        'refresco' (sólo precios de EANs conocidos)
+    """
     logger.info("=" * 80)
-    logger.info("INICIANDO RECOLECCIÓN PROGRAMADA")
+    logger.info(f"INICIANDO RECOLECCIÓN PROGRAMADA ({estrategia.upper()})")
     logger.info("=" * 80)
 
     try:
-        ejecutar_pipeline()
+        ejecutar_pipeline(estrategia=estrategia)
         logger.info("Recolección completada exitosamente")
     except Exception as e:
         logger.error(f"Error durante la recolección: {e}", exc_info=True)
@@ -48,14 +55,26 @@ def job_diario():
 
 def main():
     """Inicia el scheduler"""
+    # Falla antes de arrancar si dos corridas programadas comparten franja
+    franja = horas_bucket()
+
     # Crear scheduler
     scheduler = BlockingScheduler()
 
-    # Configurar ejecución diaria a las 8:00 AM
+    # Descubrimiento: búsqueda completa por términos (cadencia lenta)
+    scheduler.add_job(
+        job_diario,
+        CronTrigger(hour=config.HORAS_DESCUBRIMIENTO, minute=0),
+        kwargs={"estrategia": "busqueda"},
+        id="descubrimiento",
+    )
+
+    # Refresco: sólo precios de los EANs ya conocidos (cadencia rápida)
     scheduler.add_job(
         job_diario,
-        CronTrigger(hour="0,12", minute=0),
-        id="recoleccion_12hs",
+        CronTrigger(hour=config.HORAS_REFRESCO, minute=0),
+        kwargs={"estrategia": "refresco"},
+        id="refresco_eans",
     )
 
     # Mostrar info
@@ -63,8 +82,11 @@ def main():
     jobs = scheduler.get_jobs()
     if jobs:
         logger.info(f"Jobs programados: {len(jobs)}")
-        logger.info(f"  - {jobs[0].name}")
-    logger.info("Frecuencia: Diaria a las 8:00 AM")
+        for job in jobs:
+            logger.info(f"  - {job.id}")
+    logger.info(f"Descubrimiento: {config.HORAS_DESCUBRIMIENTO} hs")
+    logger.info(f"Refresco por EAN: {config.HORAS_REFRESCO} hs")
+    logger.info(f"Franja de idempotencia del merge: {franja} hs")
 
     job_diario()
 
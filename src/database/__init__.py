@@ -1,5 +1,36 @@
 # src/database/__init__.py
-from .models import Base, Producto
+from .models import (
+    Base,
+    Categoria,
+    Corrida,
+    CostoCanasta,
+    Cotizacion,
+    EstadisticaDiaria,
+    EstadoPrecio,
+    IndicePrecio,
+    Observacion,
+    Producto,
+    ProductoCategoria,
+    ProductoCuarentena,
+    ProductoDim,
+    Ubicacion,
+)
 from .operations import Database
 
-__all__ = ["Base", "Producto", "Database"]
+__all__ = [
+    "Base",
+    "Categoria",
+    "Corrida",
+    "CostoCanasta",
+    "Cotizacion",
+    "EstadisticaDiaria",
+    "EstadoPrecio",
+    "IndicePrecio",
+    "Observacion",
+    "Producto",
+    "ProductoCategoria",
+    "ProductoCuarentena",
+    "ProductoDim",
+    "Ubicacion",
+    "Database",
+]
@@ -0,0 +1,62 @@
+"""
+Configuración de engines SQLite (PRAGMAs, engine de escritura y de lectura)
+"""
+
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+
+try:
+    import config
+except ImportError:
+    import sys
+
+    project_root = Path(__file__).parent.parent.parent
+    sys.path.insert(0, str(project_root))
+    import config
+
+# PRAGMAs que sólo tienen sentido en la conexión que escribe
+PRAGMAS_ESCRITURA = ("journal_mode", "synchronous")
+
+
+def crear_engine(db_path, solo_lectura=False, pragmas=None):
+    """
+    Crea un engine SQLite con los PRAGMAs de config.SQLITE_PRAGMAS y un
+    pool de conexiones (SQLITE_POOL_SIZE) para que varios threads consulten
+    en paralelo.
+
+    solo_lectura: abre el archivo con mode=ro y query_only, para lectores
+        (dashboard) que nunca deben tomar el lock de escritura. En WAL estos
+        lectores no bloquean ni son bloqueados por el pipeline.
+    """
+    if pragmas is None:
+        pragmas = config.SQLITE_PRAGMAS
+
+    busy_timeout = pragmas.get("busy_timeout", 5000)
+    connect_args = {"timeout": busy_timeout / 1000, "check_same_thread": False}
+
+    if solo_lectura:
+        ruta = Path(db_path).resolve().as_posix()
+        url = f"sqlite:///file:{ruta}?mode=ro&uri=true"
+        pragmas = {k: v for k, v in pragmas.items() if k not in PRAGMAS_ESCRITURA}
+        pragmas["query_only"] = "ON"
+    else:
+        url = f"sqlite:///{db_path}"
+
+    engine = create_engine(
+        url,
+        echo=False,
+        connect_args=connect_args,
+        pool_size=config.SQLITE_POOL_SIZE,
+        max_overflow=config.SQLITE_POOL_MAX_OVERFLOW,
+        pool_pre_ping=True,
+    )
+
+    @event.listens_for(engine, "connect")
+    def aplicar_pragmas(conexion_dbapi, _registro):
+        cursor = conexion_dbapi.cursor()
+        for nombre, valor in pragmas.items():
+            cursor.execute(f"PRAGMA {nombre}={valor}")
+        cursor.close()
+
+    return engine
@@ -1,5 +1,17 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Index
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Float,
+    Boolean,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    UniqueConstraint,
+    text,
+)
+from sqlalchemy.orm import declarative_base
 from datetime import datetime
 
 Base = declarative_base()
@@ -24,6 +36,16 @@ class Producto(Base):
     sucursales_disponibles = Column(Integer)
     lat = Column(Float)
     lng = Column(Float)
+    ubicacion = Column(String(50), index=True)  # clave en config.COORDENADAS
+    corrida_id = Column(Integer, ForeignKey("corridas.id"), index=True)
+    # Franja horaria ("2025-11-21T12", ver operations.horas_bucket): clave de
+    # idempotencia junto con (ean, ubicacion). NULL en filas previas a la clave
+    bucket = Column(String(20))
+    # Presentación normalizada (ver src/database/unidades.py): magnitud en
+    # kg / lt / un y precio por esa unidad, calculados al guardar
+    magnitud = Column(Float)
+    unidad = Column(String(5))
+    precio_unitario = Column(Float)
     # Campos opcionales para e-commerce
     vendedor = Column(String(100))
     link = Column(String(500))
@@ -33,7 +55,305 @@ class Producto(Base):
     __table_args__ = (
         Index("idx_fuente_categoria", "fuente", "categoria"),
         Index("idx_timestamp_fuente", "timestamp", "fuente"),
+        # Consultas frecuentes (ver src/database/plan_consultas.py)
+        Index("idx_categoria_precio", "categoria", "precio"),
+        Index("idx_categoria_precio_unitario", "categoria", "precio_unitario"),
+        Index("idx_precio", "precio"),
+        Index("idx_ean_timestamp", "ean", "timestamp"),
+        Index("idx_ubicacion_ean_timestamp", "ubicacion", "ean", "timestamp"),
+        # COALESCE: en un índice único NULL no choca con NULL, y las filas
+        # sin ubicación se duplicarían en cada re-ejecución
+        Index(
+            "uq_ean_ubicacion_bucket",
+            "ean",
+            text("COALESCE(ubicacion, '')"),
+            "bucket",
+            unique=True,
+            sqlite_where=text("bucket IS NOT NULL AND ean IS NOT NULL"),
+        ),
     )
 
     def __repr__(self):
         return f"<Producto {self.nombre[:30]}: ${self.precio}>"
+
+
+class Cotizacion(Base):
+    """Modelo para cotizaciones (dólar, crypto)"""
+
+    __tablename__ = "cotizaciones"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    timestamp = Column(DateTime, default=datetime.now, index=True)
+    fuente = Column(String(50))
+    nombre = Column(String(100), index=True)
+    precio_compra = Column(Float)
+    precio_venta = Column(Float)
+    moneda = Column(String(10))
+    fecha_actualizacion = Column(String(50))
+
+    __table_args__ = (Index("idx_nombre_timestamp", "nombre", "timestamp"),)
+
+    def __repr__(self):
+        return f"<Cotizacion {self.nombre}: ${self.precio_venta}>"
+
+
+class ProductoCategoria(Base):
+    """Categorías (términos de búsqueda) en las que aparece cada EAN"""
+
+    __tablename__ = "producto_categorias"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ean = Column(String(50), nullable=False)
+    categoria = Column(String(100), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("ean", "categoria", name="uq_ean_categoria"),
+        Index("idx_categoria_ean", "categoria", "ean"),
+    )
+
+    def __repr__(self):
+        return f"<ProductoCategoria {self.ean}: {self.categoria}>"
+
+
+class EstadisticaDiaria(Base):
+    """
+    Agregados de precio por día, ubicación y categoría. Cada guardado de
+    productos les suma (y en un merge, resta) sus filas en la misma
+    transacción; Database.recalcular_estadisticas_diarias los reconstruye.
+    """
+
+    __tablename__ = "estadisticas_diarias"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    fecha = Column(Date, nullable=False)
+    ubicacion = Column(String(50), nullable=False, default="")
+    categoria = Column(String(100), nullable=False, default="")
+    cantidad = Column(Integer, default=0)
+    suma = Column(Float, default=0)
+    minimo = Column(Float)
+    maximo = Column(Float)
+    suma_cuadrados = Column(Float, default=0)  # para el desvío estándar
+
+    __table_args__ = (
+        UniqueConstraint("fecha", "ubicacion", "categoria", name="uq_estadistica_diaria"),
+        Index("idx_estadistica_categoria_fecha", "categoria", "fecha"),
+    )
+
+    def __repr__(self):
+        return f"<EstadisticaDiaria {self.fecha} {self.categoria}: {self.cantidad}>"
+
+
+class CostoCanasta(Base):
+    """
+    Costo de la canasta básica (config.CANASTA_BASICA x REFERENCIA_CANASTA)
+    por corrida, calculado por src/utils/canasta.py sólo para las corridas
+    nuevas. `firma` identifica la composición de la canasta usada.
+    """
+
+    __tablename__ = "costos_canasta"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    corrida_id = Column(Integer, ForeignKey("corridas.id"), nullable=False, unique=True)
+    inicio = Column(DateTime)
+    fecha = Column(Date, index=True)
+    ubicacion = Column(String(50))
+    costo_total = Column(Float)
+    categorias = Column(Integer, default=0)  # categorías de la canasta con precio
+    completa = Column(Boolean, default=False)
+    firma = Column(String(32))
+
+    __table_args__ = (Index("idx_costo_canasta_ubicacion_fecha", "ubicacion", "fecha"),)
+
+    def __repr__(self):
+        return f"<CostoCanasta corrida {self.corrida_id}: ${self.costo_total}>"
+
+
+class IndicePrecio(Base):
+    """
+    Índices de precios encadenados (base 100 en el primer día) por
+    categoría, grupo de config.CATEGORIAS_AGRUPADAS y general. Los calcula
+    src/utils/indices.py sobre EANs presentes en días consecutivos.
+    """
+
+    __tablename__ = "indices_precios"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    fecha = Column(Date, nullable=False)
+    nivel = Column(String(20), nullable=False)  # categoria, grupo o general
+    nombre = Column(String(100), nullable=False)
+    jevons = Column(Float)
+    laspeyres = Column(Float)  # ponderado por sucursales del día anterior
+    pareados = Column(Integer, default=0)  # productos presentes en ambos días
+
+    __table_args__ = (
+        UniqueConstraint("fecha", "nivel", "nombre", name="uq_indice_precio"),
+        Index("idx_indice_nivel_nombre_fecha", "nivel", "nombre", "fecha"),
+    )
+
+    def __repr__(self):
+        return f"<IndicePrecio {self.fecha} {self.nivel}/{self.nombre}: {self.jevons}>"
+
+
+class EstadoPrecio(Base):
+    """
+    Estado del detector de anomalías por EAN y ubicación
+    (src/utils/anomalias.py): media y varianza (Welford), último precio
+    aceptado y EWMA
+    """
+
+    __tablename__ = "estado_precios"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ean = Column(String(50), nullable=False)
+    ubicacion = Column(String(50), nullable=False, default="")
+    n = Column(Integer, default=0)
+    media = Column(Float)
+    m2 = Column(Float, default=0)  # suma de cuadrados de desvíos (Welford)
+    ultimo_precio = Column(Float)
+    ewma = Column(Float)
+    anomalias_seguidas = Column(Integer, default=0)
+    precio_pendiente = Column(Float)  # nivel de las anomalías seguidas
+    # Última franja evaluada (ver operations.horas_bucket): una re-ejecución en
+    # la misma franja no vuelve a contar la observación
+    bucket = Column(String(20))
+    actualizado = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        UniqueConstraint("ean", "ubicacion", name="uq_estado_ean_ubicacion"),
+    )
+
+    def __repr__(self):
+        return f"<EstadoPrecio {self.ean} ({self.ubicacion}): {self.media} (n={self.n})>"
+
+
+class ProductoCuarentena(Base):
+    """Observaciones marcadas como anómalas al guardar (no llegan a `productos`)"""
+
+    __tablename__ = "cuarentena"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    timestamp = Column(DateTime, default=datetime.now, index=True)
+    corrida_id = Column(Integer, ForeignKey("corridas.id"), index=True)
+    fuente = Column(String(50))
+    categoria = Column(String(100))
+    nombre = Column(String(300))
+    marca = Column(String(100))
+    precio = Column(Float)
+    presentacion = Column(String(100))
+    ean = Column(String(50), index=True)
+    sucursales_disponibles = Column(Integer)
+    ubicacion = Column(String(50))
+    motivo = Column(String(20))  # precio_maximo, salto o desvio
+    referencia = Column(Float)  # EWMA (o último precio) del EAN al evaluar
+    z = Column(Float)
+    bucket = Column(String(20))  # franja, como en `productos`
+
+    __table_args__ = (
+        Index(
+            "uq_cuarentena_ean_ubicacion_bucket",
+            "ean",
+            text("COALESCE(ubicacion, '')"),
+            "bucket",
+            unique=True,
+            sqlite_where=text("bucket IS NOT NULL AND ean IS NOT NULL"),
+        ),
+    )
+
+    def __repr__(self):
+        return f"<ProductoCuarentena {self.ean}: ${self.precio} ({self.motivo})>"
+
+
+# === Esquema normalizado (ver src/database/normalizado.py) ===
+
+
+class ProductoDim(Base):
+    """Dimensión de productos: una fila por EAN"""
+
+    __tablename__ = "dim_productos"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ean = Column(String(50), nullable=False, unique=True)
+    fuente = Column(String(50))
+    nombre = Column(String(300))
+    marca = Column(String(100))
+    presentacion = Column(String(100))
+
+    def __repr__(self):
+        return f"<ProductoDim {self.ean}: {self.nombre[:30]}>"
+
+
+class Categoria(Base):
+    """Lookup de categorías (términos de búsqueda)"""
+
+    __tablename__ = "categorias"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    nombre = Column(String(100), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f"<Categoria {self.nombre}>"
+
+
+class Ubicacion(Base):
+    """Lookup de ubicaciones (claves de config.COORDENADAS)"""
+
+    __tablename__ = "ubicaciones"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    nombre = Column(String(50), nullable=False, unique=True)
+    lat = Column(Float)
+    lng = Column(Float)
+
+    def __repr__(self):
+        return f"<Ubicacion {self.nombre}>"
+
+
+class Corrida(Base):
+    """Una corrida de scraping en una ubicación"""
+
+    __tablename__ = "corridas"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    inicio = Column(DateTime, default=datetime.now, index=True)
+    fin = Column(DateTime)
+    fecha = Column(Date, index=True)  # día de `inicio`, para consultas por día
+    ubicacion_id = Column(Integer, ForeignKey("ubicaciones.id"), index=True)
+    estrategia = Column(String(20))  # 'busqueda' o 'refresco'
+    estado = Column(String(20), default="en_curso")  # en_curso, ok, parcial, error
+    productos = Column(Integer, default=0)
+    errores = Column(Integer, default=0)  # páginas perdidas tras reintentos
+
+    __table_args__ = (Index("idx_corrida_estado_ubicacion", "estado", "ubicacion_id"),)
+
+    def __repr__(self):
+        return f"<Corrida {self.id}: {self.inicio} ({self.estado})>"
+
+
+class Observacion(Base):
+    """
+    Precio observado de un producto (precios en centavos), válido desde la
+    corrida `corrida_id` hasta `corrida_hasta_id` inclusive. Con historial
+    sólo de cambios, una fila cubre varias corridas seguidas de la misma
+    ubicación en las que el precio no cambió.
+    """
+
+    __tablename__ = "observaciones"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    producto_id = Column(Integer, ForeignKey("dim_productos.id"), nullable=False)
+    corrida_id = Column(Integer, ForeignKey("corridas.id"), nullable=False)
+    corrida_hasta_id = Column(Integer, ForeignKey("corridas.id"))
+    categoria_id = Column(Integer, ForeignKey("categorias.id"))
+    precio_cents = Column(Integer)
+    precio_min_cents = Column(Integer)
+    precio_max_cents = Column(Integer)
+    sucursales = Column(Integer)
+
+    __table_args__ = (
+        UniqueConstraint("corrida_id", "producto_id", name="uq_corrida_producto"),
+        Index("idx_obs_producto_corrida", "producto_id", "corrida_id"),
+        Index("idx_obs_corrida_hasta", "corrida_hasta_id", "producto_id"),
+    )
+
+    def __repr__(self):
+        return f"<Observacion {self.producto_id}@{self.corrida_id}: {self.precio_cents}>"
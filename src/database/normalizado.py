@@ -0,0 +1,572 @@
+"""
+Almacenamiento normalizado: dimensión de productos + observaciones de precio
+
+En lugar de repetir nombre, marca, presentación, categoría y coordenadas en
+cada fila de `productos`, cada corrida guarda sólo una fila angosta por
+producto en `observaciones` (ids enteros y precios en centavos). Los textos
+viven una sola vez en `dim_productos`, `categorias` y `ubicaciones`.
+
+Con historial sólo de cambios (config.HISTORIAL_SOLO_CAMBIOS) una
+observación cubre un intervalo de corridas [corrida_id, corrida_hasta_id]:
+si el precio no cambió respecto de la corrida anterior, se extiende el
+intervalo en lugar de escribir otra fila. CONSULTA_PRODUCTOS y
+serie_temporal reconstruyen la serie completa, una fila por corrida.
+"""
+
+from pathlib import Path
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+try:
+    from .models import (
+        Categoria,
+        Corrida,
+        Observacion,
+        Producto,
+        ProductoDim,
+        Ubicacion,
+    )
+    import config
+except ImportError:
+    import sys
+
+    project_root = Path(__file__).parent.parent.parent
+    sys.path.insert(0, str(project_root))
+    from src.database.models import (
+        Categoria,
+        Corrida,
+        Observacion,
+        Producto,
+        ProductoDim,
+        Ubicacion,
+    )
+    import config
+
+# Máximo de parámetros por IN (...) para no pasarse del límite de SQLite
+TAM_LOTE_IN = 900
+
+VISTA_PRODUCTOS = "v_productos_normalizados"
+
+# Observaciones con la misma forma que la tabla `productos`, una fila por
+# corrida dentro del intervalo de validez de cada observación
+CONSULTA_PRODUCTOS = """
+    SELECT
+        o.id AS id,
+        c.id AS corrida_id,
+        c.inicio AS timestamp,
+        p.fuente AS fuente,
+        cat.nombre AS categoria,
+        p.nombre AS nombre,
+        p.marca AS marca,
+        o.precio_cents / 100.0 AS precio,
+        o.precio_min_cents / 100.0 AS precio_min,
+        o.precio_max_cents / 100.0 AS precio_max,
+        p.presentacion AS presentacion,
+        p.ean AS ean,
+        o.sucursales AS sucursales_disponibles,
+        u.lat AS lat,
+        u.lng AS lng,
+        u.nombre AS ubicacion
+    FROM observaciones o
+    JOIN corridas c0 ON c0.id = o.corrida_id
+    JOIN corridas c ON c.ubicacion_id IS c0.ubicacion_id
+        AND c.id BETWEEN o.corrida_id AND COALESCE(o.corrida_hasta_id, o.corrida_id)
+        AND COALESCE(c.estado, 'ok') != 'error'
+    JOIN dim_productos p ON p.id = o.producto_id
+    LEFT JOIN categorias cat ON cat.id = o.categoria_id
+    LEFT JOIN ubicaciones u ON u.id = c.ubicacion_id
+"""
+
+
+def a_centavos(precio):
+    """Precio en pesos -> centavos enteros"""
+    if precio is None:
+        return None
+    return int(round(float(precio) * 100))
+
+
+def nombre_ubicacion(prod):
+    """Ubicación del producto; si no está etiquetado la deduce de lat/lng"""
+    if prod.get("ubicacion"):
+        return prod["ubicacion"]
+    for nombre, coords in config.COORDENADAS.items():
+        if coords["lat"] == prod.get("lat") and coords["lng"] == prod.get("lng"):
+            return nombre
+    return f"{prod.get('lat')},{prod.get('lng')}"
+
+
+def guardar_normalizado(db, productos, solo_cambios=None):
+    """
+    Guarda los productos de una corrida en el esquema normalizado, en una
+    sola transacción: una observación por EAN en la corrida de cada producto
+    (p["corrida_id"], ver Database.iniciar_corrida). Si los productos no
+    traen corrida se crea una por ubicación.
+
+    solo_cambios: extender la observación vigente cuando precio, mínimo,
+        máximo, sucursales y categoría no cambiaron
+        (default config.HISTORIAL_SOLO_CAMBIOS)
+
+    Los productos sin EAN se descartan. Devuelve {ubicacion: corrida_id}.
+    """
+    if solo_cambios is None:
+        solo_cambios = config.HISTORIAL_SOLO_CAMBIOS
+
+    productos = [p for p in productos if p["ean"]]
+    if not productos:
+        return {}
+
+    por_ubicacion = {}
+    for prod in productos:
+        por_ubicacion.setdefault(nombre_ubicacion(prod), []).append(prod)
+
+    corridas = {}
+    nuevas = extendidas = 0
+    with db.sesion() as sesion:
+        ids_ubicacion = _asegurar_ubicaciones(sesion, por_ubicacion)
+        ids_categoria = _asegurar_categorias(sesion, {p["categoria"] for p in productos})
+        ids_producto = _asegurar_productos(sesion, productos)
+
+        for ubicacion, grupo in por_ubicacion.items():
+            corrida_id = grupo[0].get("corrida_id")
+            if corrida_id is None:
+                inicio = min(p["timestamp"] for p in grupo)
+                corrida = Corrida(
+                    inicio=inicio,
+                    fecha=inicio.date(),
+                    ubicacion_id=ids_ubicacion[ubicacion],
+                    estado="ok",
+                    productos=len(grupo),
+                )
+                sesion.add(corrida)
+                sesion.flush()
+                corrida_id = corrida.id
+
+            corridas[ubicacion] = corrida_id
+            n, e = _insertar_observaciones(
+                sesion,
+                corrida_id,
+                ids_ubicacion[ubicacion],
+                grupo,
+                ids_producto,
+                ids_categoria,
+                solo_cambios,
+            )
+            nuevas += n
+            extendidas += e
+
+    print(
+        f"Guardadas {nuevas} observaciones normalizadas ({len(corridas)} corridas)"
+        + (f", {extendidas} sin cambios extendidas" if solo_cambios else "")
+    )
+    return corridas
+
+
+def migrar_productos_legacy(db, forzar=False, solo_cambios=None):
+    """
+    Copia la tabla `productos` al esquema normalizado, respetando la corrida
+    de cada fila (productos.corrida_id, reconstruida para los datos previos
+    a la tabla de corridas al migrar el esquema).
+    No hace nada si ya hay observaciones, salvo `forzar`.
+    """
+    if solo_cambios is None:
+        solo_cambios = config.HISTORIAL_SOLO_CAMBIOS
+
+    with db.sesion() as sesion:
+        existentes = sesion.query(func.count(Observacion.id)).scalar()
+        if existentes and not forzar:
+            print(f"El esquema normalizado ya tiene {existentes} observaciones")
+            return 0
+
+        columnas = [
+            Producto.corrida_id,
+            Producto.timestamp,
+            Producto.fuente,
+            Producto.categoria,
+            Producto.nombre,
+            Producto.marca,
+            Producto.precio,
+            Producto.precio_min,
+            Producto.precio_max,
+            Producto.presentacion,
+            Producto.ean,
+            Producto.sucursales_disponibles,
+            Producto.lat,
+            Producto.lng,
+            Producto.ubicacion,
+        ]
+        filas = [
+            dict(f._mapping)
+            for f in sesion.execute(
+                select(*columnas)
+                .where(
+                    Producto.ean.isnot(None),
+                    Producto.ean != "",
+                    Producto.corrida_id.isnot(None),
+                )
+                .order_by(Producto.corrida_id)
+            )
+        ]
+        if not filas:
+            return 0
+
+        por_corrida = {}
+        for fila in filas:
+            por_corrida.setdefault(fila["corrida_id"], []).append(fila)
+        ubicacion_de = dict(
+            sesion.execute(
+                select(Corrida.id, Corrida.ubicacion_id).where(
+                    Corrida.id.in_(list(por_corrida))
+                )
+            ).all()
+        )
+
+        ids_categoria = _asegurar_categorias(sesion, {f["categoria"] for f in filas})
+        ids_producto = _asegurar_productos(sesion, filas)
+
+        for corrida_id, grupo in por_corrida.items():
+            _insertar_observaciones(
+                sesion,
+                corrida_id,
+                ubicacion_de[corrida_id],
+                grupo,
+                ids_producto,
+                ids_categoria,
+                solo_cambios,
+            )
+
+        observaciones = sesion.query(func.count(Observacion.id)).scalar()
+
+    print(
+        f"Migradas {len(filas)} filas de productos de {len(por_corrida)} corridas: "
+        f"{observaciones} observaciones de {len(ids_producto)} productos únicos"
+    )
+    return len(filas)
+
+
+def crear_vista(db):
+    """Vista SQL con CONSULTA_PRODUCTOS, para leer el esquema normalizado desde SQL"""
+    with db.engine.begin() as conn:
+        conn.execute(text(f"DROP VIEW IF EXISTS {VISTA_PRODUCTOS}"))
+        conn.execute(
+            text(f"CREATE VIEW IF NOT EXISTS {VISTA_PRODUCTOS} AS {CONSULTA_PRODUCTOS}")
+        )
+
+
+def cargar_dataframe(db, corrida_id=None, corridas=None):
+    """
+    DataFrame con forma de `productos` leído del esquema normalizado
+
+    corrida_id: una sola corrida; corridas: lista de corridas (default todas)
+    """
+    import pandas as pd
+
+    if corrida_id is not None:
+        return _leer_productos(db, ["c.id = :corrida_id"], {"corrida_id": corrida_id})
+    if corridas is None:
+        return _leer_productos(db, [], {})
+
+    corridas = list(corridas)
+    lotes = []
+    for inicio in range(0, len(corridas), TAM_LOTE_IN):
+        lote = corridas[inicio : inicio + TAM_LOTE_IN]
+        marcadores = ", ".join(f":c{i}" for i in range(len(lote)))
+        lotes.append(
+            _leer_productos(
+                db,
+                [f"c.id IN ({marcadores})"],
+                {f"c{i}": corrida for i, corrida in enumerate(lote)},
+            )
+        )
+    if not lotes:
+        return _leer_productos(db, ["0"], {})
+    return pd.concat(lotes, ignore_index=True)
+
+
+def serie_temporal(db, eans=None, ubicacion=None, desde=None, hasta=None):
+    """
+    Serie completa de precios, una fila por producto y corrida, expandiendo
+    los intervalos del historial sólo de cambios.
+
+    eans: lista de EANs (default todos)
+    ubicacion: nombre de la ubicación (default todas)
+    desde, hasta: rango de fechas de las corridas
+    """
+    condiciones = []
+    parametros = {}
+    if eans is not None:
+        eans = list(eans)
+        marcadores = ", ".join(f":ean{i}" for i in range(len(eans)))
+        condiciones.append(f"p.ean IN ({marcadores})" if eans else "0")
+        parametros.update({f"ean{i}": ean for i, ean in enumerate(eans)})
+    if ubicacion is not None:
+        condiciones.append("u.nombre = :ubicacion")
+        parametros["ubicacion"] = ubicacion
+    if desde is not None:
+        condiciones.append("c.inicio >= :desde")
+        parametros["desde"] = desde
+    if hasta is not None:
+        condiciones.append("c.inicio <= :hasta")
+        parametros["hasta"] = hasta
+
+    df = _leer_productos(db, condiciones, parametros)
+    return df.sort_values(["ean", "ubicacion", "timestamp"]).reset_index(drop=True)
+
+
+def compactar_observaciones(db):
+    """
+    Pasa el historial existente a sólo cambios: une observaciones de
+    corridas consecutivas (misma ubicación) con los mismos valores en una
+    sola fila con intervalo. Devuelve la cantidad de filas eliminadas.
+    """
+    eliminadas = 0
+    with db.sesion() as sesion:
+        ubicaciones = [
+            fila[0] for fila in sesion.execute(select(Corrida.ubicacion_id).distinct())
+        ]
+        for ubicacion_id in ubicaciones:
+            orden = {
+                corrida_id: posicion
+                for posicion, (corrida_id,) in enumerate(
+                    sesion.execute(
+                        select(Corrida.id)
+                        .where(
+                            Corrida.ubicacion_id.is_(ubicacion_id),
+                            func.coalesce(Corrida.estado, "ok") != "error",
+                        )
+                        .order_by(Corrida.id)
+                    )
+                )
+            }
+            filas = sesion.execute(
+                select(
+                    Observacion.id,
+                    Observacion.producto_id,
+                    Observacion.corrida_id,
+                    func.coalesce(Observacion.corrida_hasta_id, Observacion.corrida_id),
+                    *_COLUMNAS_VALOR,
+                )
+                .join(Corrida, Corrida.id == Observacion.corrida_id)
+                .where(Corrida.ubicacion_id.is_(ubicacion_id))
+                .order_by(Observacion.producto_id, Observacion.corrida_id)
+            )
+
+            actual = None
+            hastas = {}
+            borrar = []
+            for id_, producto_id, desde, hasta, *valores in filas:
+                if (
+                    actual is not None
+                    and actual["producto_id"] == producto_id
+                    and actual["valores"] == valores
+                    and orden[desde] == orden[actual["hasta"]] + 1
+                ):
+                    actual["hasta"] = hasta
+                    hastas[actual["id"]] = hasta
+                    borrar.append(id_)
+                else:
+                    actual = {
+                        "id": id_,
+                        "producto_id": producto_id,
+                        "valores": valores,
+                        "hasta": hasta,
+                    }
+
+            if hastas:
+                sesion.execute(
+                    update(Observacion),
+                    [{"id": k, "corrida_hasta_id": v} for k, v in hastas.items()],
+                )
+            for inicio in range(0, len(borrar), TAM_LOTE_IN):
+                lote = borrar[inicio : inicio + TAM_LOTE_IN]
+                sesion.query(Observacion).filter(Observacion.id.in_(lote)).delete(
+                    synchronize_session=False
+                )
+            eliminadas += len(borrar)
+
+    print(f"Historial compactado: {eliminadas} observaciones sin cambios eliminadas")
+    return eliminadas
+
+
+def _leer_productos(db, condiciones, parametros):
+    import pandas as pd
+
+    consulta = CONSULTA_PRODUCTOS
+    if condiciones:
+        consulta += " WHERE " + " AND ".join(condiciones)
+
+    with db.engine.connect() as conn:
+        df = pd.read_sql(text(consulta), conn, params=parametros)
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    return df
+
+
+def _ids(sesion, columna_id, columna_clave, claves):
+    """{clave: id} para las claves dadas, consultando en lotes"""
+    claves = list(claves)
+    ids = {}
+    for inicio in range(0, len(claves), TAM_LOTE_IN):
+        lote = claves[inicio : inicio + TAM_LOTE_IN]
+        for id_, clave in sesion.execute(
+            select(columna_id, columna_clave).where(columna_clave.in_(lote))
+        ):
+            ids[clave] = id_
+    return ids
+
+
+def _asegurar_ubicaciones(sesion, por_ubicacion):
+    filas = []
+    for nombre, grupo in por_ubicacion.items():
+        coords = config.COORDENADAS.get(nombre) or {
+            "lat": grupo[0].get("lat"),
+            "lng": grupo[0].get("lng"),
+        }
+        filas.append({"nombre": nombre, "lat": coords["lat"], "lng": coords["lng"]})
+
+    sesion.execute(sqlite_insert(Ubicacion).on_conflict_do_nothing(), filas)
+    return _ids(sesion, Ubicacion.id, Ubicacion.nombre, por_ubicacion)
+
+
+def _asegurar_categorias(sesion, nombres):
+    nombres = [n for n in nombres if n]
+    if nombres:
+        sesion.execute(
+            sqlite_insert(Categoria).on_conflict_do_nothing(),
+            [{"nombre": n} for n in nombres],
+        )
+    return _ids(sesion, Categoria.id, Categoria.nombre, nombres)
+
+
+def _asegurar_productos(sesion, productos):
+    """Upsert de la dimensión: se queda con los datos descriptivos más nuevos"""
+    ultimos = {}
+    for prod in productos:
+        ultimos[prod["ean"]] = {
+            "ean": prod["ean"],
+            "fuente": prod.get("fuente"),
+            "nombre": prod.get("nombre"),
+            "marca": prod.get("marca"),
+            "presentacion": prod.get("presentacion"),
+        }
+
+    sentencia = sqlite_insert(ProductoDim)
+    sentencia = sentencia.on_conflict_do_update(
+        index_elements=["ean"],
+        set_={
+            "fuente": sentencia.excluded.fuente,
+            "nombre": sentencia.excluded.nombre,
+            "marca": sentencia.excluded.marca,
+            "presentacion": sentencia.excluded.presentacion,
+        },
+    )
+    sesion.execute(sentencia, list(ultimos.values()))
+    return _ids(sesion, ProductoDim.id, ProductoDim.ean, ultimos)
+
+
+def _insertar_observaciones(
+    sesion,
+    corrida_id,
+    ubicacion_id,
+    productos,
+    ids_producto,
+    ids_categoria,
+    solo_cambios=False,
+):
+    """
+    Inserta las observaciones de una corrida.
+
+    Con solo_cambios, las observaciones vigentes en la corrida anterior de
+    la misma ubicación (salteando corridas con error) cuyos valores no
+    cambiaron se extienden hasta esta.
+    Devuelve (observaciones nuevas, observaciones extendidas).
+    """
+    anterior = None
+    if solo_cambios:
+        anterior = sesion.execute(
+            select(func.max(Corrida.id)).where(
+                Corrida.ubicacion_id.is_(ubicacion_id),
+                Corrida.id < corrida_id,
+                func.coalesce(Corrida.estado, "ok") != "error",
+            )
+        ).scalar()
+
+    # Un mismo EAN puede venir repetido si no se deduplicó: queda el primero
+    filas = {}
+    for p in productos:
+        producto_id = ids_producto[p["ean"]]
+        if producto_id in filas:
+            continue
+        filas[producto_id] = {
+            "producto_id": producto_id,
+            "corrida_id": corrida_id,
+            "corrida_hasta_id": corrida_id,
+            "categoria_id": ids_categoria.get(p["categoria"]),
+            "precio_cents": a_centavos(p["precio"]),
+            "precio_min_cents": a_centavos(p["precio_min"]),
+            "precio_max_cents": a_centavos(p["precio_max"]),
+            "sucursales": p.get("sucursales_disponibles"),
+        }
+
+    extendidas = []
+    if anterior is not None:
+        # Sólo se extiende lo vigente en la corrida inmediatamente anterior:
+        # un producto que faltó en alguna corrida abre un intervalo nuevo
+        vigentes = _observaciones_vigentes(sesion, anterior, list(filas))
+        for producto_id, (observacion_id, valores) in vigentes.items():
+            fila = filas[producto_id]
+            if valores == tuple(fila[c.key] for c in _COLUMNAS_VALOR):
+                extendidas.append(observacion_id)
+                del filas[producto_id]
+
+        for i in range(0, len(extendidas), TAM_LOTE_IN):
+            sesion.execute(
+                update(Observacion)
+                .where(Observacion.id.in_(extendidas[i : i + TAM_LOTE_IN]))
+                .values(corrida_hasta_id=corrida_id)
+            )
+
+    if filas:
+        sesion.execute(
+            sqlite_insert(Observacion).on_conflict_do_nothing(
+                index_elements=["corrida_id", "producto_id"]
+            ),
+            list(filas.values()),
+        )
+    return len(filas), len(extendidas)
+
+
+# Valores que, si no cambian, permiten extender una observación
+_COLUMNAS_VALOR = (
+    Observacion.precio_cents,
+    Observacion.precio_min_cents,
+    Observacion.precio_max_cents,
+    Observacion.sucursales,
+    Observacion.categoria_id,
+)
+
+
+def _observaciones_vigentes(sesion, corrida_id, producto_ids):
+    """{producto_id: (observacion_id, valores)} de lo vigente en `corrida_id`"""
+    vigentes = {}
+    for inicio in range(0, len(producto_ids), TAM_LOTE_IN):
+        lote = producto_ids[inicio : inicio + TAM_LOTE_IN]
+        for id_, producto_id, *valores in sesion.execute(
+            select(Observacion.id, Observacion.producto_id, *_COLUMNAS_VALOR).where(
+                Observacion.corrida_hasta_id == corrida_id,
+                Observacion.producto_id.in_(lote),
+            )
+        ):
+            vigentes[producto_id] = (id_, tuple(valores))
+    return vigentes
+
+
+if __name__ == "__main__":
+    import sys
+
+    project_root = Path(__file__).parent.parent.parent
+    sys.path.insert(0, str(project_root))
+    from src.database import Database
+
+    db = Database(sys.argv[1] if len(sys.argv) > 1 else "price_monitor.db")
+    migrar_productos_legacy(db)
+    crear_vista(db)
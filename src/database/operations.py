@@ -1,112 +1,1171 @@
-from sqlalchemy import create_engine, func
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import bindparam, case, func, insert, inspect, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.schema import CreateIndex
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 # Import relativo del modelo
 try:
-    from .models import Base, Producto
+    from .engine import crear_engine
+    from .unidades import completar_unidades, parsear_presentaciones
+    from .models import (
+        Base,
+        Corrida,
+        Cotizacion,
+        EstadisticaDiaria,
+        EstadoPrecio,
+        Producto,
+        ProductoCategoria,
+        Ubicacion,
+    )
+    import config
 except ImportError:
     # Fallback para testing directo
     import sys
 
     project_root = Path(__file__).parent.parent.parent
     sys.path.insert(0, str(project_root))
-    from src.database.models import Base, Producto
+    from src.database.engine import crear_engine
+    from src.database.unidades import completar_unidades, parsear_presentaciones
+    from src.database.models import (
+        Base,
+        Corrida,
+        Cotizacion,
+        EstadisticaDiaria,
+        EstadoPrecio,
+        Producto,
+        ProductoCategoria,
+        Ubicacion,
+    )
+    import config
+
+
+# Agregados diarios por ubicación y categoría (tabla estadisticas_diarias).
+# El día de cada producto es el de su corrida.
+SQL_ESTADISTICAS_DIARIAS = """
+    INSERT INTO estadisticas_diarias
+        (fecha, ubicacion, categoria, cantidad, suma, minimo, maximo, suma_cuadrados)
+    SELECT
+        {dia} AS dia,
+        COALESCE(p.ubicacion, '') AS ubic,
+        COALESCE(p.categoria, '') AS cat,
+        COUNT(p.precio),
+        COALESCE(SUM(p.precio), 0),
+        MIN(p.precio),
+        MAX(p.precio),
+        COALESCE(SUM(p.precio * p.precio), 0)
+    FROM {origen}
+    {filtro}
+    GROUP BY dia, ubic, cat
+"""
+
+
+def horas_programadas(*expresiones):
+    """
+    Horas del día de expresiones `hour` de cron ("0", "6,12,18", "*/6",
+    "8-20/4"), por defecto las del scheduler (descubrimiento y refresco)
+    """
+    if not expresiones:
+        expresiones = (config.HORAS_DESCUBRIMIENTO, config.HORAS_REFRESCO)
+
+    horas = set()
+    for expresion in expresiones:
+        for parte in str(expresion).split(","):
+            rango, _, paso = parte.strip().partition("/")
+            if rango == "*":
+                desde, hasta = 0, 23
+            else:
+                desde, _, hasta = rango.partition("-")
+                desde = int(desde)
+                hasta = int(hasta) if hasta else (23 if paso else desde)
+            horas.update(range(desde, hasta + 1, int(paso or 1)))
+    return sorted(horas)
+
+
+def horas_bucket():
+    """
+    Tamaño en horas de la franja de la clave de idempotencia:
+    config.HORAS_BUCKET_INGESTA, o el menor intervalo entre corridas del
+    scheduler si es None. Falla si es mayor que ese intervalo, porque dos
+    corridas programadas compartirían franja y el merge pisaría la anterior.
+    """
+    horas = horas_programadas()
+    intervalo = min(
+        (b - a for a, b in zip(horas, horas[1:] + [horas[0] + 24])), default=24
+    )
+    tam = config.HORAS_BUCKET_INGESTA or intervalo
+    if tam > intervalo:
+        raise ValueError(
+            f"HORAS_BUCKET_INGESTA ({tam}) es mayor que el menor intervalo entre "
+            f"corridas programadas ({intervalo} hs): dos corridas compartirían franja"
+        )
+    return tam
+
+
+def clave_bucket(timestamp, horas=None):
+    """Franja horaria de `timestamp` para la clave de idempotencia ("2025-11-21T12")"""
+    if horas is None:
+        horas = horas_bucket()
+    return f"{timestamp:%Y-%m-%d}T{timestamp.hour // horas * horas:02d}"
 
 
 class Database:
-    """Maneja la conexión y operaciones de base de datos"""
+    """
+    Maneja la conexión y operaciones de base de datos.
+
+    Es seguro compartir una instancia entre threads: cada operación usa su
+    propia sesión (ver `sesion()`) sobre el pool de conexiones del engine, y
+    `self.session` es una sesión por thread (scoped_session) para el código
+    que consulta directo con db.session.query(...).
+    """
+
+    def __init__(self, db_path="price_monitor.db", solo_lectura=False):
+        """
+        db_path: archivo SQLite
+        solo_lectura: usar un engine de sólo lectura (dashboard). No crea ni
+            migra el esquema: si la base no existe o le faltan tablas/columnas
+            del modelo falla, y hay que abrirla antes en modo escritura
+            (por ejemplo corriendo el pipeline) para migrarla.
+        """
+        self.solo_lectura = solo_lectura
+
+        if solo_lectura:
+            if not Path(db_path).exists():
+                raise FileNotFoundError(f"No existe la base de datos {db_path}")
+            self.engine = crear_engine(db_path, solo_lectura=True)
+            self._verificar_esquema(db_path)
+        else:
+            self.engine = crear_engine(db_path)
+            Base.metadata.create_all(self.engine)
+            self._migrar_esquema()
+
+        self._fabrica = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.session = scoped_session(self._fabrica)
+        modo = " (sólo lectura)" if solo_lectura else ""
+        print(f"Base de datos inicializada{modo}: {db_path}")
+
+    @contextmanager
+    def sesion(self):
+        """
+        Unidad de trabajo: sesión propia que hace commit al salir del bloque,
+        rollback si hay una excepción, y siempre se cierra.
+
+            with db.sesion() as sesion:
+                sesion.query(Producto)...
+        """
+        sesion = self._fabrica()
+        try:
+            yield sesion
+            sesion.commit()
+        except Exception:
+            sesion.rollback()
+            raise
+        finally:
+            sesion.close()
+
+    def cerrar_sesion(self):
+        """Libera la sesión del thread actual (self.session)"""
+        self.session.remove()
+
+    def _verificar_esquema(self, db_path):
+        """Falla si a la base le faltan tablas o columnas del modelo"""
+        inspector = inspect(self.engine)
+        tablas = set(inspector.get_table_names())
+
+        faltantes = []
+        for tabla in Base.metadata.sorted_tables:
+            if tabla.name not in tablas:
+                faltantes.append(tabla.name)
+                continue
+            existentes = {c["name"] for c in inspector.get_columns(tabla.name)}
+            faltantes.extend(
+                f"{tabla.name}.{columna.name}"
+                for columna in tabla.columns
+                if columna.name not in existentes
+            )
 
-    def __init__(self, db_path="price_monitor.db"):
-        self.engine = create_engine(f"sqlite:///{db_path}", echo=False)
-        Base.metadata.create_all(self.engine)
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
-        print(f"Base de datos inicializada: {db_path}")
+        if faltantes:
+            self.engine.dispose()
+            raise RuntimeError(
+                f"El esquema de {db_path} está desactualizado (faltan: "
+                f"{', '.join(faltantes)}). Abrila en modo escritura, por ejemplo "
+                "corriendo el pipeline, para migrarla."
+            )
+
+    def _migrar_esquema(self):
+        """
+        Agrega a las tablas existentes las columnas e índices nuevos del
+        modelo (create_all sólo crea tablas que no existen)
+        """
+        columnas_nuevas = []
+
+        # estado_precios pasó de una fila por EAN a una por (EAN, ubicación).
+        # Es estado derivado: se recrea y sembrar_estado la vuelve a cargar
+        inspector = inspect(self.engine)
+        if "ubicacion" not in {c["name"] for c in inspector.get_columns("estado_precios")}:
+            with self.engine.begin() as conn:
+                conn.execute(text("DROP TABLE estado_precios"))
+                EstadoPrecio.__table__.create(conn)
+            columnas_nuevas.append("estado_precios (por ubicación)")
+
+        inspector = inspect(self.engine)
+        duplicados_borrados = False
+        with self.engine.begin() as conn:
+            for tabla in Base.metadata.sorted_tables:
+                existentes = {c["name"] for c in inspector.get_columns(tabla.name)}
+                for columna in tabla.columns:
+                    if columna.name in existentes:
+                        continue
+                    tipo = columna.type.compile(dialect=self.engine.dialect)
+                    conn.execute(
+                        text(
+                            f"ALTER TABLE {tabla.name} ADD COLUMN {columna.name} {tipo}"
+                        )
+                    )
+                    columnas_nuevas.append(f"{tabla.name}.{columna.name}")
+
+                for indice in tabla.indexes:
+                    borradas = self._sincronizar_indice(conn, indice)
+                    if borradas is not None:
+                        columnas_nuevas.append(f"{indice.name} (redefinido)")
+                        if borradas and tabla.name == "productos":
+                            duplicados_borrados = True
+
+            if "productos.ubicacion" in columnas_nuevas:
+                # Etiquetar filas viejas según sus coordenadas
+                for ubicacion, coords in config.COORDENADAS.items():
+                    conn.execute(
+                        text(
+                            "UPDATE productos SET ubicacion = :ubicacion "
+                            "WHERE ubicacion IS NULL AND lat = :lat AND lng = :lng"
+                        ),
+                        {"ubicacion": ubicacion, **coords},
+                    )
+
+            if "observaciones.corrida_hasta_id" in columnas_nuevas:
+                # Las observaciones previas valen sólo para su propia corrida
+                conn.execute(
+                    text(
+                        "UPDATE observaciones SET corrida_hasta_id = corrida_id "
+                        "WHERE corrida_hasta_id IS NULL"
+                    )
+                )
+
+            if "corridas.estado" in columnas_nuevas:
+                conn.execute(
+                    text(
+                        "UPDATE corridas SET estado = 'ok', fecha = date(inicio) "
+                        "WHERE estado IS NULL"
+                    )
+                )
+
+            if "productos.corrida_id" in columnas_nuevas:
+                self._asignar_corridas_legacy(conn)
+
+            if "productos.precio_unitario" in columnas_nuevas:
+                self._asignar_unidades_legacy(conn)
+
+            # Primera vez con la tabla de agregados (o se borraron filas
+            # duplicadas): calcularla sobre el historial
+            agregados = conn.execute(text("SELECT 1 FROM estadisticas_diarias LIMIT 1"))
+            productos = conn.execute(text("SELECT 1 FROM productos LIMIT 1"))
+            vacia = agregados.first() is None
+            if (vacia or duplicados_borrados) and productos.first() is not None:
+                self._reconstruir_estadisticas_diarias(conn)
+                columnas_nuevas.append("estadisticas_diarias")
+
+        if columnas_nuevas:
+            print(f"Esquema actualizado: {', '.join(columnas_nuevas)}")
+
+    def _sincronizar_indice(self, conn, indice):
+        """
+        Crea `indice` si falta, o lo recrea si en la base tiene otra
+        definición que en el modelo (create con checkfirst sólo mira el
+        nombre y no ve los índices sobre expresiones). Antes de recrear un
+        índice único borra las filas que el viejo dejaba duplicar, quedándose
+        con la más nueva. Devuelve cuántas filas borró, o None si no lo recreó.
+        """
+        actual = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = :nombre"),
+            {"nombre": indice.name},
+        ).scalar()
+        esperado = str(CreateIndex(indice).compile(dialect=self.engine.dialect))
+        if actual == esperado:
+            return None
+        if actual is None:
+            conn.execute(text(esperado))
+            return None
+
+        borradas = 0
+        if indice.unique:
+            expresiones = ", ".join(
+                str(e.compile(dialect=self.engine.dialect)) for e in indice.expressions
+            )
+            condicion = indice.dialect_options["sqlite"]["where"]
+            condicion = "1" if condicion is None else str(condicion)
+            tabla = indice.table.name
+            borradas = conn.execute(
+                text(
+                    f"DELETE FROM {tabla} WHERE {condicion} AND id NOT IN ("
+                    f"SELECT MAX(id) FROM {tabla} WHERE {condicion} "
+                    f"GROUP BY {expresiones})"
+                )
+            ).rowcount
+
+        conn.execute(text(f"DROP INDEX {indice.name}"))
+        conn.execute(text(esperado))
+        return borradas
+
+    def _asignar_corridas_legacy(self, conn):
+        """
+        Crea corridas para las filas de `productos` anteriores a la tabla de
+        corridas: por ubicación, se corta una corrida nueva cuando pasan más
+        de config.GAP_CORRIDA_MINUTOS entre dos timestamps consecutivos.
+        """
+        gap = timedelta(minutes=config.GAP_CORRIDA_MINUTOS)
+        filas = conn.execute(
+            select(
+                Producto.id,
+                Producto.ubicacion,
+                Producto.lat,
+                Producto.lng,
+                Producto.timestamp,
+            )
+            .where(Producto.corrida_id.is_(None))
+            .order_by(Producto.ubicacion, Producto.timestamp)
+        ).all()
+
+        grupos = []
+        for fila in filas:
+            actual = grupos[-1] if grupos else None
+            if (
+                actual is None
+                or actual["ubicacion"] != fila.ubicacion
+                or fila.timestamp - actual["fin"] > gap
+            ):
+                actual = {
+                    "ubicacion": fila.ubicacion,
+                    "lat": fila.lat,
+                    "lng": fila.lng,
+                    "inicio": fila.timestamp,
+                    "ids": [],
+                }
+                grupos.append(actual)
+            actual["ids"].append(fila.id)
+            actual["fin"] = fila.timestamp
+
+        for grupo in grupos:
+            ubicacion_id = self._id_ubicacion(
+                conn, grupo["ubicacion"], grupo["lat"], grupo["lng"]
+            )
+            corrida_id = conn.execute(
+                insert(Corrida).values(
+                    inicio=grupo["inicio"],
+                    fin=grupo["fin"],
+                    fecha=grupo["inicio"].date(),
+                    ubicacion_id=ubicacion_id,
+                    estado="ok",
+                    productos=len(grupo["ids"]),
+                    errores=0,
+                )
+            ).inserted_primary_key[0]
+            conn.execute(
+                text("UPDATE productos SET corrida_id = :corrida_id WHERE id = :id"),
+                [{"corrida_id": corrida_id, "id": id_} for id_ in grupo["ids"]],
+            )
+
+        if grupos:
+            print(f"Corridas reconstruidas para datos previos: {len(grupos)}")
+
+    def _asignar_unidades_legacy(self, conn):
+        """
+        Calcula magnitud, unidad y precio unitario de las filas existentes:
+        parsea cada presentación distinta una vez y las aplica con un único
+        UPDATE ... FROM sobre una tabla temporal
+        """
+        presentaciones = [
+            fila[0]
+            for fila in conn.execute(
+                text(
+                    "SELECT DISTINCT presentacion FROM productos "
+                    "WHERE presentacion IS NOT NULL"
+                )
+            )
+        ]
+        parseadas = parsear_presentaciones(presentaciones).dropna()
+        if parseadas.empty:
+            return
+
+        conn.execute(text("DROP TABLE IF EXISTS temp.presentaciones_parseadas"))
+        conn.execute(
+            text(
+                "CREATE TEMP TABLE presentaciones_parseadas "
+                "(presentacion TEXT PRIMARY KEY, magnitud REAL, unidad TEXT)"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO presentaciones_parseadas VALUES "
+                "(:presentacion, :magnitud, :unidad)"
+            ),
+            [
+                {
+                    "presentacion": presentaciones[i],
+                    "magnitud": float(fila.magnitud),
+                    "unidad": fila.unidad,
+                }
+                for i, fila in parseadas.iterrows()
+            ],
+        )
+        conn.execute(
+            text(
+                "UPDATE productos SET magnitud = t.magnitud, unidad = t.unidad, "
+                "precio_unitario = ROUND(productos.precio / t.magnitud, 2) "
+                "FROM presentaciones_parseadas t "
+                "WHERE productos.presentacion = t.presentacion"
+            )
+        )
+        conn.execute(text("DROP TABLE temp.presentaciones_parseadas"))
+
+    def _id_ubicacion(self, conn, nombre, lat=None, lng=None):
+        """Id de la ubicación `nombre` (clave de config.COORDENADAS), creándola si falta"""
+        if nombre is None:
+            return None
+        coords = config.COORDENADAS.get(nombre, {"lat": lat, "lng": lng})
+        conn.execute(
+            sqlite_insert(Ubicacion).on_conflict_do_nothing(),
+            {"nombre": nombre, "lat": coords["lat"], "lng": coords["lng"]},
+        )
+        return conn.execute(select(Ubicacion.id).where(Ubicacion.nombre == nombre)).scalar()
+
+    def iniciar_corrida(self, ubicacion, inicio=None, estrategia=None):
+        """Registra una corrida en curso para `ubicacion`. Devuelve su id"""
+        if inicio is None:
+            inicio = datetime.now()
+
+        with self.sesion() as sesion:
+            corrida = Corrida(
+                inicio=inicio,
+                fecha=inicio.date(),
+                ubicacion_id=self._id_ubicacion(sesion.connection(), ubicacion),
+                estrategia=estrategia,
+                estado="en_curso",
+            )
+            sesion.add(corrida)
+            sesion.flush()
+            return corrida.id
+
+    def finalizar_corrida(
+        self, corrida_id, estado="ok", productos=0, errores=0, estrategia=None
+    ):
+        """
+        Cierra la corrida con su estado ('ok', 'parcial' o 'error') y conteos.
+        estrategia: la que se usó de verdad, si difiere de la pedida al iniciar
+            (por ejemplo un refresco sin EANs conocidos termina en búsqueda)
+        """
+        with self.sesion() as sesion:
+            corrida = sesion.get(Corrida, corrida_id)
+            corrida.fin = datetime.now()
+            corrida.estado = estado
+            corrida.productos = productos
+            corrida.errores = errores
+            if estrategia is not None:
+                corrida.estrategia = estrategia
 
     def guardar_productos(self, lista_productos):
         """Guarda una lista de productos"""
         try:
             contador = 0
-            for prod_dict in lista_productos:
-                producto = Producto(**prod_dict)
-                self.session.add(producto)
-                contador += 1
+            with self.sesion() as sesion:
+                for prod_dict in completar_unidades([dict(p) for p in lista_productos]):
+                    producto = Producto(**prod_dict)
+                    sesion.add(producto)
+                    contador += 1
+                sesion.flush()
+                self._refrescar_estadisticas_diarias(sesion, lista_productos)
 
-            self.session.commit()
             print(f"Guardados {contador} productos en DB")
             return True
 
         except Exception as e:
-            self.session.rollback()
             print(f"Error guardando productos: {e}")
             return False
 
+    def guardar_cotizaciones(self, lista_cotizaciones):
+        """Guarda una lista de cotizaciones"""
+        try:
+            contador = 0
+            with self.sesion() as sesion:
+                for cot_dict in lista_cotizaciones:
+                    sesion.add(Cotizacion(**cot_dict))
+                    contador += 1
+
+            print(f"Guardadas {contador} cotizaciones en DB")
+            return True
+
+        except Exception as e:
+            print(f"Error guardando cotizaciones: {e}")
+            return False
+
+    def guardar_productos_bulk(self, lista_productos, tam_chunk=None):
+        """
+        Inserta productos en bloque (executemany de Core, sin objetos ORM),
+        con un commit por chunk de `tam_chunk` filas (default TAM_CHUNK_INSERT).
+
+        Un chunk que falla se revierte sin afectar a los ya guardados (el
+        pipeline deja la corrida en estado 'parcial'). Las claves que faltan
+        en una fila toman el default de la columna.
+        Devuelve una lista con {'chunk', 'filas', 'error'} por chunk.
+        """
+        if tam_chunk is None:
+            tam_chunk = config.TAM_CHUNK_INSERT
+
+        resultados = []
+        tabla = Producto.__table__
+        columnas = set(tabla.columns.keys())
+        lista_productos = list(lista_productos)
+
+        for numero, inicio in enumerate(range(0, len(lista_productos), tam_chunk)):
+            filas = completar_unidades(
+                [dict(p) for p in lista_productos[inicio : inicio + tam_chunk]]
+            )
+
+            # executemany necesita las mismas claves en todas las filas: un
+            # executemany por forma, sin rellenar con None (pisaría los defaults)
+            formas = {}
+            for fila in filas:
+                fila = {clave: valor for clave, valor in fila.items() if clave in columnas}
+                formas.setdefault(tuple(fila), []).append(fila)
+
+            try:
+                with self.sesion() as sesion:
+                    for grupo in formas.values():
+                        sesion.execute(insert(tabla), grupo)
+                    self._refrescar_estadisticas_diarias(sesion, filas)
+                resultados.append({"chunk": numero, "filas": len(filas), "error": None})
+
+            except Exception as e:
+                resultados.append({"chunk": numero, "filas": 0, "error": str(e)})
+                print(f"Error guardando chunk {numero} ({len(filas)} filas): {e}")
+
+        guardadas = sum(r["filas"] for r in resultados)
+        fallidos = sum(1 for r in resultados if r["error"])
+        print(
+            f"Guardados {guardadas} productos en DB "
+            f"({len(resultados)} chunks, {fallidos} con error)"
+        )
+        return resultados
+
+    def guardar_productos_merge(self, lista_productos):
+        """
+        Guarda productos de forma idempotente: carga el lote en una tabla de
+        staging (temporal, de la conexión) y lo fusiona con `productos` por
+        (ean, ubicacion, bucket) en una sola transacción.
+
+        Re-ejecutar una corrida en la misma franja actualiza las filas ya
+        guardadas (precios, timestamp y corrida) en lugar de duplicarlas, y
+        los lectores nunca ven el lote a medio escribir. Las corridas que
+        pierden filas así quedan con su conteo de productos recalculado.
+        Dentro del lote queda la primera fila de cada clave (una ubicación
+        NULL cuenta como ''); las filas sin EAN se insertan siempre.
+
+        Devuelve {'insertados', 'actualizados', 'error'}.
+        """
+        columnas = [c.name for c in Producto.__table__.columns if c.name != "id"]
+        horas = horas_bucket()
+        filas = []
+        for prod in lista_productos:
+            fila = {columna: prod.get(columna) for columna in columnas}
+            fila["bucket"] = clave_bucket(fila["timestamp"], horas)
+            filas.append(fila)
+        completar_unidades(filas)
+
+        if not filas:
+            return {"insertados": 0, "actualizados": 0, "error": None}
+
+        lista = ", ".join(columnas)
+        # Misma clave que el índice uq_ean_ubicacion_bucket
+        clave = (
+            "{p}.ean = s.ean AND COALESCE({p}.ubicacion, '') = COALESCE(s.ubicacion, '') "
+            "AND {p}.bucket = s.bucket"
+        )
+        primeras = (
+            "SELECT MIN(rowid) FROM staging_productos "
+            "WHERE ean IS NOT NULL GROUP BY ean, COALESCE(ubicacion, ''), bucket"
+        )
+        origen = f"(SELECT * FROM staging_productos WHERE rowid IN ({primeras})) AS s"
+
+        try:
+            with self.sesion() as sesion:
+                sesion.execute(text("DROP TABLE IF EXISTS temp.staging_productos"))
+                sesion.execute(
+                    text(
+                        "CREATE TEMP TABLE staging_productos AS "
+                        f"SELECT {lista} FROM productos WHERE 0"
+                    )
+                )
+                sesion.execute(
+                    text(
+                        f"INSERT INTO staging_productos ({lista}) "
+                        f"VALUES ({', '.join(':' + c for c in columnas)})"
+                    ),
+                    filas,
+                )
+
+                # Filas que el merge va a pisar: se restan de los agregados
+                # diarios y sus corridas se recuentan
+                reemplazadas = sesion.execute(
+                    text(
+                        "SELECT COALESCE(c.fecha, date(p.timestamp)), "
+                        "COALESCE(p.ubicacion, ''), COALESCE(p.categoria, ''), "
+                        "p.precio, p.corrida_id, s.corrida_id "
+                        f"FROM {origen} JOIN productos p ON {clave.format(p='p')} "
+                        "LEFT JOIN corridas c ON c.id = p.corrida_id"
+                    )
+                ).all()
+
+                actualizados = sesion.execute(
+                    text(
+                        "UPDATE productos SET "
+                        + ", ".join(f"{c} = s.{c}" for c in columnas)
+                        + f" FROM {origen} WHERE {clave.format(p='productos')}"
+                    )
+                ).rowcount
+
+                insertados = sesion.execute(
+                    text(
+                        f"INSERT INTO productos ({lista}) "
+                        f"SELECT {lista} FROM staging_productos s "
+                        f"WHERE s.ean IS NULL OR (s.rowid IN ({primeras}) AND NOT EXISTS "
+                        f"(SELECT 1 FROM productos p WHERE {clave.format(p='p')}))"
+                    )
+                ).rowcount
+
+                sesion.execute(text("DROP TABLE temp.staging_productos"))
+
+                # Corridas anteriores cuyas filas pasaron a la corrida nueva
+                anteriores = list(
+                    {
+                        fila[4]
+                        for fila in reemplazadas
+                        if fila[4] is not None and fila[4] != fila[5]
+                    }
+                )
+                if anteriores:
+                    sesion.execute(
+                        text(
+                            "UPDATE corridas SET productos = ("
+                            "SELECT COUNT(*) FROM productos "
+                            "WHERE productos.corrida_id = corridas.id) "
+                            "WHERE id IN :ids"
+                        ).bindparams(bindparam("ids", expanding=True)),
+                        {"ids": anteriores},
+                    )
+
+                # Del lote sólo quedó la primera fila de cada clave
+                vistas = set()
+                guardadas = []
+                for fila in filas:
+                    if fila["ean"] is not None:
+                        clave_fila = (fila["ean"], fila["ubicacion"] or "", fila["bucket"])
+                        if clave_fila in vistas:
+                            continue
+                        vistas.add(clave_fila)
+                    guardadas.append(fila)
+                self._refrescar_estadisticas_diarias(
+                    sesion, guardadas, [fila[:4] for fila in reemplazadas]
+                )
+
+        except Exception as e:
+            print(f"Error fusionando productos: {e}")
+            return {"insertados": 0, "actualizados": 0, "error": str(e)}
+
+        print(
+            f"Guardados {insertados + actualizados} productos en DB "
+            f"({insertados} nuevos, {actualizados} actualizados)"
+        )
+        return {"insertados": insertados, "actualizados": actualizados, "error": None}
+
+    def _refrescar_estadisticas_diarias(self, sesion, filas, reemplazadas=()):
+        """
+        Suma a `estadisticas_diarias` las filas guardadas y resta las que
+        reemplazaron (`reemplazadas`: (día, ubicación, categoría, precio) de
+        las filas que pisó un merge), dentro de la transacción del guardado.
+        El día es el de la corrida, o date(timestamp) para las filas sin
+        corrida (igual que la reconstrucción completa).
+
+        Cuesta lo que pesa el lote: un grupo (día, ubicación, categoría) sólo
+        se recalcula desde `productos` si pierde su mínimo o su máximo, o si
+        le quitan filas sin agregarle ninguna.
+        """
+        corrida_ids = {f["corrida_id"] for f in filas if f.get("corrida_id") is not None}
+        fechas = {}
+        if corrida_ids:
+            fechas = dict(
+                sesion.execute(
+                    text("SELECT id, fecha FROM corridas WHERE id IN :ids").bindparams(
+                        bindparam("ids", expanding=True)
+                    ),
+                    {"ids": list(corrida_ids)},
+                ).all()
+            )
+
+        # clave -> [cantidad, suma, suma_cuadrados, minimo, maximo] agregados
+        deltas = {}
+        for fila in filas:
+            dia = fechas.get(fila.get("corrida_id"))
+            if dia is None:
+                dia = (fila.get("timestamp") or datetime.now()).date()
+            clave = (str(dia), fila.get("ubicacion") or "", fila.get("categoria") or "")
+            delta = deltas.setdefault(clave, [0, 0.0, 0.0, None, None])
+            precio = fila.get("precio")
+            if precio is None:
+                continue
+            delta[0] += 1
+            delta[1] += precio
+            delta[2] += precio * precio
+            delta[3] = precio if delta[3] is None else min(delta[3], precio)
+            delta[4] = precio if delta[4] is None else max(delta[4], precio)
+
+        agregados = set(deltas)
+        quitados = {}
+        for dia, ubicacion, categoria, precio in reemplazadas:
+            clave = (str(dia), ubicacion, categoria)
+            quitados.setdefault(clave, []).append(precio)
+            delta = deltas.setdefault(clave, [0, 0.0, 0.0, None, None])
+            if precio is not None:
+                delta[0] -= 1
+                delta[1] -= precio
+                delta[2] -= precio * precio
+
+        if deltas:
+            sesion.execute(
+                text(
+                    """
+                    INSERT INTO estadisticas_diarias
+                        (fecha, ubicacion, categoria, cantidad, suma, suma_cuadrados,
+                         minimo, maximo)
+                    VALUES (:fecha, :ubicacion, :categoria, :cantidad, :suma,
+                            :suma_cuadrados, :minimo, :maximo)
+                    ON CONFLICT (fecha, ubicacion, categoria) DO UPDATE SET
+                        cantidad = cantidad + excluded.cantidad,
+                        suma = suma + excluded.suma,
+                        suma_cuadrados = suma_cuadrados + excluded.suma_cuadrados,
+                        minimo = CASE WHEN excluded.minimo IS NULL
+                            OR minimo <= excluded.minimo THEN minimo
+                            ELSE excluded.minimo END,
+                        maximo = CASE WHEN excluded.maximo IS NULL
+                            OR maximo >= excluded.maximo THEN maximo
+                            ELSE excluded.maximo END
+                    """
+                ),
+                [
+                    {
+                        "fecha": fecha,
+                        "ubicacion": ubicacion,
+                        "categoria": categoria,
+                        "cantidad": cantidad,
+                        "suma": suma,
+                        "suma_cuadrados": suma_cuadrados,
+                        "minimo": minimo,
+                        "maximo": maximo,
+                    }
+                    for (fecha, ubicacion, categoria), (
+                        cantidad,
+                        suma,
+                        suma_cuadrados,
+                        minimo,
+                        maximo,
+                    ) in deltas.items()
+                ],
+            )
+
+        for (fecha, ubicacion, categoria), precios in quitados.items():
+            parametros = {"fecha": fecha, "ubicacion": ubicacion, "categoria": categoria}
+            if (fecha, ubicacion, categoria) in agregados:
+                minimo, maximo = sesion.execute(
+                    text(
+                        "SELECT minimo, maximo FROM estadisticas_diarias "
+                        "WHERE fecha = :fecha AND ubicacion = :ubicacion "
+                        "AND categoria = :categoria"
+                    ),
+                    parametros,
+                ).one()
+                if not any(
+                    precio is not None and (precio <= minimo or precio >= maximo)
+                    for precio in precios
+                ):
+                    continue
+            self._recalcular_grupo_diario(sesion, **parametros)
+
+    def _recalcular_grupo_diario(self, sesion, fecha, ubicacion, categoria):
+        """Recalcula desde `productos` un grupo (día, ubicación, categoría)"""
+        parametros = {"fecha": fecha, "ubicacion": ubicacion, "categoria": categoria}
+        sesion.execute(
+            text(
+                "DELETE FROM estadisticas_diarias WHERE fecha = :fecha "
+                "AND ubicacion = :ubicacion AND categoria = :categoria"
+            ),
+            parametros,
+        )
+        # Filas con corrida (por su fecha) + filas sin corrida (por timestamp)
+        origen = """(
+            SELECT c.fecha AS dia, p.ubicacion, p.categoria, p.precio
+            FROM corridas c JOIN productos p ON p.corrida_id = c.id
+            WHERE c.fecha = :fecha
+            UNION ALL
+            SELECT date(p.timestamp), p.ubicacion, p.categoria, p.precio
+            FROM productos p
+            WHERE p.corrida_id IS NULL
+              AND p.timestamp >= :desde AND p.timestamp < :hasta
+        ) p"""
+        dia = date.fromisoformat(fecha)
+        sesion.execute(
+            text(
+                SQL_ESTADISTICAS_DIARIAS.format(
+                    dia="p.dia",
+                    origen=origen,
+                    filtro="WHERE COALESCE(p.ubicacion, '') = :ubicacion "
+                    "AND COALESCE(p.categoria, '') = :categoria",
+                )
+            ),
+            {
+                **parametros,
+                "desde": str(dia),
+                "hasta": str(dia + timedelta(days=1)),
+            },
+        )
+
+    def _reconstruir_estadisticas_diarias(self, conn):
+        conn.execute(text("DELETE FROM estadisticas_diarias"))
+        conn.execute(
+            text(
+                SQL_ESTADISTICAS_DIARIAS.format(
+                    dia="COALESCE(c.fecha, date(p.timestamp))",
+                    origen="productos p LEFT JOIN corridas c ON c.id = p.corrida_id",
+                    filtro="",
+                )
+            )
+        )
+
+    def recalcular_estadisticas_diarias(self):
+        """Reconstruye `estadisticas_diarias` desde cero a partir de `productos`"""
+        with self.sesion() as sesion:
+            self._reconstruir_estadisticas_diarias(sesion)
+
+    def guardar_membresia_categorias(self, membresia):
+        """
+        Registra las categorías en las que aparece cada EAN
+        (membresia: {ean: (categoria, ...)}, ver deduplicar_por_ean)
+        """
+        filas = [
+            {"ean": ean, "categoria": categoria}
+            for ean, categorias in membresia.items()
+            for categoria in categorias
+        ]
+        if not filas:
+            return True
+
+        try:
+            with self.sesion() as sesion:
+                sesion.execute(
+                    sqlite_insert(ProductoCategoria).on_conflict_do_nothing(), filas
+                )
+            return True
+
+        except Exception as e:
+            print(f"Error guardando categorías por EAN: {e}")
+            return False
+
+    def obtener_membresia_categorias(self, eans=None):
+        """Devuelve {ean: [categorias]} de los EANs que están en varias categorías"""
+        with self.sesion() as sesion:
+            query = sesion.query(ProductoCategoria.ean, ProductoCategoria.categoria)
+            if eans is not None:
+                query = query.filter(ProductoCategoria.ean.in_(list(eans)))
+            filas = query.all()
+
+        membresia = {}
+        for ean, categoria in filas:
+            membresia.setdefault(ean, []).append(categoria)
+        return membresia
+
     def obtener_ultimos_productos(self, limit=10, fuente=None):
         """Obtiene los últimos productos scrapeados"""
-        query = self.session.query(Producto)
+        with self.sesion() as sesion:
+            query = sesion.query(Producto)
+
+            if fuente:
+                query = query.filter(Producto.fuente == fuente)
 
-        if fuente:
-            query = query.filter(Producto.fuente == fuente)
+            return query.order_by(Producto.timestamp.desc()).limit(limit).all()
 
-        return query.order_by(Producto.timestamp.desc()).limit(limit).all()
+    def obtener_ultimas_cotizaciones(self, limit=10):
+        """Obtiene las últimas cotizaciones"""
+        with self.sesion() as sesion:
+            return (
+                sesion.query(Cotizacion)
+                .order_by(Cotizacion.timestamp.desc())
+                .limit(limit)
+                .all()
+            )
+
+    def obtener_comparacion_cotizaciones(self):
+        """Obtiene la última cotización de cada tipo para comparar"""
+        with self.sesion() as sesion:
+            subq = (
+                sesion.query(
+                    Cotizacion.nombre,
+                    func.max(Cotizacion.timestamp).label("max_timestamp"),
+                )
+                .group_by(Cotizacion.nombre)
+                .subquery()
+            )
+
+            return (
+                sesion.query(Cotizacion)
+                .join(
+                    subq,
+                    (Cotizacion.nombre == subq.c.nombre)
+                    & (Cotizacion.timestamp == subq.c.max_timestamp),
+                )
+                .order_by(Cotizacion.precio_venta.desc())
+                .all()
+            )
 
     def obtener_productos_por_categoria(self, categoria, limit=50):
         """Obtiene productos de una categoría específica"""
-        return (
-            self.session.query(Producto)
-            .filter(Producto.categoria == categoria)
-            .order_by(Producto.precio.asc())
-            .limit(limit)
-            .all()
-        )
+        with self.sesion() as sesion:
+            return (
+                sesion.query(Producto)
+                .filter(Producto.categoria == categoria)
+                .order_by(Producto.precio.asc())
+                .limit(limit)
+                .all()
+            )
 
-    def obtener_estadisticas_generales(self):
-        """Obtiene estadísticas generales de la base de datos"""
-        total_productos = self.session.query(func.count(Producto.id)).scalar()
-        primera_fecha = self.session.query(func.min(Producto.timestamp)).scalar()
-        ultima_fecha = self.session.query(func.max(Producto.timestamp)).scalar()
+    def obtener_eans_conocidos(self, ubicacion=None, dias=None):
+        """
+        Devuelve {ean: categoria} de los productos ya guardados, con la
+        categoría de su última aparición (para el refresco por EAN).
+
+        Sale ordenado para que un refresco parcial rote por todo el catálogo:
+        primero los EANs que nunca se refrescaron, después del que hace más
+        tiempo no se refresca al más reciente (las búsquedas por término no
+        cuentan, porque observan todo el catálogo a la vez).
+        dias: sólo EANs observados en los últimos `dias` días (los demás
+            probablemente ya no se venden; una búsqueda los vuelve a traer)
+        """
+        with self.sesion() as sesion:
+            refresco = func.max(
+                case((Corrida.estrategia == "refresco", Producto.timestamp))
+            )
+            ultimo = (
+                sesion.query(
+                    Producto.ean,
+                    func.max(Producto.timestamp).label("max_timestamp"),
+                    refresco.label("ultimo_refresco"),
+                )
+                .outerjoin(Corrida, Corrida.id == Producto.corrida_id)
+                .filter(Producto.ean.isnot(None), Producto.ean != "")
+            )
+
+            if ubicacion:
+                ultimo = ultimo.filter(Producto.ubicacion == ubicacion)
+            if dias is not None:
+                ultimo = ultimo.filter(
+                    Producto.timestamp >= datetime.now() - timedelta(days=dias)
+                )
+
+            ultimo = ultimo.group_by(Producto.ean).subquery()
+
+            filas = sesion.query(Producto.ean, Producto.categoria).join(
+                ultimo,
+                (Producto.ean == ultimo.c.ean)
+                & (Producto.timestamp == ultimo.c.max_timestamp),
+            )
+            if ubicacion:
+                # Otra ubicación puede tener una fila del mismo EAN con el mismo timestamp
+                filas = filas.filter(Producto.ubicacion == ubicacion)
+            filas = filas.order_by(
+                ultimo.c.ultimo_refresco.is_not(None),
+                ultimo.c.ultimo_refresco,
+                ultimo.c.max_timestamp,
+                Producto.ean,
+            ).all()
+
+        return {ean: categoria for ean, categoria in filas}
+
+    def obtener_ultima_corrida(self, ubicacion=None):
+        """Última corrida terminada bien (de `ubicacion`, o de cualquiera)"""
+        with self.sesion() as sesion:
+            query = sesion.query(Corrida).filter(Corrida.estado == "ok")
+            if ubicacion:
+                query = query.join(Ubicacion, Ubicacion.id == Corrida.ubicacion_id)
+                query = query.filter(Ubicacion.nombre == ubicacion)
+            return query.order_by(Corrida.id.desc()).first()
+
+    def obtener_snapshot(self, corrida_id=None, ubicacion=None):
+        """
+        Productos de una corrida (default: la última terminada bien), por el
+        índice de corrida_id en lugar de un rango de timestamps
+        """
+        if corrida_id is None:
+            corrida = self.obtener_ultima_corrida(ubicacion)
+            if corrida is None:
+                return []
+            corrida_id = corrida.id
+
+        with self.sesion() as sesion:
+            return sesion.query(Producto).filter(Producto.corrida_id == corrida_id).all()
+
+    def obtener_diferencias_corridas(self, corrida_anterior, corrida_nueva):
+        """
+        Compara dos corridas por EAN. Devuelve {'cambios', 'nuevos',
+        'desaparecidos'}; cada cambio es {ean, nombre, precio_anterior,
+        precio_nuevo, variacion_pct}
+        """
+        antes = {p.ean: p for p in self.obtener_snapshot(corrida_anterior) if p.ean}
+        despues = {p.ean: p for p in self.obtener_snapshot(corrida_nueva) if p.ean}
+
+        cambios = []
+        for ean in antes.keys() & despues.keys():
+            previo, actual = antes[ean].precio, despues[ean].precio
+            if previo and actual != previo:
+                cambios.append(
+                    {
+                        "ean": ean,
+                        "nombre": despues[ean].nombre,
+                        "precio_anterior": previo,
+                        "precio_nuevo": actual,
+                        "variacion_pct": round((actual - previo) / previo * 100, 2),
+                    }
+                )
 
         return {
-            "total_productos": total_productos,
-            "primera_fecha": primera_fecha,
-            "ultima_fecha": ultima_fecha,
-            "fuentes_productos": [
-                f[0] for f in self.session.query(Producto.fuente).distinct().all()
-            ],
-            "categorias": [
-                c[0] for c in self.session.query(Producto.categoria).distinct().all()
-            ],
+            "cambios": sorted(cambios, key=lambda c: c["variacion_pct"], reverse=True),
+            "nuevos": [despues[ean] for ean in despues.keys() - antes.keys()],
+            "desaparecidos": [antes[ean] for ean in antes.keys() - despues.keys()],
         }
 
+    def obtener_corridas_del_dia(self, fecha, ubicacion=None):
+        """Corridas iniciadas en `fecha` (date), por el índice de corridas.fecha"""
+        with self.sesion() as sesion:
+            query = sesion.query(Corrida).filter(Corrida.fecha == fecha)
+            if ubicacion:
+                query = query.join(Ubicacion, Ubicacion.id == Corrida.ubicacion_id)
+                query = query.filter(Ubicacion.nombre == ubicacion)
+            return query.order_by(Corrida.inicio).all()
+
+    def obtener_productos_del_dia(self, fecha, ubicacion=None):
+        """Productos de las corridas de `fecha`, sin escanear por timestamp"""
+        ids = [c.id for c in self.obtener_corridas_del_dia(fecha, ubicacion)]
+        if not ids:
+            return []
+        with self.sesion() as sesion:
+            return sesion.query(Producto).filter(Producto.corrida_id.in_(ids)).all()
+
+    def obtener_estadisticas_generales(self):
+        """Obtiene estadísticas generales de la base de datos"""
+        with self.sesion() as sesion:
+            total_productos = sesion.query(func.count(Producto.id)).scalar()
+            corridas_ok = sesion.query(Corrida).filter(Corrida.estado == "ok")
+            total_corridas = corridas_ok.count()
+            primera_fecha = corridas_ok.with_entities(func.min(Corrida.inicio)).scalar()
+            ultima_fecha = corridas_ok.with_entities(func.max(Corrida.inicio)).scalar()
+
+            return {
+                "total_productos": total_productos,
+                "total_corridas": total_corridas,
+                "primera_fecha": primera_fecha,
+                "ultima_fecha": ultima_fecha,
+                "fuentes_productos": [
+                    f[0] for f in sesion.query(Producto.fuente).distinct().all()
+                ],
+                "categorias": [
+                    c[0] for c in sesion.query(Producto.categoria).distinct().all()
+                ],
+            }
+
     def obtener_estadisticas_por_categoria(self):
-        """Obtiene estadísticas agrupadas por categoría"""
-        resultado = (
-            self.session.query(
-                Producto.categoria,
-                func.count(Producto.id).label("cantidad"),
-                func.avg(Producto.precio).label("precio_promedio"),
-                func.min(Producto.precio).label("precio_min"),
-                func.max(Producto.precio).label("precio_max"),
-            )
-            .group_by(Producto.categoria)
-            .all()
-        )
+        """Obtiene estadísticas agrupadas por categoría (desde estadisticas_diarias)"""
+        with self.sesion() as sesion:
+            resultado = (
+                sesion.query(
+                    EstadisticaDiaria.categoria,
+                    func.sum(EstadisticaDiaria.cantidad).label("cantidad"),
+                    func.sum(EstadisticaDiaria.suma).label("suma"),
+                    func.min(EstadisticaDiaria.minimo).label("precio_min"),
+                    func.max(EstadisticaDiaria.maximo).label("precio_max"),
+                )
+                .group_by(EstadisticaDiaria.categoria)
+                .all()
+            )
 
         return [
             {
                 "categoria": r.categoria,
                 "cantidad": r.cantidad,
-                "precio_promedio": round(r.precio_promedio, 2)
-                if r.precio_promedio
-                else 0,
+                "precio_promedio": round(r.suma / r.cantidad, 2) if r.cantidad else 0,
                 "precio_min": r.precio_min,
                 "precio_max": r.precio_max,
             }
             for r in resultado
         ]
 
+    def obtener_estadisticas_diarias(
+        self, categorias=None, ubicacion=None, desde=None, hasta=None
+    ):
+        """
+        Agregados por día y categoría (sumando ubicaciones, o sólo
+        `ubicacion`). Devuelve dicts con fecha, categoria, cantidad,
+        promedio, minimo, maximo y desvio.
+        """
+        with self.sesion() as sesion:
+            query = sesion.query(
+                EstadisticaDiaria.fecha,
+                EstadisticaDiaria.categoria,
+                func.sum(EstadisticaDiaria.cantidad).label("cantidad"),
+                func.sum(EstadisticaDiaria.suma).label("suma"),
+                func.sum(EstadisticaDiaria.suma_cuadrados).label("suma_cuadrados"),
+                func.min(EstadisticaDiaria.minimo).label("minimo"),
+                func.max(EstadisticaDiaria.maximo).label("maximo"),
+            )
+            if categorias is not None:
+                query = query.filter(EstadisticaDiaria.categoria.in_(list(categorias)))
+            if ubicacion:
+                query = query.filter(EstadisticaDiaria.ubicacion == ubicacion)
+            if desde is not None:
+                query = query.filter(EstadisticaDiaria.fecha >= desde)
+            if hasta is not None:
+                query = query.filter(EstadisticaDiaria.fecha <= hasta)
+            filas = (
+                query.group_by(EstadisticaDiaria.fecha, EstadisticaDiaria.categoria)
+                .order_by(EstadisticaDiaria.fecha)
+                .all()
+            )
+
+        resultado = []
+        for r in filas:
+            if not r.cantidad:
+                continue
+            promedio = r.suma / r.cantidad
+            varianza = max(r.suma_cuadrados / r.cantidad - promedio**2, 0)
+            resultado.append(
+                {
+                    "fecha": r.fecha,
+                    "categoria": r.categoria,
+                    "cantidad": r.cantidad,
+                    "promedio": round(promedio, 2),
+                    "minimo": r.minimo,
+                    "maximo": r.maximo,
+                    "desvio": round(varianza**0.5, 2),
+                }
+            )
+        return resultado
+
 
 # TEST del módulo
 if __name__ == "__main__":
@@ -0,0 +1,190 @@
+"""
+Chequeo de planes de consulta (EXPLAIN QUERY PLAN) para las consultas
+frecuentes sobre `productos`.
+
+Marca las que recorren más de lo esperado (la tabla entera, o un índice entero
+cuando deberían buscar por clave) o que necesitan un ordenamiento temporal,
+para detectar índices faltantes a medida que crece la base.
+
+Uso:
+    python src/database/plan_consultas.py [price_monitor.db]
+"""
+
+import re
+from pathlib import Path
+
+from sqlalchemy import func, select, text
+
+try:
+    from .models import Producto
+    import config
+except ImportError:
+    import sys
+
+    project_root = Path(__file__).parent.parent.parent
+    sys.path.insert(0, str(project_root))
+    from src.database.models import Producto
+    import config
+
+# "SCAN productos" recorre la tabla; "SCAN productos USING [COVERING] INDEX x"
+# recorre un índice entero (válido para top-N o agregados sobre un índice cubriente)
+PATRON_SCAN = re.compile(r"^SCAN (\w+)( USING (?:COVERING )?INDEX \w+)?$")
+
+# Cuánto puede recorrer cada consulta
+SIN_ESCANEO = "ninguno"
+ESCANEO_INDICE = "indice"
+ESCANEO_TABLA = "tabla"
+
+
+def consultas_frecuentes():
+    """
+    {nombre: (sentencia, escaneo permitido)} con las formas de consulta que usan
+    analysis.py, explorar_datos.py, el pipeline y el dashboard
+    """
+    categorias = config.CATEGORIAS_AGRUPADAS[next(iter(config.CATEGORIAS_AGRUPADAS))]
+    ultimo_por_ean = (
+        select(Producto.ean, func.max(Producto.timestamp))
+        .where(Producto.ean.isnot(None), Producto.ubicacion == "CABA")
+        .group_by(Producto.ean)
+    )
+
+    return {
+        "mas_barato_por_categoria": (
+            select(Producto)
+            .where(Producto.categoria == "arroz")
+            .order_by(Producto.precio.asc())
+            .limit(1),
+            SIN_ESCANEO,
+        ),
+        "mas_barato_por_precio_unitario": (
+            select(Producto)
+            .where(Producto.categoria == "arroz", Producto.precio_unitario.isnot(None))
+            .order_by(Producto.precio_unitario.asc())
+            .limit(1),
+            SIN_ESCANEO,
+        ),
+        "productos_de_categoria": (
+            select(Producto)
+            .where(Producto.categoria == "arroz")
+            .order_by(Producto.precio.asc()),
+            SIN_ESCANEO,
+        ),
+        "top_mas_caros": (
+            select(Producto).order_by(Producto.precio.desc()).limit(10),
+            ESCANEO_INDICE,
+        ),
+        "top_mas_baratos": (
+            select(Producto).order_by(Producto.precio.asc()).limit(10),
+            ESCANEO_INDICE,
+        ),
+        "agregados_por_categoria": (
+            select(
+                Producto.categoria,
+                func.count(Producto.precio),
+                func.avg(Producto.precio),
+                func.min(Producto.precio),
+                func.max(Producto.precio),
+            ).group_by(Producto.categoria),
+            ESCANEO_INDICE,
+        ),
+        "agregados_por_grupo": (
+            select(
+                func.count(Producto.precio),
+                func.avg(Producto.precio),
+                func.min(Producto.precio),
+                func.max(Producto.precio),
+            ).where(Producto.categoria.in_(categorias)),
+            SIN_ESCANEO,
+        ),
+        "ultimo_timestamp_por_ean": (ultimo_por_ean, SIN_ESCANEO),
+        "historial_de_ean": (
+            select(Producto)
+            .where(Producto.ean == "7790742335500")
+            .order_by(Producto.timestamp),
+            SIN_ESCANEO,
+        ),
+        "snapshot_de_corrida": (
+            select(Producto).where(Producto.corrida_id == 1),
+            SIN_ESCANEO,
+        ),
+        # Un LIKE '%texto%' no puede usar un índice B-tree: escaneo esperado
+        "busqueda_por_nombre": (
+            select(Producto)
+            .where(Producto.nombre.ilike("%leche%"))
+            .order_by(Producto.precio.asc()),
+            ESCANEO_TABLA,
+        ),
+    }
+
+
+def explicar(db, sentencia):
+    """Filas de detalle de EXPLAIN QUERY PLAN para una sentencia SQLAlchemy"""
+    sql = str(
+        sentencia.compile(
+            dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}
+        )
+    )
+    with db.engine.connect() as conn:
+        return [fila[-1] for fila in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def verificar_planes(db, consultas=None):
+    """
+    Explica cada consulta y devuelve una lista de
+    {consulta, plan, escaneos, ordenamiento_temporal, ok}; `escaneos` son los
+    pasos SCAN del plan, marcados como problema si exceden lo permitido
+    """
+    if consultas is None:
+        consultas = consultas_frecuentes()
+
+    resultados = []
+    for nombre, (sentencia, permitido) in consultas.items():
+        plan = explicar(db, sentencia)
+        escaneos = [m for m in map(PATRON_SCAN.match, plan) if m]
+        temporal = any("USE TEMP B-TREE" in paso for paso in plan)
+
+        if permitido == ESCANEO_TABLA:
+            ok = True
+        elif permitido == ESCANEO_INDICE:
+            ok = not temporal and all(m.group(2) for m in escaneos)
+        else:
+            ok = not temporal and not escaneos
+
+        resultados.append(
+            {
+                "consulta": nombre,
+                "plan": plan,
+                "escaneos": [m.group(0) for m in escaneos],
+                "ordenamiento_temporal": temporal,
+                "ok": ok,
+            }
+        )
+    return resultados
+
+
+def main():
+    import sys
+
+    project_root = Path(__file__).parent.parent.parent
+    sys.path.insert(0, str(project_root))
+    from src.database import Database
+
+    db = Database(sys.argv[1] if len(sys.argv) > 1 else "price_monitor.db")
+    resultados = verificar_planes(db)
+
+    print("\nPLANES DE CONSULTA")
+    print("-" * 70)
+    for r in resultados:
+        print(f"\n[{'OK' if r['ok'] else 'REVISAR'}] {r['consulta']}")
+        for paso in r["plan"]:
+            print(f"    {paso}")
+
+    fallidas = [r["consulta"] for r in resultados if not r["ok"]]
+    if fallidas:
+        print(f"\nConsultas que escanean de más u ordenan en memoria: {', '.join(fallidas)}")
+        sys.exit(1)
+    print(f"\nTodas las consultas ({len(resultados)}) usan los índices esperados")
+
+
+if __name__ == "__main__":
+    main()
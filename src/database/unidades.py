@@ -0,0 +1,122 @@
+"""
+Normalización de presentaciones ("500.0 gr", "1.0 lt", "20.0 un") a una
+magnitud en unidad canónica (kg, lt o un) y precio por unidad canónica
+
+El parseo es vectorizado (pandas .str) y se hace una vez al guardar: las
+columnas `magnitud`, `unidad` y `precio_unitario` de `productos` quedan
+listas para ordenar por precio unitario en SQL.
+"""
+
+import pandas as pd
+
+# Unidad cruda -> (unidad canónica, factor a la canónica)
+UNIDADES = {
+    "g": ("kg", 0.001),
+    "gr": ("kg", 0.001),
+    "grm": ("kg", 0.001),
+    "grs": ("kg", 0.001),
+    "kg": ("kg", 1.0),
+    "kgm": ("kg", 1.0),
+    "kgs": ("kg", 1.0),
+    "ml": ("lt", 0.001),
+    "cc": ("lt", 0.001),
+    "cm3": ("lt", 0.001),
+    "l": ("lt", 1.0),
+    "lt": ("lt", 1.0),
+    "lts": ("lt", 1.0),
+    "un": ("un", 1.0),
+    "uni": ("un", 1.0),
+    "ud": ("un", 1.0),
+    "u": ("un", 1.0),
+}
+
+# Magnitud (con punto o coma decimal) y unidad, p. ej. "1.5 lt", "500gr"
+PATRON_PRESENTACION = r"^\s*(\d+(?:[.,]\d+)?)\s*([a-z][a-z0-9]*)\.?\s*$"
+
+COLUMNAS_UNIDAD = ("magnitud", "unidad", "precio_unitario")
+
+
+def parsear_presentaciones(presentaciones):
+    """
+    Serie (o iterable) de presentaciones -> DataFrame con `magnitud` (en la
+    unidad canónica) y `unidad` ('kg', 'lt' o 'un'), con el mismo índice.
+    Lo que no se reconoce queda en NaN / None.
+    """
+    serie = pd.Series(presentaciones, dtype="object")
+    partes = serie.astype("string").str.lower().str.extract(PATRON_PRESENTACION)
+
+    cantidad = pd.to_numeric(
+        partes[0].str.replace(",", ".", regex=False), errors="coerce"
+    )
+    unidad = partes[1].map({cruda: u for cruda, (u, _) in UNIDADES.items()})
+    factor = partes[1].map({cruda: f for cruda, (_, f) in UNIDADES.items()})
+    magnitud = cantidad.astype(float) * factor.astype(float)
+
+    validas = magnitud > 0
+    return pd.DataFrame(
+        {
+            "magnitud": magnitud.where(validas),
+            "unidad": unidad.where(validas).astype(object),
+        },
+        index=serie.index,
+    )
+
+
+def precios_unitarios(precios, presentaciones):
+    """
+    Precio por kg / lt / unidad. Devuelve un DataFrame con `magnitud`,
+    `unidad` y `precio_unitario` alineado con `precios`.
+    """
+    precios = pd.Series(precios, dtype="object")
+    resultado = parsear_presentaciones(
+        pd.Series(list(presentaciones), index=precios.index, dtype="object")
+    )
+    precio = pd.to_numeric(precios, errors="coerce").astype(float)
+    resultado["precio_unitario"] = (precio / resultado["magnitud"]).round(2)
+    return resultado
+
+
+def completar_unidades(filas):
+    """
+    Agrega `magnitud`, `unidad` y `precio_unitario` a cada fila (dicts o
+    registros con esas claves). Se parsea cada presentación distinta una sola
+    vez. Devuelve las mismas filas.
+    """
+    if not filas:
+        return filas
+    calculado = precios_unitarios(
+        [fila.get("precio") for fila in filas],
+        [fila.get("presentacion") for fila in filas],
+    )
+    valores = calculado.astype(object).where(calculado.notna(), None)
+    for fila, magnitud, unidad, precio_unitario in zip(
+        filas, valores["magnitud"], valores["unidad"], valores["precio_unitario"]
+    ):
+        fila["magnitud"] = magnitud
+        fila["unidad"] = unidad
+        fila["precio_unitario"] = precio_unitario
+    return filas
+
+
+def elegir_por_precio_unitario(df, claves=()):
+    """
+    Fila más barata de cada (claves..., categoria) por precio unitario.
+
+    Dentro de cada grupo se compara sólo la unidad más frecuente (para no
+    mezclar precio por kg con precio por unidad); las filas sin unidad
+    reconocida quedan al final y entre ellas decide el precio. `df` necesita
+    `categoria`, `precio`, `unidad` y `precio_unitario`.
+    """
+    grupo = list(claves) + ["categoria"]
+    df = df[df["precio"].notna()]
+    cuenta = df.groupby(grupo + ["unidad"], dropna=False)["precio"].transform("size")
+    ordenado = df.assign(
+        _sin_unidad=df["unidad"].isna(),
+        _cuenta=cuenta,
+    ).sort_values(
+        grupo + ["_sin_unidad", "_cuenta", "precio_unitario", "precio"],
+        ascending=[True] * len(grupo) + [True, False, True, True],
+        na_position="last",
+        kind="mergesort",
+    )
+    return ordenado.drop_duplicates(grupo).drop(columns=["_sin_unidad", "_cuenta"])
@@ -0,0 +1,138 @@
+"""
+Cache en disco de respuestas crudas de la API (record/replay)
+"""
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+
+
+class CacheRespuestas:
+    """
+    Cache content-addressed de respuestas de /productos.
+
+    Cada respuesta se guarda tal cual llegó (bytes) en un archivo cuyo nombre
+    es el hash de (url, termino, lat, lng, offset, limit), donde url es base_url
+    más el path del endpoint, así un mock y la API real no comparten entradas.
+    Modos:
+
+    - 'normal': usa la respuesta cacheada si no venció el TTL, si no pide a la API
+    - 'grabar': siempre pide a la API y guarda la respuesta (refresca el cache)
+    - 'reproducir': sirve sólo desde el cache, ignora el TTL y nunca usa la red
+    - 'desactivado': no lee ni escribe nada
+    """
+
+    MODOS = ("normal", "grabar", "reproducir", "desactivado")
+
+    def __init__(self, directorio, modo="normal", ttl=1800, max_bytes=200 * 1024**2):
+        """
+        directorio: carpeta donde se guardan las respuestas
+        modo: ver MODOS
+        ttl: segundos de validez de una respuesta en modo 'normal'
+        max_bytes: tamaño máximo del cache; se desalojan las más viejas
+        """
+        if modo not in self.MODOS:
+            raise ValueError(f"Modo de cache '{modo}' no válido. Opciones: {self.MODOS}")
+
+        self.directorio = Path(directorio)
+        self.modo = modo
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.aciertos = 0
+        self.fallos = 0
+
+        self._lock = threading.Lock()
+        self._tamanio = None  # se calcula la primera vez que se escribe
+
+    @property
+    def lee(self):
+        return self.modo in ("normal", "reproducir")
+
+    @property
+    def escribe(self):
+        return self.modo in ("normal", "grabar")
+
+    @property
+    def solo_cache(self):
+        return self.modo == "reproducir"
+
+    def clave(self, url, termino, lat, lng, offset, limit):
+        """Hash estable de los parámetros de la request"""
+        crudo = json.dumps([url, termino, lat, lng, offset, limit], ensure_ascii=False)
+        return hashlib.sha256(crudo.encode("utf-8")).hexdigest()
+
+    def obtener(self, url, termino, lat, lng, offset, limit):
+        """Devuelve los bytes cacheados o None si no hay (o vencieron)"""
+        if not self.lee:
+            return None
+
+        ruta = self._ruta(self.clave(url, termino, lat, lng, offset, limit))
+        try:
+            if not self.solo_cache and time.time() - ruta.stat().st_mtime > self.ttl:
+                contenido = None
+            else:
+                contenido = ruta.read_bytes()
+        except FileNotFoundError:
+            contenido = None
+
+        with self._lock:
+            if contenido is None:
+                self.fallos += 1
+            else:
+                self.aciertos += 1
+
+        return contenido
+
+    def guardar(self, url, termino, lat, lng, offset, limit, contenido):
+        """Guarda la respuesta cruda y desaloja entradas viejas si hace falta"""
+        if not self.escribe:
+            return
+
+        ruta = self._ruta(self.clave(url, termino, lat, lng, offset, limit))
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+
+        # Escritura atómica: otro worker nunca ve un archivo a medio escribir
+        temporal = ruta.with_name(f"{ruta.name}.{threading.get_ident()}.tmp")
+        temporal.write_bytes(contenido)
+
+        with self._lock:
+            anterior = ruta.stat().st_size if ruta.exists() else 0
+            temporal.replace(ruta)
+
+            if self._tamanio is None:
+                self._tamanio = self._calcular_tamanio()
+            else:
+                self._tamanio += len(contenido) - anterior
+
+            if self._tamanio > self.max_bytes:
+                self._desalojar()
+
+    def estadisticas(self):
+        """Aciertos/fallos de lectura desde que se creó el cache"""
+        with self._lock:
+            return {"modo": self.modo, "aciertos": self.aciertos, "fallos": self.fallos}
+
+    def _ruta(self, clave):
+        return self.directorio / clave[:2] / f"{clave}.json"
+
+    def _archivos(self):
+        return [p for p in self.directorio.glob("*/*.json") if p.is_file()]
+
+    def _calcular_tamanio(self):
+        return sum(p.stat().st_size for p in self._archivos())
+
+    def _desalojar(self):
+        """Borra las respuestas más viejas hasta quedar en el 90% del máximo"""
+        objetivo = self.max_bytes * 0.9
+        entradas = sorted(
+            ((p.stat().st_mtime, p.stat().st_size, p) for p in self._archivos()),
+            key=lambda e: e[0],
+        )
+
+        for _, tamanio, ruta in entradas:
+            if self._tamanio <= objetivo:
+                break
+            ruta.unlink(missing_ok=True)
+            self._tamanio -= tamanio
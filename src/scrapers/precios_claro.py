@@ -1,26 +1,63 @@
+import asyncio
+import json
+import math
+import random
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import islice
 from config import CANTIDADES_CANASTA
-import pandas as pd
 from pathlib import Path
 
+# Decodificador JSON rápido (opcional)
+try:
+    import orjson
+
+    decodificar_json = orjson.loads
+except ImportError:
+    decodificar_json = json.loads
+
 # Imports del proyecto
 try:
-    from ..utils.paths import BACKUPS_DIR, init_directories
+    from ..utils.paths import BACKUPS_DIR, CACHE_DIR, init_directories
+    from .cache import CacheRespuestas
+    from .rate_limiter import RateLimiterAdaptativo
+    from .registro import ProductoScrapeado, a_dataframe
     import config
 except ImportError:
     import sys
 
     project_root = Path(__file__).parent.parent.parent
     sys.path.insert(0, str(project_root))
-    from src.utils.paths import BACKUPS_DIR, init_directories
+    from src.utils.paths import BACKUPS_DIR, CACHE_DIR, init_directories
+    from src.scrapers.cache import CacheRespuestas
+    from src.scrapers.rate_limiter import RateLimiterAdaptativo
+    from src.scrapers.registro import ProductoScrapeado, a_dataframe
     import config
 
 # Extraer configuración
 COORDENADAS = config.COORDENADAS
 CATEGORIAS_PRODUCTOS = config.CATEGORIAS_PRODUCTOS
 LIMITE_PRODUCTOS_POR_CATEGORIA = config.LIMITE_PRODUCTOS_POR_CATEGORIA
+MAX_PRODUCTOS_POR_CATEGORIA = config.MAX_PRODUCTOS_POR_CATEGORIA
+TAM_LOTE_REFRESCO = config.TAM_LOTE_REFRESCO
+LIMITE_REFRESCO_EAN = config.LIMITE_REFRESCO_EAN
+MAX_EANS_REFRESCO = config.MAX_EANS_REFRESCO
 API_TIMEOUT = config.API_TIMEOUT
+API_BASE_URL = config.API_BASE_URL
+API_REINTENTOS = config.API_REINTENTOS
+API_BACKOFF_BASE = config.API_BACKOFF_BASE
+API_BACKOFF_MAX = config.API_BACKOFF_MAX
+API_MAX_RPS = config.API_MAX_RPS
+API_MIN_RPS = config.API_MIN_RPS
+CACHE_MODO = config.CACHE_MODO
+CACHE_TTL = config.CACHE_TTL
+CACHE_MAX_MB = config.CACHE_MAX_MB
+CONCURRENCIA_SCRAPER = config.CONCURRENCIA_SCRAPER
+MAX_WORKERS_UBICACIONES = config.MAX_WORKERS_UBICACIONES
 
 init_directories()
 
@@ -28,9 +65,20 @@ init_directories()
 class PreciosClarosScraper:
     """Scraper para Precios Claros (Argentina)"""
 
-    def __init__(self, ubicacion="CABA"):
+    def __init__(
+        self,
+        ubicacion="CABA",
+        base_url=None,
+        max_rps=None,
+        modo_cache=None,
+        limitador=None,
+    ):
         """
         ubicacion: Clave en COORDENADAS ('CABA', 'MAR_DEL_PLATA')
+        base_url: URL de la API (por defecto API_BASE_URL, útil para apuntar a un mock)
+        max_rps: techo de requests/segundo (default API_MAX_RPS, 0 = sin límite)
+        modo_cache: 'normal', 'grabar', 'reproducir' o 'desactivado' (default CACHE_MODO)
+        limitador: RateLimiterAdaptativo a compartir con otros scrapers (ignora max_rps)
         """
         if ubicacion not in COORDENADAS:
             raise ValueError(
@@ -38,9 +86,10 @@ class PreciosClarosScraper:
             )
 
         coords = COORDENADAS[ubicacion]
+        self.ubicacion = ubicacion
         self.lat = coords["lat"]
         self.lng = coords["lng"]
-        self.base_url = "https://d3e6htiiul5ek9.cloudfront.net/prod"
+        self.base_url = base_url or API_BASE_URL
         self.nombre = "PreciosClaros"
         self.headers = {
             "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36",
@@ -48,83 +97,424 @@ class PreciosClarosScraper:
             "Referer": "https://www.preciosclaros.gob.ar/",
         }
 
-    def buscar_productos(self, terminos=None, limit=None):
-        """Busca múltiples productos"""
+        # Sesión compartida: reutiliza conexiones (keep-alive) entre requests
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=max(CONCURRENCIA_SCRAPER, 10)
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Métricas de la sesión
+        self._lock = threading.Lock()
+        self.latencias = []  # segundos por request (incluye reintentos)
+        self.errores = []  # páginas perdidas: (termino, offset, motivo)
+        self.eans_no_encontrados = []  # EANs sin resultado en el último refresco
+
+        # Timestamp compartido por todos los productos de una corrida
+        self.timestamp_corrida = None
+
+        # Limitador de tasa compartido por todos los workers
+        if limitador is None:
+            limitador = crear_limitador(max_rps)
+        self.limitador = limitador
+
+        # Cache en disco de respuestas crudas
+        self.cache = CacheRespuestas(
+            CACHE_DIR,
+            modo=modo_cache or CACHE_MODO,
+            ttl=CACHE_TTL,
+            max_bytes=CACHE_MAX_MB * 1024**2,
+        )
+
+    def cerrar(self):
+        """Cierra las conexiones abiertas de la sesión"""
+        self.session.close()
+
+    def estadisticas_latencia(self):
+        """Resumen de latencias registradas (en segundos)"""
+        with self._lock:
+            latencias = sorted(self.latencias)
+
+        if not latencias:
+            return {"requests": 0, "promedio": 0, "p50": 0, "p99": 0, "max": 0}
+
+        def percentil(p):
+            return latencias[min(len(latencias) - 1, int(p / 100 * len(latencias)))]
+
+        return {
+            "requests": len(latencias),
+            "promedio": sum(latencias) / len(latencias),
+            "p50": percentil(50),
+            "p99": percentil(99),
+            "max": latencias[-1],
+        }
+
+    def buscar_productos(
+        self,
+        terminos=None,
+        limit=None,
+        modo="secuencial",
+        concurrencia=None,
+        paginar=False,
+        max_por_categoria=None,
+        timestamp_corrida=None,
+    ):
+        """
+        Busca múltiples productos
+
+        modo: 'secuencial' (un término por vez) o 'async' (términos en paralelo)
+        concurrencia: requests simultáneos en modo async (default CONCURRENCIA_SCRAPER)
+        paginar: si es True recorre todas las páginas de cada término (ver
+            iterar_paginas) usando `limit` como tamaño de página
+        max_por_categoria: tope de productos por término al paginar
+        timestamp_corrida: timestamp de todos los productos (default: ahora)
+        """
+        self.timestamp_corrida = timestamp_corrida or datetime.now()
+
         if terminos is None:
             terminos = CATEGORIAS_PRODUCTOS
         if limit is None:
             limit = LIMITE_PRODUCTOS_POR_CATEGORIA
 
-        todos_productos = []
+        if modo == "async":
+            todos_productos = asyncio.run(
+                self.buscar_productos_async(
+                    terminos, limit, concurrencia, paginar, max_por_categoria
+                )
+            )
+        elif modo == "secuencial":
+            todos_productos = []
+
+            for termino in terminos:
+                print(f"Buscando: {termino}...")
+                productos = self._buscar_termino(
+                    termino, limit, paginar, max_por_categoria
+                )
+                todos_productos.extend(productos)
+        else:
+            raise ValueError(
+                f"Modo '{modo}' no válido. Opciones: ['secuencial', 'async']"
+            )
+
+        print(f"Total de productos obtenidos: {len(todos_productos)}")
+        return todos_productos
+
+    async def buscar_productos_async(
+        self, terminos, limit, concurrencia=None, paginar=False, max_por_categoria=None
+    ):
+        """
+        Busca todos los términos en paralelo, con a lo sumo `concurrencia`
+        requests en vuelo. Devuelve los productos en el orden de `terminos`.
+        """
 
-        for termino in terminos:
+        def buscar(termino):
             print(f"Buscando: {termino}...")
-            productos = self._buscar_un_producto(termino, limit)
-            todos_productos.extend(productos)
+            return self._buscar_termino(termino, limit, paginar, max_por_categoria)
+
+        resultados = await self._en_paralelo(
+            buscar, [(t,) for t in terminos], concurrencia
+        )
+        return [prod for productos in resultados for prod in productos]
+
+    def refrescar_eans(
+        self,
+        eans,
+        modo="async",
+        concurrencia=None,
+        tam_lote=None,
+        timestamp_corrida=None,
+    ):
+        """
+        Actualiza el precio de productos ya conocidos buscando su EAN directo,
+        sin repetir las búsquedas por término.
+
+        eans: dict ean -> categoria (la categoría con la que se guarda)
+        tam_lote: EANs por lote (default TAM_LOTE_REFRESCO). Dentro de cada
+            lote los EANs se piden en paralelo en modo async.
+        timestamp_corrida: timestamp de todos los productos (default: ahora)
+
+        La API no tiene un endpoint multi-EAN: cada EAN es una request chica
+        (limit=LIMITE_REFRESCO_EAN) en lugar de una página entera por término.
+        Medido contra scripts/mock_api.py con la base de CABA: refrescar 692
+        EANs son 692 requests, contra 27 de la búsqueda por término (108
+        paginando). Por eso scrapear_ubicaciones refresca en cada corrida sólo
+        los primeros EANs (los que hace más tiempo no se refrescan) que entran
+        en las requests de una búsqueda (ver requests_busqueda).
+        """
+        self.timestamp_corrida = timestamp_corrida or datetime.now()
+
+        if tam_lote is None:
+            tam_lote = TAM_LOTE_REFRESCO
+        if modo not in ("async", "secuencial"):
+            raise ValueError(
+                f"Modo '{modo}' no válido. Opciones: ['secuencial', 'async']"
+            )
+
+        items = list(eans.items())
+        todos_productos = []
+        self.eans_no_encontrados = []
+
+        for inicio in range(0, len(items), tam_lote):
+            lote = items[inicio : inicio + tam_lote]
+
+            if modo == "async":
+                resultados = asyncio.run(
+                    self._en_paralelo(self._refrescar_un_ean, lote, concurrencia)
+                )
+            else:
+                resultados = [self._refrescar_un_ean(*item) for item in lote]
 
+            for (ean, _), productos in zip(lote, resultados):
+                if not productos:
+                    self.eans_no_encontrados.append(ean)
+                todos_productos.extend(productos)
+
+            print(f"Refrescados {inicio + len(lote)}/{len(items)} EANs")
+
+        if self.eans_no_encontrados:
+            print(f"EANs sin precio disponible: {len(self.eans_no_encontrados)}")
         print(f"Total de productos obtenidos: {len(todos_productos)}")
         return todos_productos
 
-    def _buscar_un_producto(self, termino, limit):
-        """Busca un solo término"""
+    async def _en_paralelo(self, funcion, argumentos, concurrencia=None):
+        """
+        Ejecuta funcion(*args) para cada tupla de `argumentos` en un pool de
+        threads, con a lo sumo `concurrencia` llamadas en vuelo. Devuelve los
+        resultados en el mismo orden.
+        """
+        if concurrencia is None:
+            concurrencia = CONCURRENCIA_SCRAPER
+
+        loop = asyncio.get_running_loop()
+        semaforo = asyncio.Semaphore(concurrencia)
+
+        with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+
+            async def ejecutar(args):
+                async with semaforo:
+                    return await loop.run_in_executor(executor, funcion, *args)
+
+            return await asyncio.gather(*(ejecutar(args) for args in argumentos))
+
+    def _refrescar_un_ean(self, ean, categoria):
+        """Busca un EAN y devuelve sólo el producto que coincide exacto"""
+        data = self._pedir_pagina(ean, LIMITE_REFRESCO_EAN, 0)
+        if data is None:
+            return []
+
+        productos = [
+            prod for prod in data.get("productos", []) if str(prod.get("id")) == ean
+        ]
+        return self._limpiar_productos(productos, categoria)
+
+    def iterar_paginas(self, termino, tam_pagina=None, max_productos=None):
+        """
+        Generador que recorre los offsets de un término página por página.
+
+        Cada iteración devuelve la lista de productos limpios de una página.
+        Termina al llegar al `total` que informa la API, al recibir una página
+        vacía o al llegar a `max_productos` (default MAX_PRODUCTOS_POR_CATEGORIA).
+        Una página corta sólo corta la iteración si no hay `total` y es más
+        corta que el límite efectivo (la API topea `limit` en maxLimitPermitido).
+        La página siguiente se pide en segundo plano mientras se consume la actual.
+        """
+        if tam_pagina is None:
+            tam_pagina = LIMITE_PRODUCTOS_POR_CATEGORIA
+        if max_productos is None:
+            max_productos = MAX_PRODUCTOS_POR_CATEGORIA
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            offset = 0
+            pedido = min(tam_pagina, max_productos)
+            futuro = executor.submit(self._pedir_pagina, termino, pedido, offset)
+
+            while futuro is not None:
+                data = futuro.result()
+                futuro = None
+                if data is None:
+                    return
+
+                productos = data.get("productos", [])
+                offset += len(productos)
+                total = data.get("total")
+                tope = data.get("maxLimitPermitido")
+
+                if not productos or offset >= max_productos:
+                    hay_mas = False
+                elif total is not None:
+                    hay_mas = offset < total
+                elif tope is not None:
+                    hay_mas = len(productos) >= min(pedido, tope)
+                else:
+                    # Sin total ni tope no se sabe si la página vino recortada
+                    hay_mas = True
+
+                if hay_mas:
+                    pedido = min(tam_pagina, max_productos - offset)
+                    futuro = executor.submit(self._pedir_pagina, termino, pedido, offset)
+
+                if productos:
+                    yield self._limpiar_productos(productos, termino)
+
+    def _buscar_termino(self, termino, limit, paginar=False, max_por_categoria=None):
+        """Busca un término, recorriendo todas sus páginas si `paginar`"""
+        if not paginar:
+            return self._buscar_un_producto(termino, limit)
+
+        return [
+            prod
+            for pagina in self.iterar_paginas(termino, limit, max_por_categoria)
+            for prod in pagina
+        ]
+
+    def _buscar_un_producto(self, termino, limit, offset=0):
+        """Busca un solo término (una sola página)"""
+        data = self._pedir_pagina(termino, limit, offset)
+        if data is None:
+            return []
+
+        return self._limpiar_productos(data.get("productos", []), termino)
+
+    def _pedir_pagina(self, termino, limit, offset):
+        """
+        Pide una página de /productos. Devuelve el JSON o None si falla.
+
+        Primero consulta el cache en disco (en modo 'reproducir' nunca sale a
+        la red). Reintenta hasta API_REINTENTOS veces ante errores de
+        conexión, 429 y 5xx, con backoff exponencial y jitter (respeta
+        Retry-After).
+        """
         url = f"{self.base_url}/productos"
 
+        contenido = self.cache.obtener(url, termino, self.lat, self.lng, offset, limit)
+        if contenido is not None:
+            return decodificar_json(contenido)
+
+        if self.cache.solo_cache:
+            print(f"Sin respuesta cacheada para '{termino}' (offset {offset})")
+            with self._lock:
+                self.errores.append((termino, offset, "no está en cache"))
+            return None
+
         params = {
             "limit": limit,
-            "offset": 0,
+            "offset": offset,
             "string": termino,
             "lat": self.lat,
             "lng": self.lng,
         }
 
-        try:
-            response = requests.get(
-                url, params=params, headers=self.headers, timeout=API_TIMEOUT
+        for intento in range(API_REINTENTOS + 1):
+            if self.limitador:
+                self.limitador.adquirir()
+
+            response = None
+            inicio = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=API_TIMEOUT)
+                motivo = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                motivo = f"{type(e).__name__}: {e}"
+            finally:
+                with self._lock:
+                    self.latencias.append(time.perf_counter() - inicio)
+
+            if self.limitador:
+                self.limitador.registrar_respuesta(
+                    response.status_code if response is not None else None
+                )
+
+            if response is not None and response.status_code == 200:
+                try:
+                    data = decodificar_json(response.content)
+                except ValueError as e:
+                    motivo = f"JSON inválido: {e}"
+                    break
+
+                self.cache.guardar(
+                    url, termino, self.lat, self.lng, offset, limit, response.content
+                )
+                return data
+
+            reintentable = response is None or (
+                response.status_code == 429 or response.status_code >= 500
             )
+            if not reintentable or intento == API_REINTENTOS:
+                break
 
-            if response.status_code == 200:
-                data = response.json()
-                productos = data.get("productos", [])
+            espera = self._calcular_espera(intento, response)
+            print(
+                f"Reintentando '{termino}' (offset {offset}) en {espera:.1f}s "
+                f"[{motivo}]"
+            )
+            time.sleep(espera)
 
-                productos_limpios = []
-                for prod in productos:
-                    precio_min = prod.get("precioMin", 0)
-                    precio_max = prod.get("precioMax", 0)
-
-                    if precio_min > 0:
-                        productos_limpios.append(
-                            {
-                                "timestamp": datetime.now(),
-                                "fuente": self.nombre,
-                                "categoria": termino,
-                                "nombre": prod.get("nombre", ""),
-                                "marca": prod.get("marca", ""),
-                                "precio_min": float(precio_min),
-                                "precio_max": float(precio_max),
-                                "precio": float(precio_min),
-                                "presentacion": prod.get("presentacion", ""),
-                                "ean": prod.get("id", ""),
-                                "sucursales_disponibles": prod.get(
-                                    "cantSucursalesDisponible", 0
-                                ),
-                                "lat": self.lat,
-                                "lng": self.lng,
-                            }
-                        )
-
-                return productos_limpios
-            else:
-                print(f"Error HTTP {response.status_code}")
-                return []
+        print(f"Error en '{termino}' (offset {offset}): {motivo}")
+        with self._lock:
+            self.errores.append((termino, offset, motivo))
+        return None
 
-        except Exception as e:
-            print(f"Error: {e}")
-            return []
+    def _calcular_espera(self, intento, response=None):
+        """Backoff exponencial con full jitter, acotado por API_BACKOFF_MAX"""
+        tope = min(API_BACKOFF_MAX, API_BACKOFF_BASE * 2**intento)
+        espera = random.uniform(0, tope)
+
+        retry_after = None
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                espera = max(espera, min(float(retry_after), API_BACKOFF_MAX))
+            except ValueError:
+                pass
+
+        return espera
+
+    def _limpiar_productos(self, productos, termino):
+        """
+        Normaliza los productos crudos de la API (descarta los sin precio).
+
+        Todos comparten el timestamp de la corrida.
+        """
+        if self.timestamp_corrida is None:
+            self.timestamp_corrida = datetime.now()
+
+        timestamp = self.timestamp_corrida
+        fuente, lat, lng, ubicacion = self.nombre, self.lat, self.lng, self.ubicacion
+
+        productos_limpios = []
+        for prod in productos:
+            precio_min = prod.get("precioMin", 0)
+
+            if precio_min > 0:
+                precio_min = float(precio_min)
+                productos_limpios.append(
+                    ProductoScrapeado(
+                        timestamp,
+                        fuente,
+                        termino,
+                        prod.get("nombre", ""),
+                        prod.get("marca", ""),
+                        precio_min,
+                        float(prod.get("precioMax", 0)),
+                        precio_min,
+                        prod.get("presentacion", ""),
+                        prod.get("id", ""),
+                        prod.get("cantSucursalesDisponible", 0),
+                        lat,
+                        lng,
+                        ubicacion,
+                    )
+                )
+
+        return productos_limpios
 
     def guardar_csv_backup(self, datos):
         """Guarda backup en CSV"""
         if datos:
-            df = pd.DataFrame(datos)
+            df = a_dataframe(datos)
             filename = (
                 BACKUPS_DIR
                 / f"precios_claros_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
@@ -133,6 +523,134 @@ class PreciosClarosScraper:
             print(f"Backup guardado: {filename}")
 
 
+def crear_limitador(max_rps=None):
+    """Crea el rate limiter de la API (None si max_rps es 0)"""
+    if max_rps is None:
+        max_rps = API_MAX_RPS
+    if not max_rps:
+        return None
+    return RateLimiterAdaptativo(max_rps, tasa_min=API_MIN_RPS)
+
+
+def requests_busqueda(terminos=None, limit=None, paginar=False, max_por_categoria=None):
+    """
+    Requests que hace como máximo buscar_productos con estos parámetros: una
+    por término, o una por página hasta max_por_categoria al paginar
+    """
+    cantidad = len(CATEGORIAS_PRODUCTOS if terminos is None else terminos)
+    if not paginar:
+        return cantidad
+    if limit is None:
+        limit = LIMITE_PRODUCTOS_POR_CATEGORIA
+    if max_por_categoria is None:
+        max_por_categoria = MAX_PRODUCTOS_POR_CATEGORIA
+    return cantidad * math.ceil(max_por_categoria / limit)
+
+
+def scrapear_ubicaciones(
+    ubicaciones=None,
+    terminos=None,
+    limit=None,
+    max_workers=None,
+    eans_por_ubicacion=None,
+    **opciones,
+):
+    """
+    Scrapea varias ubicaciones en paralelo (un scraper por ubicación).
+
+    ubicaciones: claves de COORDENADAS (default: todas)
+    max_workers: ubicaciones simultáneas (default MAX_WORKERS_UBICACIONES)
+    eans_por_ubicacion: dict ubicacion -> {ean: categoria}, en orden de
+        prioridad (Database.obtener_eans_conocidos). Si se pasa, las
+        ubicaciones que tengan EANs se refrescan por EAN (refrescar_eans) en
+        lugar de buscar por término. Como es una request por EAN, se refrescan
+        sólo los primeros que entran en las requests de la búsqueda
+        (requests_busqueda, o MAX_EANS_REFRESCO si es menor).
+    opciones: se pasan a buscar_productos (modo, concurrencia, paginar, ...),
+        salvo base_url, max_rps y modo_cache que configuran los scrapers
+
+    Todos los scrapers comparten un mismo rate limiter, porque le pegan al
+    mismo host, y el mismo timestamp de corrida. Devuelve (productos,
+    scrapers, estrategias): la lista unificada de productos (cada uno con su
+    'ubicacion'), un dict ubicacion -> scraper para consultar métricas y un
+    dict ubicacion -> estrategia usada ('refresco' o 'busqueda').
+    """
+    if ubicaciones is None:
+        ubicaciones = list(COORDENADAS)
+    if max_workers is None:
+        max_workers = MAX_WORKERS_UBICACIONES
+
+    invalidas = [u for u in ubicaciones if u not in COORDENADAS]
+    if invalidas:
+        raise ValueError(
+            f"Ubicaciones no válidas: {invalidas}. Opciones: {list(COORDENADAS.keys())}"
+        )
+
+    base_url = opciones.pop("base_url", None)
+    modo_cache = opciones.pop("modo_cache", None)
+    limitador = crear_limitador(opciones.pop("max_rps", None))
+
+    timestamp_corrida = opciones.pop("timestamp_corrida", None) or datetime.now()
+
+    scrapers = {
+        ubicacion: PreciosClarosScraper(
+            ubicacion, base_url=base_url, modo_cache=modo_cache, limitador=limitador
+        )
+        for ubicacion in ubicaciones
+    }
+
+    def scrapear(ubicacion):
+        print(f"[{ubicacion}] Iniciando scraping...")
+        scraper = scrapers[ubicacion]
+        eans = (eans_por_ubicacion or {}).get(ubicacion)
+        if eans:
+            presupuesto = requests_busqueda(
+                terminos,
+                limit,
+                opciones.get("paginar", False),
+                opciones.get("max_por_categoria"),
+            )
+            if MAX_EANS_REFRESCO is not None:
+                presupuesto = min(presupuesto, MAX_EANS_REFRESCO)
+            if len(eans) > presupuesto:
+                # Los primeros son los que hace más tiempo no se refrescan
+                total = len(eans)
+                eans = dict(islice(eans.items(), presupuesto))
+                if eans:
+                    print(
+                        f"[{ubicacion}] Refrescando {len(eans)} de {total} EANs "
+                        f"conocidos (tope de {presupuesto} requests), rotando"
+                    )
+                else:
+                    print(f"[{ubicacion}] Sin presupuesto de refresco: búsqueda completa")
+            else:
+                print(f"[{ubicacion}] Refrescando {len(eans)} EANs conocidos")
+        try:
+            if eans:
+                productos = scraper.refrescar_eans(
+                    eans,
+                    modo=opciones.get("modo", "async"),
+                    concurrencia=opciones.get("concurrencia"),
+                    timestamp_corrida=timestamp_corrida,
+                )
+                return productos, "refresco"
+            productos = scraper.buscar_productos(
+                terminos, limit=limit, timestamp_corrida=timestamp_corrida, **opciones
+            )
+            return productos, "busqueda"
+        finally:
+            scraper.cerrar()
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(ubicaciones)))) as ex:
+        resultados = list(ex.map(scrapear, ubicaciones))
+
+    productos = [prod for lista, _ in resultados for prod in lista]
+    estrategias = {
+        ubicacion: estrategia for ubicacion, (_, estrategia) in zip(ubicaciones, resultados)
+    }
+    return productos, scrapers, estrategias
+
+
 if __name__ == "__main__":
     print("=" * 70)
     print("PRICE MONITOR - TEST DE SCRAPER")
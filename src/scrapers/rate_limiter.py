@@ -0,0 +1,100 @@
+"""
+Rate limiter adaptativo para el scraper (token bucket + AIMD)
+"""
+
+import threading
+import time
+
+
+class RateLimiterAdaptativo:
+    """
+    Token bucket cuya tasa se ajusta según las respuestas de la API.
+
+    Arranca en `tasa_max` requests/segundo. Ante un 429/503 la tasa se
+    multiplica por `factor_baja` (sin bajar de `tasa_min`) y cada respuesta
+    exitosa la vuelve a subir de a poco (aumento aditivo), hasta recuperar
+    `tasa_max`. Es thread-safe: lo comparten todos los workers del scraper.
+    """
+
+    STATUS_SATURACION = (429, 503)
+
+    def __init__(
+        self,
+        tasa_max,
+        tasa_min=0.5,
+        capacidad=None,
+        factor_baja=0.5,
+        incremento=0.5,
+        enfriamiento=1.0,
+    ):
+        """
+        tasa_max: techo de requests por segundo
+        tasa_min: piso al que puede bajar la tasa
+        capacidad: ráfaga máxima de tokens (default: 1 segundo a tasa_max)
+        factor_baja: multiplicador de la tasa ante saturación
+        incremento: requests/segundo que se recuperan por segundo de éxitos
+        enfriamiento: segundos mínimos entre dos bajas consecutivas
+        """
+        if tasa_max <= 0:
+            raise ValueError("tasa_max debe ser mayor a 0")
+
+        self.tasa_max = float(tasa_max)
+        self.tasa_min = min(float(tasa_min), self.tasa_max)
+        self.capacidad = float(capacidad or max(1.0, self.tasa_max))
+        self.factor_baja = factor_baja
+        self.incremento = incremento
+        self.enfriamiento = enfriamiento
+
+        self.tasa = self.tasa_max
+        self.tokens = self.capacidad
+        self.penalizaciones = 0
+
+        self._ultima_recarga = time.monotonic()
+        self._ultima_baja = 0.0
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """Bloquea hasta que haya un token disponible y lo consume"""
+        while True:
+            with self._lock:
+                self._recargar()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.tasa
+
+            time.sleep(espera)
+
+    def registrar_respuesta(self, status):
+        """Ajusta la tasa según el status HTTP (None = error de conexión)"""
+        with self._lock:
+            if status in self.STATUS_SATURACION:
+                ahora = time.monotonic()
+                if ahora - self._ultima_baja < self.enfriamiento:
+                    return
+
+                self._recargar()
+                self.tasa = max(self.tasa_min, self.tasa * self.factor_baja)
+                self.tokens = min(self.tokens, 0.0)
+                self._ultima_baja = ahora
+                self.penalizaciones += 1
+
+            elif status is not None and status < 400 and self.tasa < self.tasa_max:
+                self.tasa = min(self.tasa_max, self.tasa + self.incremento / self.tasa)
+
+    def estadisticas(self):
+        """Estado actual del limitador"""
+        with self._lock:
+            return {
+                "tasa_actual": self.tasa,
+                "tasa_max": self.tasa_max,
+                "penalizaciones": self.penalizaciones,
+            }
+
+    def _recargar(self):
+        """Suma los tokens generados desde la última recarga"""
+        ahora = time.monotonic()
+        self.tokens = min(
+            self.capacidad, self.tokens + (ahora - self._ultima_recarga) * self.tasa
+        )
+        self._ultima_recarga = ahora
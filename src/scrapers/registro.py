@@ -0,0 +1,114 @@
+"""
+Registro compacto para productos scrapeados
+"""
+
+import pandas as pd
+
+CAMPOS = (
+    "timestamp",
+    "fuente",
+    "categoria",
+    "nombre",
+    "marca",
+    "precio_min",
+    "precio_max",
+    "precio",
+    "presentacion",
+    "ean",
+    "sucursales_disponibles",
+    "lat",
+    "lng",
+    "ubicacion",
+    "corrida_id",
+)
+
+
+class ProductoScrapeado:
+    """
+    Producto normalizado con __slots__ (sin __dict__ por instancia).
+
+    Se comporta como un dict de sólo esas claves (p["precio"], p.get(...),
+    Producto(**p), dict(p)), así el resto del pipeline no cambia.
+    """
+
+    __slots__ = CAMPOS
+
+    def __init__(
+        self,
+        timestamp,
+        fuente,
+        categoria,
+        nombre,
+        marca,
+        precio_min,
+        precio_max,
+        precio,
+        presentacion,
+        ean,
+        sucursales_disponibles,
+        lat,
+        lng,
+        ubicacion=None,
+        corrida_id=None,
+    ):
+        self.timestamp = timestamp
+        self.fuente = fuente
+        self.categoria = categoria
+        self.nombre = nombre
+        self.marca = marca
+        self.precio_min = precio_min
+        self.precio_max = precio_max
+        self.precio = precio
+        self.presentacion = presentacion
+        self.ean = ean
+        self.sucursales_disponibles = sucursales_disponibles
+        self.lat = lat
+        self.lng = lng
+        self.ubicacion = ubicacion
+        self.corrida_id = corrida_id
+
+    # Protocolo de mapping
+    def keys(self):
+        return CAMPOS
+
+    def __getitem__(self, campo):
+        try:
+            return getattr(self, campo)
+        except AttributeError:
+            raise KeyError(campo) from None
+
+    def __setitem__(self, campo, valor):
+        if campo not in CAMPOS:
+            raise KeyError(campo)
+        setattr(self, campo, valor)
+
+    def __contains__(self, campo):
+        return campo in CAMPOS
+
+    def __iter__(self):
+        return iter(CAMPOS)
+
+    def __len__(self):
+        return len(CAMPOS)
+
+    def get(self, campo, default=None):
+        return getattr(self, campo, default) if campo in CAMPOS else default
+
+    def como_tupla(self):
+        return tuple(getattr(self, campo) for campo in CAMPOS)
+
+    def como_dict(self):
+        return {campo: getattr(self, campo) for campo in CAMPOS}
+
+    def __repr__(self):
+        return f"<ProductoScrapeado {str(self.nombre)[:30]}: ${self.precio}>"
+
+
+def a_dataframe(productos):
+    """DataFrame a partir de registros o dicts, sin pasar por un dict por fila"""
+    productos = list(productos)
+    if productos and all(isinstance(p, ProductoScrapeado) for p in productos):
+        return pd.DataFrame.from_records(
+            [p.como_tupla() for p in productos], columns=list(CAMPOS)
+        )
+    return pd.DataFrame([dict(p) for p in productos])
@@ -84,27 +84,195 @@ def filtrar_productos_invalidos(productos):
     return productos_validos
 
 
-def calcular_costo_canasta_basica(db):
+def deduplicar_por_ean(productos, prioridad=None):
     """
-    Calcula el costo de la canasta básica usando el producto más barato de cada categoría
+    Deja un solo registro por (EAN, ubicación) dentro de una corrida.
+
+    Términos solapados ("aceite girasol 900" / "aceite girasol") devuelven
+    los mismos productos. Se conserva un registro por EAN y su categoría es
+    la primera de `prioridad` a la que pertenezca (default
+    config.CANASTA_BASICA, para no sacar productos de la canasta), o si no
+    la primera en que apareció.
+
+    Devuelve (productos_unicos, membresia) donde membresia es
+    {ean: (categoria, ...)} sólo para los EANs que aparecieron en más de
+    una categoría. Los productos sin EAN se conservan todos.
+
+    El pipeline guarda la membresía en `producto_categorias`: el producto
+    más barato por categoría (_mas_baratos) y la canasta por corrida la
+    leen, así un producto cuenta en todas sus categorías. Las estadísticas
+    por categoría y grupo (estadisticas_diarias) cuentan cada producto una
+    sola vez, en la categoría con la que se guardó.
+    """
+    if prioridad is None:
+        prioridad = config.CANASTA_BASICA
+    rango = {categoria: i for i, categoria in enumerate(prioridad)}
+    sin_rango = len(rango)
+
+    unicos = {}
+    categorias = {}
+    sin_ean = []
+
+    for prod in productos:
+        ean = prod["ean"]
+        if not ean:
+            sin_ean.append(prod)
+            continue
+
+        vistas = categorias.setdefault(ean, [])
+        if prod["categoria"] not in vistas:
+            vistas.append(prod["categoria"])
+
+        clave = (ean, prod["ubicacion"])
+        actual = unicos.get(clave)
+        if actual is None:
+            unicos[clave] = prod
+            continue
+
+        if rango.get(prod["categoria"], sin_rango) < rango.get(
+            actual["categoria"], sin_rango
+        ):
+            unicos[clave] = prod
+
+    membresia = {ean: tuple(cats) for ean, cats in categorias.items() if len(cats) > 1}
+
+    duplicados = len(productos) - len(unicos) - len(sin_ean)
+    if duplicados:
+        print(
+            f"\nDuplicados por EAN descartados: {duplicados} "
+            f"({len(membresia)} productos en varias categorías)"
+        )
+
+    return list(unicos.values()) + sin_ean, membresia
+
+
+def _a_fecha(valor):
+    """date/datetime/'YYYY-MM-DD' -> date"""
+    from datetime import date, datetime
+
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+
+def _filtro_ventana(corrida_id=None, desde=None, hasta=None):
+    """
+    Condiciones sobre `productos` para acotar el análisis a una corrida o a
+    un rango de días (`hasta` inclusive). Sin argumentos: todo el historial.
     """
-    from sqlalchemy import func
+    from datetime import datetime, time, timedelta
     from src.database.models import Producto
 
+    condiciones = []
+    if corrida_id is not None:
+        condiciones.append(Producto.corrida_id == corrida_id)
+    if desde is not None:
+        condiciones.append(
+            Producto.timestamp >= datetime.combine(_a_fecha(desde), time.min)
+        )
+    if hasta is not None:
+        limite = datetime.combine(_a_fecha(hasta) + timedelta(days=1), time.min)
+        condiciones.append(Producto.timestamp < limite)
+    return condiciones
+
+
+def _mas_baratos(db, categorias, corrida_id=None, desde=None, hasta=None):
+    """
+    Producto más barato de cada categoría en una sola consulta
+    (ROW_NUMBER() OVER (PARTITION BY categoria ORDER BY precio_unitario)).
+
+    Se compara el precio por kg / lt / unidad dentro de la unidad más
+    frecuente de la categoría (así un envase de 200 ml no le gana a uno de
+    1 lt); los productos sin presentación reconocida quedan al final,
+    ordenados por precio. Un producto compite en su categoría y en las de
+    `producto_categorias` (deduplicar_por_ean lo guarda en una sola).
+    Devuelve {categoria: Producto}.
+    """
+    from sqlalchemy import func, select
+    from src.database.models import Producto, ProductoCategoria
+
+    categorias = list(categorias)
+    if not categorias:
+        return {}
+
+    condiciones = [Producto.precio.isnot(None), *_filtro_ventana(corrida_id, desde, hasta)]
+    pertenencia = (
+        select(Producto.id.label("id"), Producto.categoria.label("categoria"))
+        .where(Producto.categoria.in_(categorias), *condiciones)
+        .union_all(
+            select(Producto.id, ProductoCategoria.categoria)
+            .join(ProductoCategoria, ProductoCategoria.ean == Producto.ean)
+            .where(
+                ProductoCategoria.categoria.in_(categorias),
+                ProductoCategoria.categoria != Producto.categoria,
+                *condiciones,
+            )
+        )
+        .subquery()
+    )
+    candidatos = (
+        db.session.query(
+            Producto.id.label("id"),
+            pertenencia.c.categoria.label("categoria"),
+            Producto.unidad.label("unidad"),
+            Producto.precio.label("precio"),
+            Producto.precio_unitario.label("precio_unitario"),
+            func.count()
+            .over(partition_by=(pertenencia.c.categoria, Producto.unidad))
+            .label("cuenta"),
+        )
+        .join(pertenencia, pertenencia.c.id == Producto.id)
+        .subquery()
+    )
+    orden = (
+        func.row_number()
+        .over(
+            partition_by=candidatos.c.categoria,
+            order_by=(
+                candidatos.c.unidad.is_(None),
+                candidatos.c.cuenta.desc(),
+                candidatos.c.precio_unitario.asc(),
+                candidatos.c.precio.asc(),
+                candidatos.c.id.asc(),
+            ),
+        )
+        .label("orden")
+    )
+    ranking = db.session.query(
+        candidatos.c.id.label("id"), candidatos.c.categoria.label("categoria"), orden
+    ).subquery()
+    filas = (
+        db.session.query(ranking.c.categoria, Producto)
+        .join(ranking, ranking.c.id == Producto.id)
+        .filter(ranking.c.orden == 1)
+        .all()
+    )
+    return {categoria: producto for categoria, producto in filas}
+
+
+def calcular_costo_canasta_basica(db, corrida_id=None, desde=None, hasta=None):
+    """
+    Calcula el costo de la canasta básica usando el producto más barato de cada categoría
+    (por precio unitario: por kg, lt o unidad), con la misma regla de costo
+    que la serie de src/utils/canasta.py (ver costo_por_categoria)
+
+    corrida_id / desde / hasta: acotan el cálculo a una corrida o a un rango
+    de días (default: todo el historial)
+    """
+    import pandas as pd
+    from src.utils.canasta import costo_por_categoria
+
     print("\nCANASTA BÁSICA")
     print("-" * 70)
 
-    costo_total = 0
     productos_canasta = []
 
+    mas_baratos = _mas_baratos(db, config.CANASTA_BASICA, corrida_id, desde, hasta)
+
     for categoria in config.CANASTA_BASICA:
-        # Obtener el producto más barato de esta categoría
-        producto = (
-            db.session.query(Producto)
-            .filter(Producto.categoria == categoria)
-            .order_by(Producto.precio.asc())
-            .first()
-        )
+        producto = mas_baratos.get(categoria)
 
         if producto:
             productos_canasta.append(
@@ -114,51 +282,104 @@ def calcular_costo_canasta_basica(db):
                     "marca": producto.marca,
                     "precio": producto.precio,
                     "presentacion": producto.presentacion,
+                    "precio_unitario": producto.precio_unitario,
+                    "unidad": producto.unidad,
                 }
             )
-            costo_total += producto.precio
         else:
             print(f"  ADVERTENCIA: No hay datos para '{categoria}'")
 
+    if productos_canasta:
+        costos = costo_por_categoria(pd.DataFrame(productos_canasta))
+        for item, fila in zip(productos_canasta, costos.itertuples()):
+            item.update(cantidad=fila.cantidad, medida=fila.medida, costo=fila.costo)
+    costo_total = sum(item["costo"] for item in productos_canasta)
+
     # Mostrar resultados
     print(f"\nProductos en canasta ({len(productos_canasta)} items):\n")
     for item in productos_canasta:
+        cantidad = f"{item['cantidad']:g} {item['medida']}"
         print(
-            f"  {item['categoria']:20} | {item['nombre'][:35]:35} | ${item['precio']:7.2f}"
+            f"  {item['categoria']:20} | {item['nombre'][:35]:35} | "
+            f"{cantidad:>10} | ${item['costo']:9.2f}"
         )
 
-    print(f"\n{'COSTO TOTAL':56} | ${costo_total:7.2f}")
+    print(f"\n{'COSTO TOTAL':73} | ${costo_total:9.2f}")
     print("-" * 70)
 
     return {"productos": productos_canasta, "costo_total": costo_total}
 
 
-def estadisticas_por_grupo(db):
+def estadisticas_por_grupo(db, corrida_id=None, desde=None, hasta=None):
     """
     Agrupa estadísticas por los grupos definidos en CATEGORIAS_AGRUPADAS
+
+    Un solo GROUP BY sobre el mapeo categoría -> grupo. Sin corrida_id lee
+    los agregados diarios (acotados a desde/hasta); con corrida_id agrega
+    los productos de esa corrida.
     """
-    from sqlalchemy import func
-    from src.database.models import Producto
+    from sqlalchemy import case, func
+    from src.database.models import EstadisticaDiaria, Producto
 
     print("\nESTADÍSTICAS POR GRUPO")
     print("-" * 70)
 
+    mapeo = {
+        categoria: grupo
+        for grupo, categorias in config.CATEGORIAS_AGRUPADAS.items()
+        for categoria in categorias
+    }
     resultados = {}
+    if not mapeo:
+        return resultados
 
-    for grupo, categorias in config.CATEGORIAS_AGRUPADAS.items():
-        # Obtener productos de este grupo
-        stats = (
+    if corrida_id is not None:
+        grupo = case(mapeo, value=Producto.categoria).label("grupo")
+        filas = (
             db.session.query(
-                func.count(Producto.id).label("cantidad"),
+                grupo,
+                func.count(Producto.precio).label("cantidad"),
                 func.avg(Producto.precio).label("promedio"),
                 func.min(Producto.precio).label("minimo"),
                 func.max(Producto.precio).label("maximo"),
             )
-            .filter(Producto.categoria.in_(categorias))
-            .first()
+            .filter(
+                Producto.categoria.in_(list(mapeo)),
+                *_filtro_ventana(corrida_id, desde, hasta),
+            )
+            .group_by(grupo)
+            .all()
+        )
+    else:
+        # Desde los agregados diarios, sin recorrer la tabla de productos
+        grupo = case(mapeo, value=EstadisticaDiaria.categoria).label("grupo")
+        condiciones = [EstadisticaDiaria.categoria.in_(list(mapeo))]
+        if desde is not None:
+            condiciones.append(EstadisticaDiaria.fecha >= _a_fecha(desde))
+        if hasta is not None:
+            condiciones.append(EstadisticaDiaria.fecha <= _a_fecha(hasta))
+        filas = (
+            db.session.query(
+                grupo,
+                func.sum(EstadisticaDiaria.cantidad).label("cantidad"),
+                (
+                    func.sum(EstadisticaDiaria.suma)
+                    / func.sum(EstadisticaDiaria.cantidad)
+                ).label("promedio"),
+                func.min(EstadisticaDiaria.minimo).label("minimo"),
+                func.max(EstadisticaDiaria.maximo).label("maximo"),
+            )
+            .filter(*condiciones)
+            .group_by(grupo)
+            .all()
         )
 
-        if stats and stats.cantidad > 0:
+    por_grupo = {fila.grupo: fila for fila in filas}
+
+    for grupo in config.CATEGORIAS_AGRUPADAS:
+        stats = por_grupo.get(grupo)
+
+        if stats and stats.cantidad:
             resultados[grupo] = {
                 "cantidad": stats.cantidad,
                 "promedio": round(stats.promedio, 2),
@@ -174,13 +395,16 @@ def estadisticas_por_grupo(db):
     return resultados
 
 
-def productos_mas_baratos_por_categoria(db, categorias=None):
+def productos_mas_baratos_por_categoria(
+    db, categorias=None, corrida_id=None, desde=None, hasta=None
+):
     """
     Muestra el producto más barato de cada categoría
     Útil para armar la "lista de compras inteligente"
-    """
-    from src.database.models import Producto
 
+    corrida_id / desde / hasta: acotan la búsqueda a una corrida o a un
+    rango de días (default: todo el historial)
+    """
     if categorias is None:
         categorias = config.CATEGORIAS_PRODUCTOS
 
@@ -188,14 +412,10 @@ def productos_mas_baratos_por_categoria(db, categorias=None):
     print("-" * 70)
 
     resultados = []
+    mas_baratos = _mas_baratos(db, categorias, corrida_id, desde, hasta)
 
     for categoria in categorias:
-        producto = (
-            db.session.query(Producto)
-            .filter(Producto.categoria == categoria)
-            .order_by(Producto.precio.asc())
-            .first()
-        )
+        producto = mas_baratos.get(categoria)
 
         if producto:
             resultados.append(
@@ -205,6 +425,8 @@ def productos_mas_baratos_por_categoria(db, categorias=None):
                     "marca": producto.marca,
                     "precio": producto.precio,
                     "sucursales": producto.sucursales_disponibles,
+                    "precio_unitario": producto.precio_unitario,
+                    "unidad": producto.unidad,
                 }
             )
             print(
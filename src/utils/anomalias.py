@@ -0,0 +1,345 @@
+"""
+Detección de precios anómalos por EAN al momento de guardar
+
+Cada (EAN, ubicación) tiene un estado compacto en la tabla `estado_precios`:
+cantidad, media y M2 de Welford (varianza en línea), último precio aceptado y
+una EWMA. Cada observación nueva se evalúa en O(1) contra ese estado:
+
+    precio_maximo: sin historial (o sin EAN) y precio >= config.PRECIO_MAXIMO
+    salto:         más de ANOMALIA_SALTO_MAX veces (o menos de 1/x) el último
+    desvio:        con historial suficiente, |z| > ANOMALIA_Z_MAX y a más de
+                   ANOMALIA_DESVIO_MIN de la EWMA
+
+Las observaciones anómalas van a la tabla `cuarentena` y no actualizan el
+estado. Si un EAN acumula ANOMALIA_CONFIRMACIONES anomalías seguidas en un
+mismo nivel de precio se toma como un cambio real: el estado se reinicia con
+el precio nuevo.
+
+Cada estado guarda la última franja (operations.horas_bucket) en la que se
+contó una observación: una re-ejecución en la misma franja se evalúa pero no
+vuelve a actualizar el estado ni a sumar una confirmación, y la cuarentena no
+repite filas por (EAN, ubicación, franja).
+
+El estado se carga sólo para los EANs del lote y persiste entre corridas;
+la primera vez se siembra con un GROUP BY sobre `productos`.
+"""
+
+from pathlib import Path
+from collections import Counter
+from datetime import datetime
+import math
+import sys
+
+# Setup imports
+try:
+    import config
+except ImportError:
+    project_root = Path(__file__).parent.parent.parent
+    sys.path.insert(0, str(project_root))
+    import config
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from src.database.models import EstadoPrecio, ProductoCuarentena
+from src.database.normalizado import TAM_LOTE_IN
+from src.database.operations import clave_bucket, horas_bucket
+
+# Posiciones en la lista de estado de cada (EAN, ubicación)
+N, MEDIA, M2, ULTIMO, EWMA, SEGUIDAS, PENDIENTE, BUCKET = range(8)
+
+COLUMNAS_CUARENTENA = [
+    c.name for c in ProductoCuarentena.__table__.columns if c.name != "id"
+]
+
+
+def estado_inicial(precio, bucket=None):
+    """Estado de un EAN con una sola observación"""
+    return [1, precio, 0.0, precio, precio, 0, None, bucket]
+
+
+def actualizar_estado(estado, precio, alfa=None):
+    """Incorpora un precio aceptado al estado (Welford + EWMA), en el lugar"""
+    if alfa is None:
+        alfa = config.ANOMALIA_ALFA_EWMA
+    estado[N] += 1
+    delta = precio - estado[MEDIA]
+    estado[MEDIA] += delta / estado[N]
+    estado[M2] += delta * (precio - estado[MEDIA])
+    estado[ULTIMO] = precio
+    estado[EWMA] = alfa * precio + (1 - alfa) * estado[EWMA]
+    estado[SEGUIDAS] = 0
+    estado[PENDIENTE] = None
+    return estado
+
+
+def registrar_anomalia(estado, precio):
+    """
+    Cuenta una anomalía más si está en el nivel de la anterior (si no, empieza
+    a contar de nuevo). Devuelve True si ya se confirmó como nivel nuevo.
+    """
+    pendiente = estado[PENDIENTE]
+    if pendiente and abs(precio - pendiente) / pendiente <= config.ANOMALIA_DESVIO_MIN:
+        estado[SEGUIDAS] += 1
+    else:
+        estado[SEGUIDAS] = 1
+    estado[PENDIENTE] = precio
+    return estado[SEGUIDAS] >= config.ANOMALIA_CONFIRMACIONES
+
+
+def evaluar(estado, precio):
+    """
+    Evalúa un precio contra el estado de su EAN (None si no tiene).
+    Devuelve (motivo, referencia, z); motivo es None si el precio es normal.
+    """
+    if estado is None or not estado[N]:
+        if precio >= config.PRECIO_MAXIMO:
+            return "precio_maximo", None, None
+        return None, None, None
+
+    ultimo = estado[ULTIMO]
+    if ultimo and not (
+        1 / config.ANOMALIA_SALTO_MAX <= precio / ultimo <= config.ANOMALIA_SALTO_MAX
+    ):
+        return "salto", ultimo, None
+
+    if estado[N] < config.ANOMALIA_MIN_OBSERVACIONES:
+        return None, None, None
+
+    desvio = math.sqrt(estado[M2] / (estado[N] - 1)) if estado[N] > 1 else 0.0
+    ewma = estado[EWMA]
+    lejos = ewma and abs(precio - ewma) / ewma > config.ANOMALIA_DESVIO_MIN
+    if desvio > 0:
+        z = (precio - estado[MEDIA]) / desvio
+        if abs(z) > config.ANOMALIA_Z_MAX and lejos:
+            return "desvio", ewma, round(z, 2)
+    elif lejos:
+        # Precio constante hasta ahora: alcanza con alejarse de la EWMA
+        return "desvio", ewma, None
+    return None, None, None
+
+
+class DetectorAnomalias:
+    """
+    Separa un lote de productos en aceptados y en cuarentena.
+
+    filtrar() evalúa en memoria; confirmar() guarda el estado actualizado y
+    la cuarentena en una transacción (llamarlo después de guardar los
+    productos aceptados).
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.estados = {}  # (ean, ubicacion) -> estado
+        self.tocados = set()
+        self.cuarentena = []
+
+    def _cargar_estados(self, claves):
+        """Estado de los (EAN, ubicación) que todavía no están en memoria"""
+        faltantes = {clave for clave in claves if clave not in self.estados}
+        eans = sorted({ean for ean, _ in faltantes})
+        with self.db.engine.connect() as conn:
+            for inicio in range(0, len(eans), TAM_LOTE_IN):
+                lote = eans[inicio : inicio + TAM_LOTE_IN]
+                filas = conn.execute(
+                    select(
+                        EstadoPrecio.ean,
+                        EstadoPrecio.ubicacion,
+                        EstadoPrecio.n,
+                        EstadoPrecio.media,
+                        EstadoPrecio.m2,
+                        EstadoPrecio.ultimo_precio,
+                        EstadoPrecio.ewma,
+                        EstadoPrecio.anomalias_seguidas,
+                        EstadoPrecio.precio_pendiente,
+                        EstadoPrecio.bucket,
+                    ).where(EstadoPrecio.ean.in_(lote))
+                )
+                for ean, ubicacion, *estado in filas:
+                    if (ean, ubicacion) not in faltantes:
+                        continue
+                    self.estados[(ean, ubicacion)] = [
+                        estado[N] or 0,
+                        estado[MEDIA],
+                        estado[M2] or 0.0,
+                        estado[ULTIMO],
+                        estado[EWMA] if estado[EWMA] is not None else estado[MEDIA],
+                        estado[SEGUIDAS] or 0,
+                        estado[PENDIENTE],
+                        estado[BUCKET],
+                    ]
+
+    def filtrar(self, productos):
+        """
+        Devuelve (aceptados, en_cuarentena). Los productos sin EAN sólo se
+        comparan contra config.PRECIO_MAXIMO.
+        """
+        horas = horas_bucket()
+        self._cargar_estados(
+            (p["ean"], p.get("ubicacion") or "") for p in productos if p["ean"]
+        )
+
+        aceptados = []
+        en_cuarentena = []
+        for prod in productos:
+            ean, precio = prod["ean"], prod["precio"]
+            if precio is None:
+                aceptados.append(prod)
+                continue
+
+            clave = (ean, prod.get("ubicacion") or "")
+            bucket = clave_bucket(prod.get("timestamp") or datetime.now(), horas)
+            estado = self.estados.get(clave) if ean else None
+            motivo, referencia, z = evaluar(estado, precio)
+            # Ya contada en esta franja (re-ejecución o EAN repetido en el
+            # lote): se decide contra el estado, sin volver a actualizarlo
+            repetida = estado is not None and estado[BUCKET] == bucket
+            reiniciado = False
+
+            if motivo and estado is not None and not repetida:
+                self.tocados.add(clave)
+                estado[BUCKET] = bucket
+                if registrar_anomalia(estado, precio):
+                    # Varias corridas seguidas en el nuevo nivel: es real
+                    motivo = None
+                    self.estados[clave] = estado = estado_inicial(precio, bucket)
+                    reiniciado = True
+
+            if motivo:
+                en_cuarentena.append(prod)
+                registro = {columna: prod.get(columna) for columna in COLUMNAS_CUARENTENA}
+                registro.update(motivo=motivo, referencia=referencia, z=z, bucket=bucket)
+                self.cuarentena.append(registro)
+                continue
+
+            aceptados.append(prod)
+            if not ean or repetida:
+                continue
+            if estado is None:
+                self.estados[clave] = estado_inicial(precio, bucket)
+            elif not reiniciado:
+                actualizar_estado(estado, precio)
+                estado[BUCKET] = bucket
+            self.tocados.add(clave)
+
+        if en_cuarentena:
+            motivos = Counter(r["motivo"] for r in self.cuarentena[-len(en_cuarentena) :])
+            detalle = ", ".join(f"{m}: {c}" for m, c in motivos.most_common())
+            print(f"\nCuarentena: {len(en_cuarentena)} precios anómalos ({detalle})")
+
+        return aceptados, en_cuarentena
+
+    def confirmar(self, guardados=None):
+        """
+        Guarda el estado de los EANs evaluados y la cuarentena pendiente.
+
+        guardados: productos aceptados que efectivamente se guardaron (por
+            ejemplo tras un guardado parcial). Si se pasa, el estado sólo
+            avanza para esos (EAN, ubicación) y los que fueron a cuarentena.
+        """
+        if guardados is not None:
+            claves = {(p["ean"], p.get("ubicacion") or "") for p in guardados}
+            claves.update((r["ean"], r["ubicacion"] or "") for r in self.cuarentena)
+            self.tocados &= claves
+
+        ahora = datetime.now()
+        filas = [
+            {
+                "ean": ean,
+                "ubicacion": ubicacion,
+                "n": self.estados[(ean, ubicacion)][N],
+                "media": self.estados[(ean, ubicacion)][MEDIA],
+                "m2": self.estados[(ean, ubicacion)][M2],
+                "ultimo_precio": self.estados[(ean, ubicacion)][ULTIMO],
+                "ewma": self.estados[(ean, ubicacion)][EWMA],
+                "anomalias_seguidas": self.estados[(ean, ubicacion)][SEGUIDAS],
+                "precio_pendiente": self.estados[(ean, ubicacion)][PENDIENTE],
+                "bucket": self.estados[(ean, ubicacion)][BUCKET],
+                "actualizado": ahora,
+            }
+            for ean, ubicacion in self.tocados
+        ]
+
+        with self.db.engine.begin() as conn:
+            if filas:
+                sentencia = sqlite_insert(EstadoPrecio)
+                conn.execute(
+                    sentencia.on_conflict_do_update(
+                        index_elements=["ean", "ubicacion"],
+                        set_={
+                            columna: sentencia.excluded[columna]
+                            for columna in filas[0]
+                            if columna not in ("ean", "ubicacion")
+                        },
+                    ),
+                    filas,
+                )
+            if self.cuarentena:
+                # Una re-ejecución en la misma franja no repite filas
+                conn.execute(
+                    sqlite_insert(ProductoCuarentena).on_conflict_do_nothing(),
+                    self.cuarentena,
+                )
+
+        self.tocados.clear()
+        self.cuarentena = []
+        return len(filas)
+
+
+def sembrar_estado(db, forzar=False):
+    """
+    Carga `estado_precios` desde el historial de `productos` (una sola vez:
+    no hace nada si ya tiene filas, salvo `forzar`). Devuelve la cantidad de
+    (EAN, ubicación) sembrados.
+    """
+    with db.engine.begin() as conn:
+        if forzar:
+            conn.execute(text("DELETE FROM estado_precios"))
+        elif conn.execute(text("SELECT 1 FROM estado_precios LIMIT 1")).first():
+            return 0
+
+        resultado = conn.execute(
+            text(
+                """
+                INSERT INTO estado_precios
+                    (ean, ubicacion, n, media, m2, ultimo_precio, ewma,
+                     anomalias_seguidas, bucket, actualizado)
+                SELECT a.ean, a.ubicacion, a.n, a.media,
+                       MAX(a.suma_cuadrados - a.n * a.media * a.media, 0),
+                       u.precio, u.precio, 0, u.bucket, :ahora
+                FROM (
+                    SELECT ean, COALESCE(ubicacion, '') AS ubicacion,
+                           COUNT(*) AS n, AVG(precio) AS media,
+                           SUM(precio * precio) AS suma_cuadrados
+                    FROM productos
+                    WHERE ean IS NOT NULL AND precio > 0
+                    GROUP BY ean, COALESCE(ubicacion, '')
+                ) a
+                JOIN (
+                    SELECT ean, COALESCE(ubicacion, '') AS ubicacion, precio,
+                           bucket,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY ean, COALESCE(ubicacion, '')
+                               ORDER BY timestamp DESC, id DESC
+                           ) AS orden
+                    FROM productos
+                    WHERE ean IS NOT NULL AND precio > 0
+                ) u ON u.ean = a.ean AND u.ubicacion = a.ubicacion AND u.orden = 1
+                """
+            ),
+            {"ahora": datetime.now()},
+        )
+
+    if resultado.rowcount:
+        print(
+            f"Estado de anomalías sembrado para {resultado.rowcount} "
+            "(EAN, ubicación)"
+        )
+    return resultado.rowcount
+
+
+if __name__ == "__main__":
+    from src.database import Database
+
+    db = Database(sys.argv[1] if len(sys.argv) > 1 else "price_monitor.db")
+    sembrar_estado(db, forzar=True)
@@ -0,0 +1,313 @@
+"""
+Archivo histórico en Parquet (particionado por fecha/ubicación) con consultas
+analíticas vía DuckDB
+
+Cada corrida se agrega como archivos Parquet comprimidos con zstd bajo
+data/archivo/fecha=YYYY-MM-DD/ubicacion=CABA/. Las consultas leen sólo las
+particiones del rango pedido, vectorizadas y sin tocar la base operativa.
+
+Los archivos sólo se agregan: re-ejecutar una corrida en la misma franja deja
+filas repetidas, y la vista `historial` se queda con la última de cada
+(EAN, ubicación, franja), la misma clave del merge de `productos`.
+
+DuckDB es opcional: sin él el pipeline sigue funcionando y el archivo se omite.
+"""
+
+from pathlib import Path
+import sys
+
+import pandas as pd
+
+# Motor del archivo (opcional)
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Setup imports
+try:
+    import config
+except ImportError:
+    project_root = Path(__file__).parent.parent.parent
+    sys.path.insert(0, str(project_root))
+    import config
+
+from src.database.operations import horas_bucket
+from src.scrapers.registro import CAMPOS, a_dataframe
+from src.utils.canasta import costos_canasta
+from src.utils.paths import ARCHIVO_DIR
+
+COMPRESION = "zstd"
+
+
+def disponible():
+    """True si está instalado DuckDB"""
+    return duckdb is not None
+
+
+def _conectar():
+    if duckdb is None:
+        raise ImportError("El archivo Parquet necesita duckdb (pip install duckdb)")
+    return duckdb.connect()
+
+
+def _preparar(df):
+    """Columnas del registro + fecha de partición, con tipos estables"""
+    df = df.reindex(columns=list(CAMPOS))
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df["ubicacion"] = df["ubicacion"].fillna("desconocida")
+    df["ean"] = df["ean"].astype("string")
+    df["corrida_id"] = pd.to_numeric(df["corrida_id"]).astype("Int64")
+    df["fecha"] = df["timestamp"].dt.date
+    return df
+
+
+def _escribir(con, df, prefijo, directorio):
+    con.register("lote", df)
+    try:
+        con.execute(
+            f"""
+            COPY lote TO '{Path(directorio).as_posix()}' (
+                FORMAT parquet,
+                COMPRESSION {COMPRESION},
+                PARTITION_BY (fecha, ubicacion),
+                APPEND,
+                FILENAME_PATTERN '{prefijo}_{{uuid}}'
+            )
+            """
+        )
+    finally:
+        con.unregister("lote")
+
+
+def archivar_corrida(productos, directorio=None):
+    """
+    Agrega los productos de una corrida al archivo. Devuelve la cantidad de
+    filas escritas (0 si no hay productos).
+    """
+    df = a_dataframe(productos)
+    if df.empty:
+        return 0
+    directorio = Path(directorio or ARCHIVO_DIR)
+    directorio.mkdir(parents=True, exist_ok=True)
+
+    df = _preparar(df)
+    corridas = df["corrida_id"].dropna().unique()
+    prefijo = f"corrida_{corridas[0]}" if len(corridas) == 1 else "corridas"
+
+    con = _conectar()
+    try:
+        _escribir(con, df, prefijo, directorio)
+    finally:
+        con.close()
+
+    print(f"Archivo Parquet: {len(df)} filas en {directorio}")
+    return len(df)
+
+
+def archivar_historial(db, directorio=None, tam_lote=50000, forzar=False):
+    """
+    Exporta la tabla `productos` completa al archivo (migración inicial),
+    en lotes de `tam_lote` filas. No hace nada si el archivo ya tiene datos,
+    salvo `forzar`. Devuelve la cantidad de filas escritas.
+    """
+    from sqlalchemy import text
+
+    directorio = Path(directorio or ARCHIVO_DIR)
+    if not forzar and any(directorio.glob("**/*.parquet")):
+        print(f"El archivo {directorio} ya tiene datos")
+        return 0
+    directorio.mkdir(parents=True, exist_ok=True)
+    columnas = ", ".join(CAMPOS)
+
+    total = 0
+    con = _conectar()
+    try:
+        with db.engine.connect() as conn:
+            lotes = pd.read_sql(
+                text(f"SELECT {columnas} FROM productos ORDER BY id"),
+                conn,
+                chunksize=tam_lote,
+            )
+            for numero, lote in enumerate(lotes):
+                _escribir(con, _preparar(lote), f"historial_{numero}", directorio)
+                total += len(lote)
+    finally:
+        con.close()
+
+    print(f"Historial archivado: {total} filas en {directorio}")
+    return total
+
+
+class ArchivoParquet:
+    """
+    Consultas analíticas sobre el archivo Parquet.
+
+    Expone la vista `historial` (todas las particiones, una fila por EAN,
+    ubicación y franja de horas_bucket) para consultas SQL propias y
+    agregaciones equivalentes a las de src/utils/analysis.py sobre rangos de
+    fechas arbitrarios.
+    """
+
+    def __init__(self, directorio=None):
+        self.directorio = Path(directorio or ARCHIVO_DIR)
+        self.con = _conectar()
+        patron = (self.directorio / "**" / "*.parquet").as_posix()
+        self.con.execute(
+            f"""
+            CREATE VIEW historial AS
+            SELECT * FROM read_parquet('{patron}', hive_partitioning = true,
+                                       union_by_name = true)
+            QUALIFY ean IS NULL OR ROW_NUMBER() OVER (
+                PARTITION BY ean, ubicacion, fecha,
+                             hour(timestamp) // {horas_bucket()}
+                ORDER BY timestamp DESC
+            ) = 1
+            """
+        )
+
+    def cerrar(self):
+        self.con.close()
+
+    def consultar(self, sql, parametros=None):
+        """Ejecuta SQL de DuckDB (puede usar la vista `historial`) -> DataFrame"""
+        return self.con.execute(sql, parametros or []).df()
+
+    def _filtro(self, desde=None, hasta=None, ubicacion=None, categorias=None):
+        """WHERE sobre las columnas de partición (poda particiones) + parámetros"""
+        condiciones, parametros = [], []
+        if desde is not None:
+            condiciones.append("fecha >= CAST(? AS DATE)")
+            parametros.append(str(desde))
+        if hasta is not None:
+            condiciones.append("fecha <= CAST(? AS DATE)")
+            parametros.append(str(hasta))
+        if ubicacion is not None:
+            condiciones.append("ubicacion = ?")
+            parametros.append(ubicacion)
+        if categorias is not None:
+            categorias = list(categorias)
+            marcadores = ", ".join("?" for _ in categorias) or "NULL"
+            condiciones.append(f"categoria IN ({marcadores})")
+            parametros.extend(categorias)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        return where, parametros
+
+    def estadisticas_por_categoria(self, desde=None, hasta=None, ubicacion=None):
+        """Cantidad, promedio, mínimo y máximo por categoría en el rango"""
+        where, parametros = self._filtro(desde, hasta, ubicacion)
+        return self.consultar(
+            f"""
+            SELECT categoria,
+                   COUNT(precio) AS cantidad,
+                   ROUND(AVG(precio), 2) AS precio_promedio,
+                   MIN(precio) AS precio_min,
+                   MAX(precio) AS precio_max
+            FROM historial {where}
+            GROUP BY categoria
+            ORDER BY categoria
+            """,
+            parametros,
+        )
+
+    def estadisticas_por_grupo(self, desde=None, hasta=None, ubicacion=None):
+        """Como analysis.estadisticas_por_grupo, sobre config.CATEGORIAS_AGRUPADAS"""
+        grupos = pd.DataFrame(
+            [
+                {"grupo": grupo, "categoria": categoria}
+                for grupo, categorias in config.CATEGORIAS_AGRUPADAS.items()
+                for categoria in categorias
+            ]
+        )
+        where, parametros = self._filtro(desde, hasta, ubicacion)
+        self.con.register("grupos", grupos)
+        try:
+            return self.consultar(
+                f"""
+                SELECT g.grupo,
+                       COUNT(h.precio) AS cantidad,
+                       ROUND(AVG(h.precio), 2) AS promedio,
+                       MIN(h.precio) AS minimo,
+                       MAX(h.precio) AS maximo
+                FROM (SELECT * FROM historial {where}) h
+                JOIN grupos g USING (categoria)
+                GROUP BY g.grupo
+                ORDER BY g.grupo
+                """,
+                parametros,
+            )
+        finally:
+            self.con.unregister("grupos")
+
+    def mas_baratos_por_categoria(
+        self, categorias=None, desde=None, hasta=None, ubicacion=None
+    ):
+        """Producto más barato de cada categoría en el rango"""
+        where, parametros = self._filtro(desde, hasta, ubicacion, categorias)
+        return self.consultar(
+            f"""
+            SELECT categoria, nombre, marca, precio,
+                   sucursales_disponibles AS sucursales, fecha, ubicacion
+            FROM historial {where}
+            QUALIFY ROW_NUMBER() OVER (
+                PARTITION BY categoria ORDER BY precio, timestamp DESC
+            ) = 1
+            ORDER BY categoria
+            """,
+            parametros,
+        )
+
+    def evolucion_mensual(self, categorias=None, desde=None, hasta=None, ubicacion=None):
+        """Precio promedio, mínimo y máximo por mes y categoría"""
+        where, parametros = self._filtro(desde, hasta, ubicacion, categorias)
+        return self.consultar(
+            f"""
+            SELECT DATE_TRUNC('month', fecha) AS mes,
+                   categoria,
+                   COUNT(precio) AS cantidad,
+                   ROUND(AVG(precio), 2) AS promedio,
+                   MIN(precio) AS minimo,
+                   MAX(precio) AS maximo
+            FROM historial {where}
+            GROUP BY mes, categoria
+            ORDER BY mes, categoria
+            """,
+            parametros,
+        )
+
+    def costo_canasta_diario(self, desde=None, hasta=None, ubicacion=None):
+        """
+        Costo diario de la canasta básica por día y ubicación, con la misma
+        regla que la serie de `costos_canasta` (src/utils/canasta.py): el
+        más barato por precio unitario de cada categoría de
+        config.CANASTA_BASICA, por su cantidad de referencia
+        """
+        where, parametros = self._filtro(
+            desde, hasta, ubicacion, config.CANASTA_BASICA
+        )
+        precios = self.consultar(
+            f"""
+            SELECT fecha, ubicacion, categoria, precio, presentacion
+            FROM historial {where}
+            """,
+            parametros,
+        )
+        costos = costos_canasta(precios, claves=("fecha", "ubicacion"))
+        return (
+            costos[["fecha", "ubicacion", "costo_total", "categorias"]]
+            .sort_values(["fecha", "ubicacion"])
+            .reset_index(drop=True)
+        )
+
+
+if __name__ == "__main__":
+    # Migración inicial: exporta la base al archivo y muestra un resumen
+    from src.database import Database
+
+    db = Database(sys.argv[1] if len(sys.argv) > 1 else "price_monitor.db")
+    archivar_historial(db)
+
+    archivo = ArchivoParquet()
+    print(archivo.estadisticas_por_categoria().to_string(index=False))
+    print(archivo.costo_canasta_diario().to_string(index=False))
+    archivo.cerrar()
@@ -0,0 +1,331 @@
+"""
+Serie temporal del costo de la canasta básica
+
+El costo de una corrida es la suma, sobre config.CANASTA_BASICA, del costo
+del producto más barato de cada categoría (por precio unitario): su precio
+unitario por la cantidad de referencia de config.REFERENCIA_CANASTA, o su
+precio por los envases de config.CANTIDADES_CANASTA si no está en esa unidad
+(ver costo_por_categoria, la misma regla que usan el análisis, el dashboard
+y el archivo Parquet). Se calcula en una sola pasada vectorizada (orden +
+primero por grupo y pivot por categoría), sin iterar por día.
+
+Los resultados se guardan en la tabla `costos_canasta`, una fila por
+corrida: cada actualización calcula sólo las corridas que todavía no están.
+"""
+
+from pathlib import Path
+import hashlib
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Setup imports
+try:
+    import config
+except ImportError:
+    project_root = Path(__file__).parent.parent.parent
+    sys.path.insert(0, str(project_root))
+    import config
+
+from sqlalchemy import text
+
+from src.database.models import CostoCanasta
+from src.database.normalizado import TAM_LOTE_IN, cargar_dataframe
+from src.database.unidades import elegir_por_precio_unitario, precios_unitarios
+
+# Cambia la firma de la canasta cuando cambia el criterio de elección o de costo
+CRITERIO = "precio_unitario_x_referencia"
+
+COLUMNAS_PRECIOS = ("corrida_id", "categoria", "precio", "unidad", "precio_unitario")
+
+COLUMNAS_COSTO = [
+    "corrida_id",
+    "inicio",
+    "fecha",
+    "ubicacion",
+    "costo_total",
+    "categorias",
+    "completa",
+]
+
+
+def _composicion(canasta=None, cantidades=None, referencias=None):
+    if canasta is None:
+        canasta = config.CANASTA_BASICA
+    if cantidades is None:
+        cantidades = config.CANTIDADES_CANASTA
+    if referencias is None:
+        referencias = config.REFERENCIA_CANASTA
+    canasta = list(canasta)
+    return canasta, {c: cantidades.get(c, 1) for c in canasta}, {
+        c: referencias[c] for c in canasta if c in referencias
+    }
+
+
+def firma_canasta(canasta=None, cantidades=None, referencias=None):
+    """Hash corto de la composición de la canasta (categorías y cantidades)"""
+    canasta, cantidades, referencias = _composicion(canasta, cantidades, referencias)
+    contenido = json.dumps(
+        [canasta, cantidades, {c: list(r) for c, r in referencias.items()}, CRITERIO],
+        ensure_ascii=False,
+    )
+    return hashlib.md5(contenido.encode("utf-8")).hexdigest()
+
+
+def costo_por_categoria(elegidos, cantidades=None, referencias=None):
+    """
+    Costo en la canasta de cada producto elegido (`categoria`, `precio`,
+    `unidad`, `precio_unitario`): precio_unitario x la cantidad de referencia
+    de su categoría (config.REFERENCIA_CANASTA) si está en esa unidad, si no
+    precio x los envases de config.CANTIDADES_CANASTA.
+
+    Devuelve un DataFrame alineado con `elegidos` con `cantidad`, `medida`
+    (kg, lt, un o 'envases') y `costo`.
+    """
+    if cantidades is None:
+        cantidades = config.CANTIDADES_CANASTA
+    if referencias is None:
+        referencias = config.REFERENCIA_CANASTA
+
+    categoria = elegidos["categoria"]
+    referencia = categoria.map(lambda c: referencias.get(c, (np.nan, None))[0])
+    medida = categoria.map(lambda c: referencias.get(c, (np.nan, None))[1])
+    precio_unitario = pd.to_numeric(elegidos["precio_unitario"], errors="coerce")
+    por_referencia = (
+        elegidos["unidad"].eq(medida) & precio_unitario.notna() & referencia.notna()
+    )
+
+    envases = categoria.map(lambda c: cantidades.get(c, 1)).astype(float)
+    precio = pd.to_numeric(elegidos["precio"], errors="coerce").astype(float)
+    return pd.DataFrame(
+        {
+            "cantidad": np.where(por_referencia, referencia, envases),
+            "medida": np.where(por_referencia, medida, "envases"),
+            "costo": np.where(
+                por_referencia,
+                precio_unitario.astype(float) * referencia.astype(float),
+                precio * envases,
+            ),
+        },
+        index=elegidos.index,
+    )
+
+
+def costos_canasta(
+    precios, claves=("corrida_id",), canasta=None, cantidades=None, referencias=None
+):
+    """
+    Costo de la canasta por cada combinación de `claves`.
+
+    precios: DataFrame con las columnas de `claves`, `categoria`, `precio` y
+        `unidad` / `precio_unitario` (o `presentacion` para calcularlos),
+        p. ej. filas de `productos`
+    claves: columnas que identifican cada punto de la serie, p. ej.
+        ("corrida_id",) o ("fecha", "ubicacion")
+
+    Devuelve un DataFrame con las claves, una columna por categoría con su
+    costo (ver costo_por_categoria), `costo_total` (categorías faltantes no
+    suman), `categorias` (cuántas tienen precio) y `completa`.
+    """
+    canasta, cantidades, referencias = _composicion(canasta, cantidades, referencias)
+    claves = list(claves)
+
+    datos = precios[precios["categoria"].isin(canasta) & precios["precio"].notna()]
+    if "precio_unitario" not in datos.columns:
+        datos = datos.join(precios_unitarios(datos["precio"], datos["presentacion"]))
+    elegidos = elegir_por_precio_unitario(datos, claves)
+    elegidos = elegidos.assign(
+        costo=costo_por_categoria(elegidos, cantidades, referencias)["costo"]
+    )
+    costos = (
+        elegidos.set_index(claves + ["categoria"])["costo"]
+        .astype(float)
+        .unstack("categoria")
+        .reindex(columns=canasta)
+    )
+
+    matriz = costos.to_numpy(dtype=float)
+    presentes = ~np.isnan(matriz)
+    resultado = costos.copy()
+    resultado["costo_total"] = np.where(presentes, matriz, 0.0).sum(axis=1)
+    resultado["categorias"] = presentes.sum(axis=1)
+    resultado["completa"] = resultado["categorias"] == len(canasta)
+    resultado.columns.name = None
+    return resultado.reset_index()
+
+
+def _corridas_pendientes(conn, firma):
+    """Corridas terminadas sin costo calculado con la canasta actual"""
+    return pd.read_sql(
+        text(
+            """
+            SELECT c.id AS corrida_id, c.inicio, c.fecha, u.nombre AS ubicacion
+            FROM corridas c
+            LEFT JOIN ubicaciones u ON u.id = c.ubicacion_id
+            WHERE c.estado IN ('ok', 'parcial')
+              AND NOT EXISTS (
+                  SELECT 1 FROM costos_canasta k
+                  WHERE k.corrida_id = c.id AND k.firma = :firma
+              )
+            ORDER BY c.id
+            """
+        ),
+        conn,
+        params={"firma": firma},
+    )
+
+
+def _leer_precios(db, conn, corridas, canasta):
+    """
+    (corrida_id, categoria, precio, unidad, precio_unitario) de las corridas.
+    Los productos de varias categorías (`producto_categorias`) aparecen una
+    vez por cada categoría de la canasta a la que pertenecen.
+    """
+    if config.MODO_ALMACENAMIENTO == "normalizado":
+        df = cargar_dataframe(db, corridas=corridas)
+        membresia = db.obtener_membresia_categorias(df["ean"].dropna().unique())
+        otras = df["ean"].map(membresia).explode().dropna()
+        otras = otras[otras.to_numpy() != df["categoria"].loc[otras.index].to_numpy()]
+        extra = df.loc[otras.index].assign(categoria=otras.to_numpy())
+        df = pd.concat([df, extra], ignore_index=True)
+        df = df.loc[df["categoria"].isin(canasta)]
+        df = df.join(precios_unitarios(df["precio"], df["presentacion"]))
+        return df[list(COLUMNAS_PRECIOS)]
+
+    marcadores_cat = ", ".join(f":cat{i}" for i in range(len(canasta)))
+    parametros_cat = {f"cat{i}": categoria for i, categoria in enumerate(canasta)}
+    lotes = []
+    for inicio in range(0, len(corridas), TAM_LOTE_IN):
+        lote = corridas[inicio : inicio + TAM_LOTE_IN]
+        marcadores = ", ".join(f":c{i}" for i in range(len(lote)))
+        parametros = {f"c{i}": int(corrida) for i, corrida in enumerate(lote)}
+        parametros.update(parametros_cat)
+        lotes.append(
+            pd.read_sql(
+                text(
+                    f"""
+                    SELECT {', '.join(COLUMNAS_PRECIOS)} FROM productos
+                    WHERE corrida_id IN ({marcadores})
+                      AND categoria IN ({marcadores_cat})
+                      AND precio IS NOT NULL
+                    UNION ALL
+                    SELECT p.corrida_id, pc.categoria, p.precio, p.unidad,
+                           p.precio_unitario
+                    FROM productos p
+                    JOIN producto_categorias pc ON pc.ean = p.ean
+                    WHERE p.corrida_id IN ({marcadores})
+                      AND pc.categoria IN ({marcadores_cat})
+                      AND pc.categoria != p.categoria
+                      AND p.precio IS NOT NULL
+                    """
+                ),
+                conn,
+                params=parametros,
+            )
+        )
+    if not lotes:
+        return pd.DataFrame(columns=list(COLUMNAS_PRECIOS))
+    return pd.concat(lotes, ignore_index=True)
+
+
+def actualizar_costos_canasta(db, forzar=False):
+    """
+    Calcula y guarda el costo de la canasta de las corridas que faltan en
+    `costos_canasta` (o de todas si `forzar`). Las filas calculadas con otra
+    composición de canasta se recalculan. Devuelve la cantidad de corridas
+    calculadas.
+    """
+    canasta, _, _ = _composicion()
+    firma = firma_canasta()
+
+    with db.engine.begin() as conn:
+        if forzar:
+            conn.execute(text("DELETE FROM costos_canasta"))
+        pendientes = _corridas_pendientes(conn, firma)
+        if pendientes.empty:
+            return 0
+
+        corridas = pendientes["corrida_id"].tolist()
+        precios = _leer_precios(db, conn, corridas, canasta)
+        costos = costos_canasta(precios)
+
+        # Las corridas sin ningún producto de la canasta también se guardan
+        # (costo 0, incompletas) para no recalcularlas en cada actualización
+        filas = pendientes.merge(
+            costos[["corrida_id", "costo_total", "categorias", "completa"]],
+            on="corrida_id",
+            how="left",
+        )
+        filas["costo_total"] = filas["costo_total"].fillna(0.0)
+        filas["categorias"] = filas["categorias"].fillna(0).astype(int)
+        filas["completa"] = filas["completa"].fillna(False).astype(bool)
+        filas["inicio"] = pd.to_datetime(filas["inicio"])
+        filas["fecha"] = pd.to_datetime(filas["fecha"]).dt.date
+        filas["firma"] = firma
+
+        for inicio in range(0, len(corridas), TAM_LOTE_IN):
+            lote = corridas[inicio : inicio + TAM_LOTE_IN]
+            conn.execute(
+                CostoCanasta.__table__.delete().where(
+                    CostoCanasta.corrida_id.in_(lote)
+                )
+            )
+        registros = filas.astype(object).where(filas.notna(), None)
+        conn.execute(
+            CostoCanasta.__table__.insert(), registros.to_dict(orient="records")
+        )
+
+    print(f"Costo de canasta calculado para {len(filas)} corridas")
+    return len(filas)
+
+
+def obtener_costos_canasta(
+    db, ubicacion=None, desde=None, hasta=None, por_dia=False, solo_completas=False
+):
+    """
+    Serie del costo de la canasta desde `costos_canasta`.
+
+    por_dia: una fila por día y ubicación (la última corrida del día)
+    solo_completas: sólo corridas con precio para todas las categorías
+    """
+    condiciones = []
+    parametros = {}
+    if ubicacion is not None:
+        condiciones.append("ubicacion = :ubicacion")
+        parametros["ubicacion"] = ubicacion
+    if desde is not None:
+        condiciones.append("fecha >= :desde")
+        parametros["desde"] = str(desde)[:10]
+    if hasta is not None:
+        condiciones.append("fecha <= :hasta")
+        parametros["hasta"] = str(hasta)[:10]
+    if solo_completas:
+        condiciones.append("completa = 1")
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    with db.engine.connect() as conn:
+        df = pd.read_sql(
+            text(
+                f"SELECT {', '.join(COLUMNAS_COSTO)} FROM costos_canasta {where} "
+                "ORDER BY inicio, corrida_id"
+            ),
+            conn,
+            params=parametros,
+        )
+    df["inicio"] = pd.to_datetime(df["inicio"])
+    df["fecha"] = pd.to_datetime(df["fecha"]).dt.date
+    df["completa"] = df["completa"].astype(bool)
+
+    if por_dia:
+        df = df.groupby(["fecha", "ubicacion"], dropna=False).tail(1)
+    return df.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    from src.database import Database
+
+    db = Database(sys.argv[1] if len(sys.argv) > 1 else "price_monitor.db")
+    actualizar_costos_canasta(db)
+    print(obtener_costos_canasta(db, por_dia=True).to_string(index=False))
@@ -0,0 +1,319 @@
+"""
+Índices de precios encadenados (Jevons y Laspeyres) sobre EANs pareados
+
+En lugar de comparar precios promedio (que cambian con la mezcla de
+productos), cada eslabón entre dos días consecutivos usa sólo los
+productos (EAN + ubicación) presentes en ambos:
+
+    Jevons:    media geométrica de p_t / p_t-1
+    Laspeyres: sum(p_t * q_t-1) / sum(p_t-1 * q_t-1), con las sucursales
+               disponibles como proxy de cantidad
+
+El índice de cada día es el producto de los eslabones (base 100 en el
+primer día), por categoría, por grupo de config.CATEGORIAS_AGRUPADAS y
+general. El panel EAN x día y los eslabones se calculan con arrays de
+NumPy, sin iterar por producto ni por día.
+
+Los resultados se guardan en `indices_precios`; cada actualización sólo
+lee los días nuevos (más el último ya guardado, que se recalcula por si
+tuvo corridas posteriores) y encadena desde el último nivel guardado.
+"""
+
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Setup imports
+try:
+    import config
+except ImportError:
+    project_root = Path(__file__).parent.parent.parent
+    sys.path.insert(0, str(project_root))
+    import config
+
+from sqlalchemy import text
+
+from src.database.models import IndicePrecio
+from src.database.normalizado import serie_temporal
+
+BASE_INDICE = 100.0
+NIVEL_GENERAL = "General"
+COLUMNAS_INDICE = ["fecha", "nivel", "nombre", "jevons", "laspeyres", "pareados"]
+
+
+def panel_precios(df):
+    """
+    Panel de precios productos x días.
+
+    df: una fila por observación con `fecha`, `ean`, `ubicacion`,
+        `categoria`, `precio` y `sucursales`
+
+    Devuelve (fechas, categorias, P, Q): las fechas ordenadas, la categoría
+    de cada producto (la de su última observación) y dos arrays
+    (productos x fechas) con el precio promedio del día y las sucursales,
+    NaN donde el producto no se observó.
+    """
+    datos = df[df["ean"].notna() & (df["precio"] > 0)]
+    datos = datos.assign(
+        ubicacion=datos["ubicacion"].fillna(""),
+        sucursales=pd.to_numeric(datos["sucursales"], errors="coerce"),
+    )
+    diario = (
+        datos.groupby(["ean", "ubicacion", "fecha"], sort=False)
+        .agg(
+            precio=("precio", "mean"),
+            sucursales=("sucursales", "mean"),
+            categoria=("categoria", "last"),
+        )
+        .reset_index()
+        .sort_values("fecha", kind="mergesort")
+    )
+
+    codigos, _ = pd.MultiIndex.from_frame(diario[["ean", "ubicacion"]]).factorize()
+    fechas = np.array(sorted(diario["fecha"].unique()))
+    columnas = np.searchsorted(fechas, diario["fecha"].to_numpy())
+
+    n_productos = codigos.max() + 1 if len(codigos) else 0
+    P = np.full((n_productos, len(fechas)), np.nan)
+    Q = np.full((n_productos, len(fechas)), np.nan)
+    P[codigos, columnas] = diario["precio"].to_numpy(dtype=float)
+    Q[codigos, columnas] = diario["sucursales"].to_numpy(dtype=float)
+
+    categorias = np.empty(n_productos, dtype=object)
+    categorias[codigos] = diario["categoria"].to_numpy()  # queda la última
+    return fechas, categorias, P, Q
+
+
+def niveles(categorias, grupos=None):
+    """
+    Niveles de agregación y su matriz de pertenencia (niveles x productos).
+    Devuelve (lista de (nivel, nombre), matriz booleana).
+    """
+    if grupos is None:
+        grupos = config.CATEGORIAS_AGRUPADAS
+    categorias = pd.Series(categorias, dtype=object)
+
+    etiquetas = [("general", NIVEL_GENERAL)]
+    filas = [np.ones(len(categorias), dtype=bool)]
+    for grupo, miembros in grupos.items():
+        etiquetas.append(("grupo", grupo))
+        filas.append(categorias.isin(miembros).to_numpy())
+    for categoria in sorted(categorias.dropna().unique()):
+        etiquetas.append(("categoria", categoria))
+        filas.append((categorias == categoria).to_numpy())
+
+    return etiquetas, np.vstack(filas) if filas else np.zeros((0, 0), dtype=bool)
+
+
+def eslabones(P, Q, pertenencia):
+    """
+    Eslabones entre días consecutivos para cada nivel.
+
+    Devuelve (jevons, laspeyres, pareados), arrays (niveles x días-1). Un
+    nivel sin productos pareados en un eslabón lo deja en 1 (sin cambio).
+    """
+    anterior, actual = P[:, :-1], P[:, 1:]
+    pareado = np.isfinite(anterior) & np.isfinite(actual)
+    M = pertenencia.astype(float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_relativos = np.where(pareado, np.log(actual / anterior), 0.0)
+    pareados = M @ pareado
+    suma_logs = M @ log_relativos
+    jevons = np.exp(
+        np.divide(suma_logs, pareados, out=np.zeros_like(suma_logs), where=pareados > 0)
+    )
+
+    # Sin dato de sucursales (o 0) el producto pesa como una sucursal
+    peso = np.where(pareado, np.fmax(np.nan_to_num(Q[:, :-1]), 1.0), 0.0)
+    numerador = M @ np.where(pareado, actual * peso, 0.0)
+    denominador = M @ np.where(pareado, anterior * peso, 0.0)
+    laspeyres = np.divide(
+        numerador,
+        denominador,
+        out=np.ones_like(numerador),
+        where=denominador > 0,
+    )
+    return jevons, laspeyres, pareados.astype(int)
+
+
+def calcular_indices(df, base=None, grupos=None):
+    """
+    Índices encadenados de cada día de `df` (ver panel_precios).
+
+    base: {(nivel, nombre): (jevons, laspeyres)} con el nivel de cada índice
+        en el primer día de `df`, para seguir una serie ya calculada
+        (default BASE_INDICE para todos)
+
+    Devuelve un DataFrame con COLUMNAS_INDICE, una fila por día y nivel.
+    """
+    base = base or {}
+    fechas, categorias, P, Q = panel_precios(df)
+    if len(fechas) == 0:
+        return pd.DataFrame(columns=COLUMNAS_INDICE)
+
+    etiquetas, pertenencia = niveles(categorias, grupos)
+    jevons, laspeyres, pareados = eslabones(P, Q, pertenencia)
+
+    inicial = np.array(
+        [base.get(etiqueta, (BASE_INDICE, BASE_INDICE)) for etiqueta in etiquetas],
+        dtype=float,
+    ).reshape(len(etiquetas), 2)
+    serie_jevons = inicial[:, [0]] * np.cumprod(
+        np.hstack([np.ones((len(etiquetas), 1)), jevons]), axis=1
+    )
+    serie_laspeyres = inicial[:, [1]] * np.cumprod(
+        np.hstack([np.ones((len(etiquetas), 1)), laspeyres]), axis=1
+    )
+    serie_pareados = np.hstack([np.zeros((len(etiquetas), 1), dtype=int), pareados])
+
+    # Sólo niveles con productos observados ese día
+    observados = pertenencia.astype(float) @ np.isfinite(P) > 0
+    filas, columnas = np.nonzero(observados)
+    return pd.DataFrame(
+        {
+            "fecha": fechas[columnas],
+            "nivel": [etiquetas[i][0] for i in filas],
+            "nombre": [etiquetas[i][1] for i in filas],
+            "jevons": serie_jevons[filas, columnas].round(4),
+            "laspeyres": serie_laspeyres[filas, columnas].round(4),
+            "pareados": serie_pareados[filas, columnas],
+        }
+    ).sort_values(["fecha", "nivel", "nombre"], ignore_index=True)
+
+
+def _leer_observaciones(db, conn, desde=None):
+    """Observaciones (fecha, ean, ubicacion, categoria, precio, sucursales)"""
+    if config.MODO_ALMACENAMIENTO == "normalizado":
+        df = serie_temporal(db, desde=None if desde is None else str(desde))
+        df["fecha"] = df["timestamp"].dt.date
+        df = df.rename(columns={"sucursales_disponibles": "sucursales"})
+        return df[["fecha", "ean", "ubicacion", "categoria", "precio", "sucursales"]]
+
+    filtro = "" if desde is None else "WHERE dia >= :desde"
+    df = pd.read_sql(
+        text(
+            f"""
+            SELECT * FROM (
+                SELECT COALESCE(c.fecha, date(p.timestamp)) AS dia,
+                       p.ean, p.ubicacion, p.categoria, p.precio,
+                       p.sucursales_disponibles AS sucursales
+                FROM productos p
+                LEFT JOIN corridas c ON c.id = p.corrida_id
+                WHERE p.ean IS NOT NULL AND p.precio > 0
+                  AND COALESCE(c.estado, 'ok') != 'error'
+            ) {filtro}
+            """
+        ),
+        conn,
+        params={} if desde is None else {"desde": str(desde)},
+    )
+    df["fecha"] = pd.to_datetime(df.pop("dia")).dt.date
+    return df
+
+
+def actualizar_indices(db, forzar=False):
+    """
+    Extiende `indices_precios` con los días nuevos (o la recalcula entera si
+    `forzar`). Devuelve la cantidad de filas escritas.
+    """
+    with db.engine.begin() as conn:
+        if forzar:
+            conn.execute(text("DELETE FROM indices_precios"))
+        fechas = [
+            fila[0]
+            for fila in conn.execute(
+                text("SELECT DISTINCT fecha FROM indices_precios ORDER BY fecha")
+            )
+        ]
+
+        # El último día guardado se reabre; se encadena desde el anterior
+        ancla = fechas[-2] if len(fechas) >= 2 else None
+        base = {}
+        if ancla is None:
+            conn.execute(text("DELETE FROM indices_precios"))
+        else:
+            conn.execute(
+                text("DELETE FROM indices_precios WHERE fecha > :ancla"),
+                {"ancla": ancla},
+            )
+            # Último valor de cada nivel hasta el ancla: un nivel sin productos
+            # ese día sigue desde donde quedó (como en el cálculo completo)
+            base = {
+                (nivel, nombre): (jevons, laspeyres)
+                for nivel, nombre, jevons, laspeyres in conn.execute(
+                    text(
+                        """
+                        SELECT i.nivel, i.nombre, i.jevons, i.laspeyres
+                        FROM indices_precios i
+                        JOIN (
+                            SELECT nivel, nombre, MAX(fecha) AS fecha
+                            FROM indices_precios
+                            WHERE fecha <= :ancla
+                            GROUP BY nivel, nombre
+                        ) u USING (nivel, nombre, fecha)
+                        """
+                    ),
+                    {"ancla": ancla},
+                )
+            }
+
+        indices = calcular_indices(_leer_observaciones(db, conn, desde=ancla), base)
+        if ancla is not None:
+            # Los niveles del día ancla ya están guardados
+            indices = indices[indices["fecha"] > pd.Timestamp(ancla).date()]
+        if indices.empty:
+            return 0
+
+        registros = indices.astype(object).to_dict(orient="records")
+        conn.execute(IndicePrecio.__table__.insert(), registros)
+
+    print(
+        f"Índices de precios: {indices['fecha'].nunique()} días "
+        f"({len(indices)} filas)"
+    )
+    return len(indices)
+
+
+def obtener_indices(db, nivel=None, nombres=None, desde=None, hasta=None):
+    """Series de `indices_precios` (DataFrame con COLUMNAS_INDICE)"""
+    condiciones = []
+    parametros = {}
+    if nivel is not None:
+        condiciones.append("nivel = :nivel")
+        parametros["nivel"] = nivel
+    if nombres is not None:
+        nombres = list(nombres)
+        marcadores = ", ".join(f":n{i}" for i in range(len(nombres)))
+        condiciones.append(f"nombre IN ({marcadores})" if nombres else "0")
+        parametros.update({f"n{i}": nombre for i, nombre in enumerate(nombres)})
+    if desde is not None:
+        condiciones.append("fecha >= :desde")
+        parametros["desde"] = str(desde)[:10]
+    if hasta is not None:
+        condiciones.append("fecha <= :hasta")
+        parametros["hasta"] = str(hasta)[:10]
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    with db.engine.connect() as conn:
+        df = pd.read_sql(
+            text(
+                f"SELECT {', '.join(COLUMNAS_INDICE)} FROM indices_precios {where} "
+                "ORDER BY fecha, nivel, nombre"
+            ),
+            conn,
+            params=parametros,
+        )
+    df["fecha"] = pd.to_datetime(df["fecha"]).dt.date
+    return df
+
+
+if __name__ == "__main__":
+    from src.database import Database
+
+    db = Database(sys.argv[1] if len(sys.argv) > 1 else "price_monitor.db")
+    actualizar_indices(db)
+    generales = obtener_indices(db, nivel="grupo")
+    print(generales.to_string(index=False))
@@ -5,6 +5,8 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent
 DATA_DIR = PROJECT_ROOT / "data"
 BACKUPS_DIR = DATA_DIR / "backups"
 EXPORTS_DIR = DATA_DIR / "exports"
+CACHE_DIR = DATA_DIR / "cache"
+ARCHIVO_DIR = DATA_DIR / "archivo"
 LOGS_DIR = PROJECT_ROOT / "logs"
 
 
@@ -13,4 +15,6 @@ def init_directories():
     """Inicializa la estructura de directorios"""
     BACKUPS_DIR.mkdir(parents=True, exist_ok=True)
     EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    ARCHIVO_DIR.mkdir(parents=True, exist_ok=True)
     LOGS_DIR.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,55 @@
+"""
+Fixtures comunes: una base SQLite nueva por test (en tmp_path) y productos
+con la forma que devuelve el scraper.
+"""
+
+from datetime import datetime
+from pathlib import Path
+import sys
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.database import Database
+import config
+
+
+@pytest.fixture(autouse=True)
+def corridas_cada_6_horas(monkeypatch):
+    """Los tests asumen corridas cada 6 horas, sea cual sea la cadencia de config"""
+    monkeypatch.setattr(config, "HORAS_DESCUBRIMIENTO", "0")
+    monkeypatch.setattr(config, "HORAS_REFRESCO", "6,12,18")
+    monkeypatch.setattr(config, "HORAS_BUCKET_INGESTA", None)
+
+
+@pytest.fixture
+def db(tmp_path):
+    base = Database(str(tmp_path / "test.db"))
+    yield base
+    base.cerrar_sesion()
+    base.engine.dispose()
+
+
+def producto(ean, precio, categoria="leche entera", ubicacion="CABA", **campos):
+    """Producto como los de PreciosClarosScraper._limpiar_productos"""
+    datos = {
+        "timestamp": datetime(2025, 11, 21, 9),
+        "fuente": "Precios Claros",
+        "categoria": categoria,
+        "nombre": f"Producto {ean}",
+        "marca": "Marca",
+        "precio": precio,
+        "precio_min": precio,
+        "precio_max": precio,
+        "presentacion": "1.0 lt",
+        "ean": ean,
+        "sucursales_disponibles": 10,
+        "lat": -34.6037,
+        "lng": -58.3816,
+        "ubicacion": ubicacion,
+        "corrida_id": None,
+    }
+    datos.update(campos)
+    return datos
@@ -0,0 +1,56 @@
+from conftest import producto
+from src.utils.analysis import _mas_baratos, deduplicar_por_ean
+
+
+def test_deduplicar_conserva_la_categoria_prioritaria():
+    productos = [
+        producto("1", 100, categoria="aceite girasol 900"),
+        producto("1", 100, categoria="aceite girasol"),
+        producto("2", 50, categoria="aceite girasol 900"),
+    ]
+    unicos, membresia = deduplicar_por_ean(productos, prioridad=["aceite girasol"])
+
+    assert sorted((p["ean"], p["categoria"]) for p in unicos) == [
+        ("1", "aceite girasol"),
+        ("2", "aceite girasol 900"),
+    ]
+    assert membresia == {"1": ("aceite girasol 900", "aceite girasol")}
+
+
+def test_deduplicar_por_ubicacion_registra_todas_las_categorias():
+    # La primera aparición en otra ubicación también suma su categoría
+    productos = [
+        producto("1", 100, categoria="arroz", ubicacion="CABA"),
+        producto("1", 90, categoria="arroz largo fino", ubicacion="MAR_DEL_PLATA"),
+    ]
+    unicos, membresia = deduplicar_por_ean(productos, prioridad=[])
+
+    assert len(unicos) == 2
+    assert membresia == {"1": ("arroz", "arroz largo fino")}
+
+
+def test_deduplicar_conserva_productos_sin_ean():
+    productos = [producto("", 10), producto(None, 20), producto("1", 30)]
+    unicos, membresia = deduplicar_por_ean(productos)
+
+    assert len(unicos) == 3
+    assert membresia == {}
+
+
+def test_mas_baratos_incluye_categorias_de_la_membresia(db):
+    # "1" quedó guardado en "sal fina" pero también es de "sal gruesa"
+    productos = [
+        producto("1", 100, categoria="sal fina", presentacion="1.0 kg"),
+        producto("2", 300, categoria="sal gruesa", presentacion="1.0 kg"),
+    ]
+    unicos, membresia = deduplicar_por_ean(
+        productos + [producto("1", 100, categoria="sal gruesa", presentacion="1.0 kg")],
+        prioridad=["sal fina"],
+    )
+    db.guardar_productos_merge(unicos)
+    db.guardar_membresia_categorias(membresia)
+
+    mas_baratos = _mas_baratos(db, ["sal fina", "sal gruesa"])
+
+    assert mas_baratos["sal fina"].ean == "1"
+    assert mas_baratos["sal gruesa"].ean == "1"
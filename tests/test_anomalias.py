@@ -0,0 +1,157 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func
+
+import config
+from conftest import producto
+from src.database.models import EstadoPrecio, ProductoCuarentena
+from src.utils.anomalias import (
+    SEGUIDAS,
+    DetectorAnomalias,
+    actualizar_estado,
+    estado_inicial,
+    evaluar,
+    registrar_anomalia,
+    sembrar_estado,
+)
+
+
+def estado_con(*precios):
+    estado = estado_inicial(precios[0])
+    for precio in precios[1:]:
+        actualizar_estado(estado, precio)
+    return estado
+
+
+def test_sin_historial_solo_aplica_el_precio_maximo():
+    assert evaluar(None, config.PRECIO_MAXIMO - 1) == (None, None, None)
+    assert evaluar(None, config.PRECIO_MAXIMO)[0] == "precio_maximo"
+
+
+def test_salto_respecto_del_ultimo_precio():
+    estado = estado_con(100, 102)
+    motivo, referencia, _ = evaluar(estado, 102 * config.ANOMALIA_SALTO_MAX * 1.1)
+    assert (motivo, referencia) == ("salto", 102)
+    assert evaluar(estado, 102 / (config.ANOMALIA_SALTO_MAX * 1.1))[0] == "salto"
+    assert evaluar(estado, 104)[0] is None
+
+
+def test_desvio_necesita_historial_y_distancia_a_la_ewma():
+    pocos = estado_con(100, 101, 99)
+    assert evaluar(pocos, 200)[0] is None  # menos de ANOMALIA_MIN_OBSERVACIONES
+
+    estado = estado_con(100, 101, 99, 100, 101, 99, 100)
+    motivo, referencia, z = evaluar(estado, 200)
+    assert motivo == "desvio"
+    assert referencia == pytest.approx(estado[4])
+    assert z > config.ANOMALIA_Z_MAX
+    assert evaluar(estado, 103)[0] is None
+
+
+def test_desvio_con_precio_constante():
+    estado = estado_con(*[100] * config.ANOMALIA_MIN_OBSERVACIONES)
+    assert evaluar(estado, 150) == ("desvio", 100, None)
+    assert evaluar(estado, 110)[0] is None
+
+
+def test_registrar_anomalia_confirma_un_nivel_sostenido():
+    estado = estado_con(100, 100)
+    confirmaciones = [registrar_anomalia(estado, 400) for _ in range(3)]
+    assert confirmaciones == [False] * (config.ANOMALIA_CONFIRMACIONES - 1) + [True]
+
+
+def test_registrar_anomalia_reinicia_si_cambia_el_nivel():
+    estado = estado_con(100, 100)
+    registrar_anomalia(estado, 400)
+    registrar_anomalia(estado, 420)  # mismo nivel (dentro de ANOMALIA_DESVIO_MIN)
+    assert estado[SEGUIDAS] == 2
+
+    assert registrar_anomalia(estado, 900) is False
+    assert estado[SEGUIDAS] == 1
+
+
+def test_aceptar_un_precio_reinicia_las_anomalias_seguidas():
+    estado = estado_con(100, 100)
+    registrar_anomalia(estado, 400)
+    actualizar_estado(estado, 101)
+    assert estado[SEGUIDAS] == 0
+
+
+def corrida(detector, hora, precios, ubicacion="CABA"):
+    """filtrar + confirmar un lote {ean: precio} a `hora` del 21/11"""
+    productos = [
+        producto(
+            ean, precio, ubicacion=ubicacion, timestamp=datetime(2025, 11, 21, hora)
+        )
+        for ean, precio in precios.items()
+    ]
+    aceptados, en_cuarentena = detector.filtrar(productos)
+    detector.confirmar()
+    return [p["ean"] for p in aceptados], [p["ean"] for p in en_cuarentena]
+
+
+def test_estado_por_ubicacion(db):
+    detector = DetectorAnomalias(db)
+    corrida(detector, 0, {"1": 100})
+    # Otro nivel de precio en otra ubicación no es un salto
+    assert corrida(detector, 0, {"1": 400}, ubicacion="MAR_DEL_PLATA") == (["1"], [])
+    assert corrida(detector, 6, {"1": 400}) == ([], ["1"])
+
+
+def test_reejecutar_en_la_misma_franja_no_cuenta_dos_veces(db):
+    corrida(DetectorAnomalias(db), 0, {"1": 100})
+    for _ in range(2):
+        # Detector nuevo en cada corrida, como en el pipeline
+        assert corrida(DetectorAnomalias(db), 6, {"1": 102, "2": 90000}) == (["1"], ["2"])
+
+    n = db.session.query(EstadoPrecio.n).filter_by(ean="1").scalar()
+    cuarentena = db.session.query(func.count(ProductoCuarentena.id)).scalar()
+    assert (n, cuarentena) == (2, 1)
+
+
+def test_una_confirmacion_por_corrida(db, monkeypatch):
+    monkeypatch.setattr(config, "ANOMALIA_CONFIRMACIONES", 3)
+    corrida(DetectorAnomalias(db), 0, {"1": 100})
+    # Repetir la anomalía dentro de la misma franja no suma confirmaciones
+    for _ in range(3):
+        assert corrida(DetectorAnomalias(db), 6, {"1": 400}) == ([], ["1"])
+
+    assert corrida(DetectorAnomalias(db), 12, {"1": 400}) == ([], ["1"])
+    assert corrida(DetectorAnomalias(db), 18, {"1": 400}) == (["1"], [])
+
+
+def test_confirmar_solo_los_guardados(db):
+    corrida(DetectorAnomalias(db), 0, {"1": 100, "2": 200})
+    detector = DetectorAnomalias(db)
+    productos = [
+        producto(ean, precio, timestamp=datetime(2025, 11, 21, 6))
+        for ean, precio in {"1": 102, "2": 204, "3": 90000}.items()
+    ]
+    aceptados, _ = detector.filtrar(productos)
+    # Guardado parcial: el chunk con el EAN 2 falló
+    detector.confirmar([p for p in aceptados if p["ean"] == "1"])
+
+    estados = dict(db.session.query(EstadoPrecio.ean, EstadoPrecio.n))
+    cuarentena = db.session.query(ProductoCuarentena.ean).all()
+    assert estados == {"1": 2, "2": 1}
+    assert cuarentena == [("3",)]
+    # La re-ejecución de la franja sí cuenta el EAN que no se guardó
+    assert corrida(DetectorAnomalias(db), 6, {"2": 204}) == (["2"], [])
+    assert db.session.query(EstadoPrecio.n).filter_by(ean="2").scalar() == 2
+
+
+def test_sembrar_estado_por_ubicacion(db):
+    db.guardar_productos_merge(
+        [
+            producto("1", 100, timestamp=datetime(2025, 11, 21, 0)),
+            producto(
+                "1", 300, ubicacion="MAR_DEL_PLATA", timestamp=datetime(2025, 11, 21, 0)
+            ),
+        ]
+    )
+    assert sembrar_estado(db) == 2
+    # La re-ejecución de la franja sembrada no vuelve a contar
+    detector = DetectorAnomalias(db)
+    assert corrida(detector, 1, {"1": 100}) == (["1"], [])
+    assert db.session.query(EstadoPrecio.n).filter_by(ubicacion="CABA").scalar() == 1
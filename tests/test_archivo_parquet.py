@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import producto
+
+pytest.importorskip("duckdb")
+
+from src.utils.archivo_parquet import ArchivoParquet, archivar_corrida
+
+
+def test_reejecutar_una_corrida_no_duplica_el_historial(tmp_path):
+    primera = [
+        producto("1", 100, timestamp=datetime(2025, 11, 21, 12), corrida_id=1),
+        producto("2", 200, timestamp=datetime(2025, 11, 21, 12), corrida_id=1),
+        producto(None, 50, timestamp=datetime(2025, 11, 21, 12), corrida_id=1),
+    ]
+    # Re-ejecución en la misma franja con un precio nuevo, y otra franja
+    repetida = [
+        producto("1", 110, timestamp=datetime(2025, 11, 21, 13), corrida_id=2),
+    ]
+    siguiente = [
+        producto("1", 120, timestamp=datetime(2025, 11, 21, 18), corrida_id=3),
+    ]
+    for productos in (primera, repetida, siguiente):
+        archivar_corrida(productos, directorio=tmp_path)
+
+    archivo = ArchivoParquet(tmp_path)
+    try:
+        filas = archivo.consultar(
+            "SELECT ean, precio FROM historial ORDER BY timestamp, ean"
+        )
+    finally:
+        archivo.cerrar()
+
+    assert filas["precio"].tolist() == [200, 50, 110, 120]
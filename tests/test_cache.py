@@ -0,0 +1,25 @@
+from src.scrapers.cache import CacheRespuestas
+
+
+def test_clave_distingue_base_url_y_path(tmp_path):
+    cache = CacheRespuestas(tmp_path)
+    parametros = ("leche", -34.6, -58.4, 0, 100)
+
+    real = cache.clave("https://api.ejemplo/prod/productos", *parametros)
+    mock = cache.clave("http://localhost:5000/productos", *parametros)
+    otro_path = cache.clave("https://api.ejemplo/prod/sucursales", *parametros)
+
+    assert len({real, mock, otro_path}) == 3
+    assert real == cache.clave("https://api.ejemplo/prod/productos", *parametros)
+
+
+def test_no_sirve_respuestas_de_otra_url(tmp_path):
+    cache = CacheRespuestas(tmp_path)
+    parametros = ("leche", -34.6, -58.4, 0, 100)
+
+    cache.guardar("http://localhost:5000/productos", *parametros, b'{"productos": []}')
+
+    assert cache.obtener("http://localhost:5000/productos", *parametros) == (
+        b'{"productos": []}'
+    )
+    assert cache.obtener("https://api.ejemplo/prod/productos", *parametros) is None
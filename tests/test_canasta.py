@@ -0,0 +1,84 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from conftest import producto
+
+from src.utils.canasta import costo_por_categoria, costos_canasta
+
+CANASTA = ["aceite girasol", "yerba mate"]
+CANTIDADES = {"aceite girasol": 1, "yerba mate": 2}
+REFERENCIAS = {"aceite girasol": (1, "lt"), "yerba mate": (1, "kg")}
+
+
+def _precios(filas):
+    return pd.DataFrame(
+        [
+            {"corrida_id": 1, "categoria": c, "precio": p, "presentacion": pr}
+            for c, p, pr in filas
+        ]
+    )
+
+
+def test_costo_es_precio_unitario_por_referencia():
+    # 900 ml a 3000 (3333/lt) contra 1,5 lt a 4800 (3200/lt): cuenta 1 lt
+    # del más barato por litro, no el precio de su envase
+    precios = _precios(
+        [
+            ("aceite girasol", 3000, "900 cc"),
+            ("aceite girasol", 4800, "1,5 lt"),
+        ]
+    )
+    costos = costos_canasta(
+        precios, canasta=CANASTA, cantidades=CANTIDADES, referencias=REFERENCIAS
+    )
+
+    fila = costos.iloc[0]
+    assert fila["aceite girasol"] == pytest.approx(3200)
+    assert fila["costo_total"] == pytest.approx(3200)
+    assert fila["categorias"] == 1
+    assert not fila["completa"]
+
+
+def test_sin_la_unidad_de_referencia_cuenta_envases():
+    elegidos = pd.DataFrame(
+        {
+            "categoria": ["yerba mate", "aceite girasol"],
+            "precio": [1500.0, 2000.0],
+            "unidad": [None, "lt"],
+            "precio_unitario": [None, 2000.0],
+        }
+    )
+    costos = costo_por_categoria(elegidos, CANTIDADES, REFERENCIAS)
+
+    assert costos["medida"].tolist() == ["envases", "lt"]
+    assert costos["cantidad"].tolist() == [2, 1]
+    assert costos["costo"].tolist() == pytest.approx([3000, 2000])
+
+
+def test_archivo_usa_la_misma_regla_que_la_serie(tmp_path):
+    pytest.importorskip("duckdb")
+    from src.utils.archivo_parquet import ArchivoParquet, archivar_corrida
+
+    momento = datetime(2025, 11, 21, 12)
+    productos = [
+        producto("1", 3000, categoria="aceite girasol", presentacion="900 cc",
+                 timestamp=momento, corrida_id=1),
+        producto("2", 4800, categoria="aceite girasol", presentacion="1,5 lt",
+                 timestamp=momento, corrida_id=1),
+        producto("3", 2000, categoria="azucar", presentacion="1 kg",
+                 timestamp=momento, corrida_id=1),
+    ]
+    archivar_corrida(productos, directorio=tmp_path)
+
+    archivo = ArchivoParquet(tmp_path)
+    try:
+        diario = archivo.costo_canasta_diario()
+    finally:
+        archivo.cerrar()
+    serie = costos_canasta(pd.DataFrame(productos))
+
+    assert len(diario) == 1
+    assert diario["costo_total"].iloc[0] == pytest.approx(serie["costo_total"].iloc[0])
+    assert diario["categorias"].iloc[0] == 2
@@ -0,0 +1,120 @@
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+from conftest import producto
+from src.utils.indices import actualizar_indices, calcular_indices, obtener_indices
+
+DIAS = [date(2025, 11, 21), date(2025, 11, 22), date(2025, 11, 23)]
+GRUPOS = {"Lácteos": ["leche entera"]}
+
+
+def observaciones(precios):
+    """{(ean, categoria): [precio por día]} -> DataFrame de observaciones"""
+    return pd.DataFrame(
+        [
+            {
+                "fecha": dia,
+                "ean": ean,
+                "ubicacion": "CABA",
+                "categoria": categoria,
+                "precio": precio,
+                "sucursales": 10,
+            }
+            for (ean, categoria), serie in precios.items()
+            for dia, precio in zip(DIAS, serie)
+            if precio is not None
+        ]
+    )
+
+
+def nivel(indices, nombre):
+    return indices[indices["nombre"] == nombre].set_index("fecha")
+
+
+def test_encadena_eslabones_de_productos_pareados():
+    df = observaciones(
+        {
+            ("1", "leche entera"): [100, 110, 110],
+            ("2", "leche entera"): [200, 200, 220],
+        }
+    )
+    leche = nivel(calcular_indices(df, grupos=GRUPOS), "leche entera")
+
+    assert leche.loc[DIAS[0], "jevons"] == 100
+    assert leche.loc[DIAS[1], "jevons"] == pytest.approx(100 * 1.1**0.5, abs=1e-4)
+    assert leche.loc[DIAS[2], "jevons"] == pytest.approx(110, abs=1e-4)
+    # Laspeyres con igual peso: (110 + 200) / 300, luego (110 + 220) / 310
+    assert leche.loc[DIAS[2], "laspeyres"] == pytest.approx(110, abs=1e-4)
+    assert leche["pareados"].tolist() == [0, 2, 2]
+
+
+def test_productos_nuevos_no_mueven_el_indice():
+    df = observaciones(
+        {
+            ("1", "leche entera"): [100, 100, 100],
+            ("2", "leche entera"): [None, 1000, 1000],
+        }
+    )
+    leche = nivel(calcular_indices(df, grupos=GRUPOS), "leche entera")
+    assert leche["jevons"].tolist() == [100, 100, 100]
+
+
+def test_seguir_desde_una_base_da_lo_mismo_que_calcular_todo():
+    df = observaciones(
+        {
+            ("1", "leche entera"): [100, 120, 90],
+            ("2", "yogur"): [50, 55, 60],
+        }
+    )
+    completo = calcular_indices(df, grupos=GRUPOS)
+
+    segundo_dia = completo[completo["fecha"] == DIAS[1]]
+    base = {
+        (fila.nivel, fila.nombre): (fila.jevons, fila.laspeyres)
+        for fila in segundo_dia.itertuples()
+    }
+    parcial = calcular_indices(df[df["fecha"] >= DIAS[1]], base=base, grupos=GRUPOS)
+
+    # El día base se repite sin eslabón (actualizar_indices no lo reescribe)
+    pd.testing.assert_frame_equal(
+        parcial[parcial["fecha"] > DIAS[1]].reset_index(drop=True),
+        completo[completo["fecha"] > DIAS[1]].reset_index(drop=True),
+        check_exact=False,
+        atol=1e-3,
+    )
+
+
+def test_actualizar_incremental_igual_a_recalcular(db):
+    # "yogur" no aparece el 3er día: al encadenar desde ese día tiene que
+    # seguir desde su último valor, no volver a 100
+    dias = {
+        1: {"leche entera": 100, "yogur": 100},
+        2: {"leche entera": 105, "yogur": 120},
+        3: {"leche entera": 110},
+        4: {"leche entera": 108, "yogur": 126},
+        5: {"leche entera": 112, "yogur": 130},
+    }
+    for dia, precios in dias.items():
+        db.guardar_productos(
+            [
+                producto(
+                    categoria,
+                    precio,
+                    categoria=categoria,
+                    timestamp=datetime(2025, 11, dia, 9),
+                )
+                for categoria, precio in precios.items()
+            ]
+        )
+        if dia >= 3:
+            actualizar_indices(db)
+    incremental = obtener_indices(db)
+
+    actualizar_indices(db, forzar=True)
+    completo = obtener_indices(db)
+
+    pd.testing.assert_frame_equal(incremental, completo)
+    yogur = nivel(completo, "yogur")
+    assert yogur.loc[date(2025, 11, 4), "jevons"] == pytest.approx(120)
@@ -0,0 +1,113 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+import config
+from conftest import producto
+from src.database import Database
+from src.database.models import Corrida, Producto
+from src.database.operations import clave_bucket, horas_bucket, horas_programadas
+
+
+def test_horas_programadas():
+    assert horas_programadas("0", "6,12,18") == [0, 6, 12, 18]
+    assert horas_programadas("*/8") == [0, 8, 16]
+    assert horas_programadas("8-12/2", "20") == [8, 10, 12, 20]
+
+
+def test_franja_no_mayor_que_el_intervalo_del_scheduler(monkeypatch):
+    monkeypatch.setattr(config, "HORAS_BUCKET_INGESTA", None)
+    assert horas_bucket() == 6
+
+    monkeypatch.setattr(config, "HORAS_BUCKET_INGESTA", 12)
+    with pytest.raises(ValueError):
+        horas_bucket()
+
+
+def test_corridas_programadas_caen_en_franjas_distintas():
+    dia = datetime(2025, 11, 21)
+    claves = {clave_bucket(dia + timedelta(hours=h)) for h in horas_programadas()}
+    assert len(claves) == len(horas_programadas())
+
+
+def test_dos_corridas_a_6_horas_persisten_ambas(db):
+    primera = datetime(2025, 11, 21, 12)
+    segunda = primera + timedelta(hours=6)
+    corrida_1 = db.iniciar_corrida("CABA", primera, "refresco")
+    corrida_2 = db.iniciar_corrida("CABA", segunda, "refresco")
+
+    db.guardar_productos_merge(
+        [producto("1", 100, timestamp=primera, corrida_id=corrida_1)]
+    )
+    db.guardar_productos_merge(
+        [producto("1", 110, timestamp=segunda, corrida_id=corrida_2)]
+    )
+
+    filas = db.session.query(Producto.corrida_id, Producto.precio).order_by(Producto.id)
+    assert filas.all() == [(corrida_1, 100), (corrida_2, 110)]
+
+
+def test_merge_reejecutado_en_la_misma_franja_no_duplica(db):
+    inicio = datetime(2025, 11, 21, 12)
+    productos = [producto("1", 100, timestamp=inicio), producto("2", 200, timestamp=inicio)]
+
+    primero = db.guardar_productos_merge(productos)
+    productos[0]["precio"] = 105
+    segundo = db.guardar_productos_merge(productos)
+
+    assert (primero["insertados"], primero["actualizados"]) == (2, 0)
+    assert (segundo["insertados"], segundo["actualizados"]) == (0, 2)
+    assert db.session.query(func.count(Producto.id)).scalar() == 2
+    assert db.session.query(Producto.precio).filter_by(ean="1").scalar() == 105
+
+
+def test_reejecucion_recalcula_los_productos_de_la_corrida_anterior(db):
+    inicio = datetime(2025, 11, 21, 12)
+    corrida_1 = db.iniciar_corrida("CABA", inicio, "refresco")
+    corrida_2 = db.iniciar_corrida("CABA", inicio + timedelta(minutes=30), "refresco")
+
+    db.guardar_productos_merge(
+        [producto(ean, 100, timestamp=inicio, corrida_id=corrida_1) for ean in "123"]
+    )
+    db.finalizar_corrida(corrida_1, productos=3)
+    db.guardar_productos_merge(
+        [producto("1", 105, timestamp=inicio, corrida_id=corrida_2)]
+    )
+
+    conteos = dict(db.session.query(Corrida.id, Corrida.productos))
+    assert conteos[corrida_1] == 2
+
+
+def test_merge_sin_ubicacion_no_duplica(db):
+    inicio = datetime(2025, 11, 21, 12)
+    for precio in (100, 105):
+        db.guardar_productos_merge([producto("1", precio, ubicacion=None, timestamp=inicio)])
+
+    assert db.session.query(Producto.precio).all() == [(105,)]
+
+
+def test_migracion_redefine_el_indice_y_borra_duplicados(tmp_path):
+    ruta = tmp_path / "vieja.db"
+    base = Database(str(ruta))
+    inicio = datetime(2025, 11, 21, 12)
+    base.guardar_productos_merge([producto("1", 100, ubicacion=None, timestamp=inicio)])
+    base.engine.dispose()
+
+    # Índice anterior: NULL no choca con NULL y la fila se duplicaba
+    with sqlite3.connect(ruta) as conn:
+        conn.execute("DROP INDEX uq_ean_ubicacion_bucket")
+        conn.execute(
+            "CREATE UNIQUE INDEX uq_ean_ubicacion_bucket ON productos "
+            "(ean, ubicacion, bucket) WHERE bucket IS NOT NULL AND ean IS NOT NULL"
+        )
+        conn.execute(
+            "INSERT INTO productos (ean, ubicacion, bucket, precio, timestamp) "
+            "SELECT ean, ubicacion, bucket, 105, timestamp FROM productos"
+        )
+
+    base = Database(str(ruta))
+    assert base.session.query(Producto.precio).all() == [(105,)]
+    base.cerrar_sesion()
+    base.engine.dispose()
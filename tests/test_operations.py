@@ -0,0 +1,141 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from sqlalchemy import func, text
+
+from conftest import producto
+from src.database import Database
+from src.database.models import Producto
+
+
+def test_bulk_usa_los_defaults_de_las_claves_que_faltan(db):
+    sin_timestamp = producto("2", 200)
+    del sin_timestamp["timestamp"]
+
+    resultado = db.guardar_productos_bulk([producto("1", 100), sin_timestamp])
+
+    assert [chunk["error"] for chunk in resultado] == [None]
+    timestamps = dict(db.session.query(Producto.ean, Producto.timestamp).all())
+    assert timestamps["2"] is not None
+
+
+def test_bulk_un_chunk_con_error_no_revierte_los_demas(db):
+    productos = [producto(str(i), 100 + i) for i in range(4)]
+    productos[3]["precio"] = {"no": "es un precio"}
+
+    resultado = db.guardar_productos_bulk(productos, tam_chunk=2)
+
+    assert [chunk["filas"] for chunk in resultado] == [2, 0]
+    assert resultado[0]["error"] is None and resultado[1]["error"]
+    assert db.session.query(func.count(Producto.id)).scalar() == 2
+
+
+def _estadisticas(db):
+    return db.session.execute(
+        text(
+            "SELECT fecha, ubicacion, categoria, cantidad, suma, minimo, maximo, "
+            "suma_cuadrados FROM estadisticas_diarias ORDER BY fecha, ubicacion, categoria"
+        )
+    ).all()
+
+
+def test_estadisticas_diarias_incrementales_igual_a_reconstruir(db):
+    corrida = db.iniciar_corrida("CABA", datetime(2025, 11, 21, 6), "busqueda")
+    db.guardar_productos_merge(
+        [
+            producto("1", 100, timestamp=datetime(2025, 11, 21, 6), corrida_id=corrida),
+            producto("2", 300, timestamp=datetime(2025, 11, 21, 6), corrida_id=corrida),
+        ]
+    )
+    # Filas sin corrida del mismo día y de otro día
+    db.guardar_productos(
+        [
+            producto("3", 200, timestamp=datetime(2025, 11, 21, 20)),
+            producto("4", 50, timestamp=datetime(2025, 11, 22, 9), ubicacion=None),
+        ]
+    )
+    incrementales = _estadisticas(db)
+
+    db.recalcular_estadisticas_diarias()
+
+    assert incrementales == _estadisticas(db)
+    assert [fila[3] for fila in incrementales] == [3, 1]
+
+
+def test_estadisticas_diarias_con_reejecuciones_igual_a_reconstruir(db):
+    inicio = datetime(2025, 11, 21, 6)
+    corrida_1 = db.iniciar_corrida("CABA", inicio, "busqueda")
+    db.guardar_productos_merge(
+        [
+            producto("1", 100, timestamp=inicio, corrida_id=corrida_1),
+            producto("2", 300, timestamp=inicio, corrida_id=corrida_1),
+            producto("3", 200, categoria="yerba", timestamp=inicio, corrida_id=corrida_1),
+            producto("4", None, timestamp=inicio, corrida_id=corrida_1),
+        ]
+    )
+    # Re-ejecución en la franja: pierde el mínimo, un EAN cambia de
+    # categoría (la vieja queda vacía) y otro viene repetido en el lote
+    corrida_2 = db.iniciar_corrida("CABA", inicio.replace(minute=30), "busqueda")
+    db.guardar_productos_merge(
+        [
+            producto("1", 150, timestamp=inicio, corrida_id=corrida_2),
+            producto("1", 999, timestamp=inicio, corrida_id=corrida_2),
+            producto("2", 250, timestamp=inicio, corrida_id=corrida_2),
+            producto("3", 210, categoria="yerba mate", timestamp=inicio, corrida_id=corrida_2),
+        ]
+    )
+    # Inserción en bloque, un chunk por fila
+    db.guardar_productos_bulk(
+        [
+            producto("5", 80, timestamp=datetime(2025, 11, 21, 20)),
+            producto("6", 90, timestamp=datetime(2025, 11, 21, 21), ubicacion=None),
+        ],
+        tam_chunk=1,
+    )
+    incrementales = _estadisticas(db)
+
+    db.recalcular_estadisticas_diarias()
+
+    assert incrementales == _estadisticas(db)
+    assert [fila[2:7] for fila in incrementales] == [
+        ("leche entera", 1, 90.0, 90.0, 90.0),
+        ("leche entera", 3, 480.0, 80.0, 250.0),
+        ("yerba mate", 1, 210.0, 210.0, 210.0),
+    ]
+
+
+def test_solo_lectura_no_toca_el_esquema(db, tmp_path):
+    ruta = tmp_path / "test.db"
+    db.guardar_productos_bulk([producto("7790001", 1000.0)])
+    db.engine.dispose()
+    contenido = ruta.read_bytes()
+
+    lector = Database(str(ruta), solo_lectura=True)
+    assert lector.session.query(func.count(Producto.id)).scalar() == 1
+    lector.cerrar_sesion()
+    lector.engine.dispose()
+
+    assert ruta.read_bytes() == contenido
+
+
+def test_solo_lectura_falla_con_esquema_desactualizado(tmp_path):
+    ruta = tmp_path / "vieja.db"
+    with sqlite3.connect(ruta) as conn:
+        conn.execute("CREATE TABLE productos (id INTEGER PRIMARY KEY, precio FLOAT)")
+    contenido = ruta.read_bytes()
+
+    with pytest.raises(RuntimeError, match="desactualizado.*productos.ean"):
+        Database(str(ruta), solo_lectura=True)
+
+    assert ruta.read_bytes() == contenido
+
+
+def test_solo_lectura_no_crea_la_base(tmp_path):
+    ruta = tmp_path / "no_existe.db"
+
+    with pytest.raises(FileNotFoundError):
+        Database(str(ruta), solo_lectura=True)
+
+    assert not ruta.exists()
@@ -0,0 +1,160 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import producto
+from src.scrapers import precios_claro
+from src.scrapers.precios_claro import PreciosClarosScraper, scrapear_ubicaciones
+
+
+def api_topeada(catalogo, tope, informar_total=True, informar_tope=True):
+    """_pedir_pagina falso: la API recorta `limit` a `tope` como maxLimitPermitido"""
+    pedidos = []
+
+    def pedir_pagina(termino, limit, offset):
+        pedidos.append((limit, offset))
+        data = {
+            "productos": [
+                {
+                    "id": f"779{i:010d}",
+                    "nombre": f"Producto {i}",
+                    "marca": "Marca",
+                    "presentacion": "1.0 kg",
+                    "precioMin": 100.0,
+                    "precioMax": 100.0,
+                    "cantSucursalesDisponible": 1,
+                }
+                for i in range(offset, min(offset + min(limit, tope), catalogo))
+            ]
+        }
+        if informar_total:
+            data["total"] = catalogo
+        if informar_tope:
+            data["maxLimitPermitido"] = tope
+        return data
+
+    return pedir_pagina, pedidos
+
+
+@pytest.fixture
+def scraper():
+    scraper = PreciosClarosScraper(max_rps=0, modo_cache="desactivado")
+    yield scraper
+    scraper.cerrar()
+
+
+@pytest.mark.parametrize(
+    "informar_total, informar_tope",
+    [(True, True), (True, False), (False, True), (False, False)],
+)
+def test_pagina_recortada_por_la_api_no_corta_la_iteracion(
+    scraper, informar_total, informar_tope
+):
+    scraper._pedir_pagina, pedidos = api_topeada(
+        250, 100, informar_total, informar_tope
+    )
+
+    productos = [
+        prod
+        for pagina in scraper.iterar_paginas("leche", tam_pagina=200, max_productos=1000)
+        for prod in pagina
+    ]
+
+    assert len(productos) == 250
+    assert len({prod["ean"] for prod in productos}) == 250
+    assert [offset for _, offset in pedidos[:3]] == [0, 100, 200]
+
+
+def test_respeta_max_productos(scraper):
+    scraper._pedir_pagina, pedidos = api_topeada(250, 100)
+
+    productos = [
+        prod
+        for pagina in scraper.iterar_paginas("leche", tam_pagina=100, max_productos=150)
+        for prod in pagina
+    ]
+
+    assert len(productos) == 150
+    assert pedidos == [(100, 0), (50, 100)]
+
+
+def test_eans_conocidos_rotan_por_ultimo_refresco(db):
+    busqueda = db.iniciar_corrida("CABA", datetime(2025, 11, 21, 0), "busqueda")
+    db.guardar_productos_merge(
+        [
+            producto(ean, 100, timestamp=datetime(2025, 11, 21, 0), corrida_id=busqueda)
+            for ean in "1234"
+        ]
+    )
+    # Refrescos previos: el 2 hace más tiempo que el 1
+    for hora, ean in ((6, "2"), (12, "1")):
+        refresco = db.iniciar_corrida("CABA", datetime(2025, 11, 21, hora), "refresco")
+        db.guardar_productos_merge(
+            [
+                producto(
+                    ean,
+                    100,
+                    categoria="yogur",
+                    timestamp=datetime(2025, 11, 21, hora),
+                    corrida_id=refresco,
+                )
+            ]
+        )
+    # Otra búsqueda más nueva no cambia la rotación
+    busqueda = db.iniciar_corrida("CABA", datetime(2025, 11, 21, 18), "busqueda")
+    db.guardar_productos_merge(
+        [producto("1", 100, timestamp=datetime(2025, 11, 21, 18), corrida_id=busqueda)]
+    )
+
+    assert list(db.obtener_eans_conocidos("CABA").items()) == [
+        ("3", "leche entera"),
+        ("4", "leche entera"),
+        ("2", "yogur"),
+        ("1", "leche entera"),
+    ]
+    assert db.obtener_eans_conocidos("CABA", dias=1) == {}
+
+
+@pytest.fixture
+def pedidos(monkeypatch):
+    """Reemplaza el refresco y la búsqueda por registros de lo que se pidió"""
+    pedidos = []
+
+    def refrescar_eans(self, eans, **_):
+        pedidos.append(("refresco", list(eans)))
+        return []
+
+    def buscar_productos(self, terminos, **_):
+        pedidos.append(("busqueda", list(terminos)))
+        return []
+
+    monkeypatch.setattr(PreciosClarosScraper, "refrescar_eans", refrescar_eans)
+    monkeypatch.setattr(PreciosClarosScraper, "buscar_productos", buscar_productos)
+    return pedidos
+
+
+def test_refresca_los_eans_mas_viejos_que_entran_en_la_busqueda(pedidos):
+    eans = {str(ean): "leche" for ean in range(10)}
+    _, _, estrategias = scrapear_ubicaciones(
+        ["CABA", "MAR_DEL_PLATA"],
+        ["leche", "arroz", "yerba"],
+        eans_por_ubicacion={"CABA": eans},
+    )
+    assert ("refresco", ["0", "1", "2"]) in pedidos
+    assert estrategias == {"CABA": "refresco", "MAR_DEL_PLATA": "busqueda"}
+
+
+def test_sin_presupuesto_de_refresco_busca_por_termino(pedidos, monkeypatch):
+    monkeypatch.setattr(precios_claro, "MAX_EANS_REFRESCO", 0)
+    eans = {"1": "leche"}
+    _, _, estrategias = scrapear_ubicaciones(
+        ["CABA"], ["leche"], eans_por_ubicacion={"CABA": eans}
+    )
+    assert pedidos == [("busqueda", ["leche"])]
+    assert estrategias == {"CABA": "busqueda"}
+
+
+def test_corrida_registra_la_estrategia_usada(db):
+    corrida = db.iniciar_corrida("CABA", datetime(2025, 11, 21, 12), "refresco")
+    db.finalizar_corrida(corrida, estrategia="busqueda")
+    assert db.obtener_ultima_corrida("CABA").estrategia == "busqueda"
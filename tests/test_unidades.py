@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from src.database.unidades import (
+    completar_unidades,
+    parsear_presentaciones,
+    precios_unitarios,
+)
+
+
+@pytest.mark.parametrize(
+    "presentacion, magnitud, unidad",
+    [
+        ("1,5 lt", 1.5, "lt"),
+        ("500gr", 0.5, "kg"),
+        ("1.0 kg", 1.0, "kg"),
+        ("900.0 cc", 0.9, "lt"),
+        ("6 un", 6.0, "un"),
+        ("1 LT.", 1.0, "lt"),
+    ],
+)
+def test_parsear_presentaciones_reconocidas(presentacion, magnitud, unidad):
+    fila = parsear_presentaciones([presentacion]).iloc[0]
+    assert fila["magnitud"] == pytest.approx(magnitud)
+    assert fila["unidad"] == unidad
+
+
+@pytest.mark.parametrize("presentacion", ["x", 0, None, "", "0 lt", "2 x 1 lt", "1 pack"])
+def test_parsear_presentaciones_no_reconocidas(presentacion):
+    fila = parsear_presentaciones([presentacion]).iloc[0]
+    assert pd.isna(fila["magnitud"])
+    assert pd.isna(fila["unidad"])
+
+
+def test_parsear_presentaciones_conserva_el_indice():
+    serie = pd.Series(["1 kg", "x"], index=[10, 20])
+    assert parsear_presentaciones(serie).index.tolist() == [10, 20]
+
+
+def test_precios_unitarios():
+    resultado = precios_unitarios([300, 100, 50], ["1,5 lt", "500gr", "x"])
+    assert resultado["precio_unitario"].tolist()[:2] == [200.0, 200.0]
+    assert pd.isna(resultado["precio_unitario"].iloc[2])
+
+
+def test_completar_unidades_deja_none_si_no_reconoce():
+    filas = completar_unidades(
+        [{"precio": 250, "presentacion": "500 gr"}, {"precio": 10, "presentacion": "x"}]
+    )
+    assert filas[0] == {
+        "precio": 250,
+        "presentacion": "500 gr",
+        "magnitud": 0.5,
+        "unidad": "kg",
+        "precio_unitario": 500.0,
+    }
+    assert (filas[1]["magnitud"], filas[1]["unidad"], filas[1]["precio_unitario"]) == (
+        None,
+        None,
+        None,
+    )